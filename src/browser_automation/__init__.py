@@ -1,20 +1,52 @@
+from browser_automation.async_launcher import AsyncCamoufoxLauncher, LaunchEngine
 from browser_automation.camoufox_launcher import CamoufoxLauncher
+from browser_automation.context_pool import ContextPool
 from browser_automation.profile_repository import ProfileRepository
-from browser_automation.proxy import ProxyBase, VlessProxy
+from browser_automation.proxy import (
+    ProxyBase,
+    SharedVlessProxy,
+    Traffic,
+    TrafficCollector,
+    VlessProxy,
+    XrayHub,
+)
+from browser_automation.storage import (
+    JournaledJsonStorage,
+    JsonProfileStorage,
+    ProfileStorage,
+    SqliteProfileStorage,
+    StaleProfileError,
+)
 from browser_automation.value_objects import (
     CamoufoxSettings,
     Profile,
+    ProfileSummary,
     ProxyConfig,
+    TunnelSettings,
     VlessString,
 )
 
 __all__ = [
+    "AsyncCamoufoxLauncher",
     "CamoufoxLauncher",
+    "ContextPool",
+    "JournaledJsonStorage",
+    "JsonProfileStorage",
+    "LaunchEngine",
     "Profile",
     "ProfileRepository",
+    "ProfileSummary",
+    "ProfileStorage",
     "ProxyBase",
     "ProxyConfig",
+    "SharedVlessProxy",
+    "SqliteProfileStorage",
+    "StaleProfileError",
+    "Traffic",
+    "TrafficCollector",
     "VlessProxy",
     "VlessString",
+    "XrayHub",
     "CamoufoxSettings",
+    "TunnelSettings",
 ]
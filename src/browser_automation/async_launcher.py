@@ -0,0 +1,256 @@
+"""Асинхронный запуск Camoufox: все браузеры в одном цикле asyncio и одном драйвере Playwright."""
+
+import asyncio
+import threading
+from collections.abc import Callable, Coroutine
+from concurrent.futures import Future
+from typing import Any
+
+from camoufox.async_api import AsyncNewBrowser
+from playwright.async_api import (
+    Browser,
+    BrowserContext,
+    Page,
+    Playwright,
+    async_playwright,
+)
+
+from browser_automation.camoufox_launcher import _LauncherCore
+from browser_automation.context_pool import ContextPool
+from browser_automation.value_objects import ProxyConfig
+
+
+class AsyncCamoufoxLauncher(_LauncherCore):
+    """
+    Асинхронный аналог CamoufoxLauncher (те же параметры) на camoufox.async_api.
+    Браузер запускается в переданном Playwright — драйвер общий для всех лаунчеров.
+    Прокси поднимается и останавливается в пуле потоков: ожидание xray не
+    блокирует цикл. Закрытие браузера или контекста вручную замечается
+    по событиям Playwright (без опроса) — вызывается on_closed.
+    С contexts профиль без data_dir получает контекст в общем процессе пула
+    (прокси, locale и заголовки — на уровне контекста); закрытие последней
+    вкладки считается закрытием браузера, stop() возвращает контекст в пул.
+    Со snapshot — так же по последней вкладке: снимок сохраняется, пока
+    контекст ещё открыт.
+    """
+
+    _browser: Browser | None
+    _context: BrowserContext | None
+
+    def __init__(self, *, contexts: ContextPool | None = None, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._contexts = contexts
+        self._shared = False
+
+    async def start(self, playwright: Playwright) -> Browser | None:
+        """Запускает прокси и Camoufox; у persistent-профиля и контекста пула — None."""
+        self._closed = False
+        proxy_config = await asyncio.to_thread(self._start_proxy)
+        try:
+            await asyncio.to_thread(self._load_state)
+            await self._start_browser(playwright, proxy_config)
+        except BaseException:
+            await self.stop()
+            raise
+        if self._closed:
+            # stop() пришёл во время запуска
+            await self.stop()
+        return self._browser
+
+    async def _start_browser(
+        self, playwright: Playwright, proxy_config: ProxyConfig | None
+    ) -> None:
+        if self._contexts is not None and not self._data_dir:
+            await self._start_shared(playwright, proxy_config)
+            return
+        result = await AsyncNewBrowser(
+            playwright, **self._launch_options(proxy_config)
+        )
+        if self._data_dir:
+            # persistent_context=True → BrowserContext (хранилище куков в user_data_dir)
+            self._context = result
+            self._browser = self._context.browser
+        else:
+            self._browser = result
+            self._context = await self._browser.new_context(**self._context_options())
+            if self._snapshot:
+                self._context.on("page", self._watch_page)
+        self._subscribe_closed()
+
+        # persistent_context уже открывает страницу — используем её, чтобы не было 2 вкладок
+        await self._open_page(
+            self._context.pages[0]
+            if self._context.pages
+            else await self._context.new_page()
+        )
+
+    async def _start_shared(
+        self, playwright: Playwright, proxy_config: ProxyConfig | None
+    ) -> None:
+        options = self._context_options()
+        if proxy_config:
+            options["proxy"] = proxy_config.to_playwright_proxy()
+        self._context = await self._contexts.acquire(
+            playwright, self._launch_options(None), options
+        )
+        self._shared = True
+        # Падение общего процесса тоже приходит сюда — close его контекстов
+        self._context.on("close", self._on_gone)
+        self._context.on("page", self._watch_page)
+        await self._open_page(await self._context.new_page())
+
+    def _watch_page(self, page: Page) -> None:
+        page.on("close", self._on_page_closed)
+
+    def _on_page_closed(self, _page: Page) -> None:
+        # Окно профиля закрыто — контекст больше не нужен (но ещё открыт для снимка)
+        if self._context is not None and not self._context.pages:
+            self._on_gone()
+
+    async def _open_page(self, page: Page) -> None:
+        await page.goto("about:blank")
+        title = self._title_script()
+        if title:
+            await page.evaluate(title)
+        await page.bring_to_front()
+
+    def is_running(self) -> bool:
+        """Браузер запущен и не закрыт вручную."""
+        return self._context is not None and not self._closed
+
+    async def stop(self) -> None:
+        """Закрывает браузер и останавливает прокси (если был запущен)."""
+        self._closed = True
+        context, browser = self._context, self._browser
+        self._context = self._browser = None
+        if context is not None and self._snapshot:
+            try:
+                state = await context.storage_state(indexed_db=True)
+                await asyncio.to_thread(self._save_state, state)
+            except Exception:
+                # Контекст уже закрыт — остаётся предыдущий снимок
+                pass
+        if self._shared and context is not None:
+            self._shared = False
+            await self._contexts.release(context)
+            context = None
+        for target in (context, browser):
+            if target is None:
+                continue
+            try:
+                await target.close()
+            except Exception:
+                pass
+        await asyncio.to_thread(self._release_proxy)
+
+
+class LaunchEngine:
+    """
+    Один фоновый поток с циклом asyncio, владеющий всеми браузерами и одним
+    драйвером Playwright (запускается при первом submit). submit(), stop()
+    и shutdown() потокобезопасны (например, из GUI) и возвращают
+    concurrent.futures.Future. on_closed(instance_id) вызывается в потоке цикла,
+    когда браузер закрыли вручную (прокси к этому моменту уже остановлен).
+    contexts — пул общих процессов для лаунчеров без data_dir; закрывается
+    в shutdown().
+    """
+
+    def __init__(
+        self,
+        *,
+        on_closed: Callable[[str], object] | None = None,
+        contexts: ContextPool | None = None,
+    ) -> None:
+        self._on_closed = on_closed
+        self.contexts = contexts
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="launch-engine", daemon=True
+        )
+        self._thread.start()
+        self._playwright: Playwright | None = None
+        self._playwright_lock: asyncio.Lock | None = None
+        self._launchers: dict[str, AsyncCamoufoxLauncher] = {}
+
+    def __len__(self) -> int:
+        return len(self._launchers)
+
+    def __contains__(self, instance_id: str) -> bool:
+        return instance_id in self._launchers
+
+    def submit(
+        self, instance_id: str, launcher: AsyncCamoufoxLauncher
+    ) -> "Future[Browser | None]":
+        """
+        Запуск браузера; результат Future — Browser (None у persistent).
+        stop() во время старта закрывает браузер сразу после подъёма, Future отменяется.
+        """
+        return self._call(self._launch(instance_id, launcher))
+
+    def stop(self, instance_id: str) -> "Future[None]":
+        """Закрывает браузер instance_id (on_closed не вызывается)."""
+        return self._call(self._stop(instance_id))
+
+    def shutdown(self, timeout: float = 30.0) -> None:
+        """Закрывает все браузеры, драйвер Playwright и цикл."""
+        if not self._loop.is_running():
+            return
+        try:
+            self._call(self._shutdown()).result(timeout)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    def _call(self, coro: Coroutine[Any, Any, Any]) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def _driver(self) -> Playwright:
+        if self._playwright_lock is None:
+            self._playwright_lock = asyncio.Lock()
+        async with self._playwright_lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+        return self._playwright
+
+    async def _launch(
+        self, instance_id: str, launcher: AsyncCamoufoxLauncher
+    ) -> Browser | None:
+        playwright = await self._driver()
+        launcher.on_closed = lambda: self._closed(instance_id)
+        self._launchers[instance_id] = launcher
+        try:
+            browser = await launcher.start(playwright)
+        except BaseException:
+            self._launchers.pop(instance_id, None)
+            raise
+        if self._launchers.get(instance_id) is not launcher:
+            # stop() пришёл во время старта — поднятый браузер никому не нужен
+            await launcher.stop()
+            raise asyncio.CancelledError
+        return browser
+
+    def _closed(self, instance_id: str) -> None:
+        launcher = self._launchers.pop(instance_id, None)
+        if launcher is None:
+            return
+        task = self._loop.create_task(launcher.stop())
+        on_closed = self._on_closed
+        if on_closed is not None:
+            task.add_done_callback(lambda _t: on_closed(instance_id))
+
+    async def _stop(self, instance_id: str) -> None:
+        launcher = self._launchers.pop(instance_id, None)
+        if launcher is not None:
+            await launcher.stop()
+
+    async def _shutdown(self) -> None:
+        launchers = list(self._launchers.values())
+        self._launchers.clear()
+        await asyncio.gather(
+            *(launcher.stop() for launcher in launchers), return_exceptions=True
+        )
+        if self.contexts is not None:
+            await self.contexts.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
@@ -1,24 +1,36 @@
 """Класс запуска Camoufox с настройками и прокси."""
 
 import json
+from collections.abc import Callable
 from pathlib import Path
 from typing import TYPE_CHECKING
 
 from camoufox import DefaultAddons
 from camoufox.sync_api import Camoufox
-from playwright.sync_api import Browser, BrowserContext
+from playwright.sync_api import Browser, BrowserContext, Page
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 
-from browser_automation.proxy import VlessProxy
+from browser_automation.proxy import (
+    ProxyBase,
+    ProxyStartError,
+    SharedVlessProxy,
+    TrafficCollector,
+    TunnelPool,
+    VlessProxy,
+)
+from browser_automation.snapshot import load_snapshot, save_snapshot
 from browser_automation.value_objects import CamoufoxSettings, Profile, ProxyConfig
 
 if TYPE_CHECKING:
-    from browser_automation.proxy import ProxyBase
+    from browser_automation.proxy import XrayHub
 
 
-class CamoufoxLauncher:
+class _LauncherCore:
     """
-    Запуск Camoufox с настройками и опциональным прокси.
-    В __init__ можно передать profile или отдельно proxy, settings.
+    Общее для синхронного и асинхронного лаунчеров: параметры, прокси профиля
+    и опции Camoufox. Вызовы прокси блокирующие (ожидание готовности xray).
+    on_closed вызывается один раз, когда браузер закрыт вручную или его процесс
+    завершился (события Playwright, без опроса).
     """
 
     def __init__(
@@ -28,26 +40,41 @@ class CamoufoxLauncher:
         proxy: "ProxyBase | ProxyConfig | None" = None,
         settings: CamoufoxSettings | None = None,
         data_dir: Path | str | None = None,
+        snapshot: Path | str | None = None,
+        hub: "XrayHub | None" = None,
+        pool: TunnelPool | None = None,
+        traffic: TrafficCollector | None = None,
+        on_closed: Callable[[], object] | None = None,
     ) -> None:
+        self.on_closed = on_closed
+        self._closed = False
         self._profile = profile
         self._proxy = proxy
         self._settings = settings or CamoufoxSettings()
         if profile and profile.camoufox_settings:
             self._settings = profile.camoufox_settings
         self._data_dir = Path(data_dir) if data_dir else None
-        self._browser: Browser | None = None
-        self._context: BrowserContext | None = None
+        # Снимок — только у профиля без каталога: persistent хранит всё сам
+        self._snapshot = Path(snapshot) if snapshot and not data_dir else None
+        self._state: dict | None = None
+        self._hub = hub
+        self._pool = pool
+        self._traffic = traffic
+        self._tracked = False
+        self._pooled = False
+        self._browser = None
+        self._context = None
         self._proxy_process: ProxyBase | None = None
         self._proxy_config: ProxyConfig | None = None
 
-    def start(self) -> Browser:
-        """Запускает Camoufox (и прокси если задан)."""
+    def _start_proxy(self) -> ProxyConfig | None:
+        """Поднимает прокси (свой, из пула или маршрут хаба); None — без прокси."""
         proxy_config: ProxyConfig | None = None
 
         if self._proxy is not None:
             if isinstance(self._proxy, ProxyConfig):
                 proxy_config = self._proxy
-            elif isinstance(self._proxy, VlessProxy):
+            elif isinstance(self._proxy, ProxyBase):
                 self._proxy_process = self._proxy
                 proxy_config = self._proxy.start()
                 self._proxy_config = proxy_config
@@ -59,13 +86,51 @@ class CamoufoxLauncher:
                     if self._profile.proxy_config
                     else 10808
                 )
-                vless = VlessProxy(self._profile.vless_raw, local_port=start_port)
+                tunnel = self._profile.tunnel_settings
+                vless: ProxyBase
+                if self._pool:
+                    vless = self._pool.checkout(
+                        self._profile.vless_raw, local_port=start_port, tunnel=tunnel
+                    )
+                    self._pooled = True
+                elif self._hub:
+                    vless = SharedVlessProxy(
+                        self._hub,
+                        self._profile.vless_raw,
+                        local_port=start_port,
+                        tunnel=tunnel,
+                    )
+                else:
+                    vless = VlessProxy(
+                        self._profile.vless_raw, local_port=start_port, tunnel=tunnel
+                    )
                 self._proxy_process = vless
                 proxy_config = vless.start()
                 self._proxy_config = proxy_config
-            except Exception:
-                pass
+            except ProxyStartError:
+                # xray упал или не поднялся — без прокси браузер не запускаем
+                self._proxy_process = None
+                self._pooled = False
+                raise
+            except Exception as e:
+                # Нет xray, кончились порты, битая VLESS-строка: браузер без туннеля
+                # раскрыл бы настоящий IP — запуск профиля прерывается
+                self._proxy_process = None
+                self._pooled = False
+                raise ProxyStartError(f"VLESS-туннель не поднят: {e}") from e
 
+        if self._traffic and self._profile and self._proxy_process and proxy_config:
+            # SOCKS5 и HTTP inbound — port и port + 1
+            self._traffic.track(
+                self._profile.id,
+                self._proxy_process,
+                (proxy_config.port, proxy_config.port + 1),
+            )
+            self._tracked = True
+        return proxy_config
+
+    def _launch_options(self, proxy_config: ProxyConfig | None) -> dict:
+        """Аргументы Camoufox/AsyncNewBrowser."""
         # headless=False — окно должно быть видимым
         kwargs: dict = {
             "headless": self._settings.headless,
@@ -84,10 +149,106 @@ class CamoufoxLauncher:
                 True  # устраняет LeakWarning, согласует гео/локаль с IP прокси
             )
 
-        use_persistent = bool(self._data_dir)
-        if use_persistent:
+        if self._data_dir:
             kwargs["persistent_context"] = True
             kwargs["user_data_dir"] = str(self._data_dir)
+        return kwargs
+
+    def _context_options(self) -> dict:
+        """new_context() для непостоянного профиля (со снимком — его состояние)."""
+        options: dict = {
+            "extra_http_headers": {"Accept-Language": self._settings.locale},
+            "locale": self._settings.locale,
+        }
+        if self._state is not None:
+            options["storage_state"] = self._state
+        return options
+
+    def _load_state(self) -> None:
+        """Читает снимок профиля (нет снимка — чистый контекст)."""
+        self._state = load_snapshot(self._snapshot) if self._snapshot else None
+
+    def _save_state(self, state: dict) -> None:
+        if self._snapshot:
+            save_snapshot(self._snapshot, state)
+
+    def _title_script(self) -> str | None:
+        """Заголовок окна = название профиля."""
+        if self._profile and self._profile.name:
+            return f"document.title = {json.dumps(self._profile.name)}"
+        return None
+
+    @property
+    def proxy(self) -> ProxyBase | None:
+        """Запущенный лаунчером прокси (ready_time, probe_latency — у VLESS)."""
+        return self._proxy_process
+
+    @property
+    def proxy_config(self) -> ProxyConfig | None:
+        """Локальный прокси, через который работает браузер."""
+        return self._proxy_config
+
+    def _subscribe_closed(self) -> None:
+        """
+        Подписка на закрытие: disconnected браузера (в том числе падение процесса)
+        и close контекста; у persistent-профиля браузера нет — только контекст.
+        """
+        if self._browser is not None:
+            self._browser.on("disconnected", self._on_gone)
+        if self._context is not None:
+            self._context.on("close", self._on_gone)
+
+    def _on_gone(self, *_args: object) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._closed_hook()
+        if self.on_closed is not None:
+            self.on_closed()
+
+    def _closed_hook(self) -> None:
+        """Что сделать сразу при закрытии браузера (до on_closed)."""
+
+    def _release_proxy(self) -> None:
+        """Снимает учёт трафика и останавливает прокси (туннель пула — в пул)."""
+        if self._tracked and self._traffic and self._profile:
+            # Последний опрос счётчиков — пока xray ещё работает
+            self._traffic.untrack(self._profile.id)
+            self._tracked = False
+        if self._proxy_process:
+            if self._pooled and self._pool and isinstance(
+                self._proxy_process, VlessProxy
+            ):
+                self._pool.checkin(self._proxy_process)
+            else:
+                self._proxy_process.stop()
+            self._proxy_process = None
+            self._pooled = False
+        self._proxy_config = None
+
+
+class CamoufoxLauncher(_LauncherCore):
+    """
+    Запуск Camoufox с настройками и опциональным прокси.
+    В __init__ можно передать profile или отдельно proxy, settings.
+    С hub VLESS профиля поднимается маршрутом в общем xray, а не отдельным процессом.
+    С pool туннель берётся из пула готовых и при stop() возвращается в него.
+    С traffic трафик прокси учитывается в итогах профиля (ключ — id профиля).
+    Со snapshot (без data_dir) контекст создаётся из снимка, а stop() сохраняет
+    в него куки, localStorage и IndexedDB.
+    События sync API Playwright обрабатываются, пока поток лаунчера внутри его
+    вызова: wait_closed() блокирует поток до закрытия браузера.
+    """
+
+    _browser: Browser | None
+    _context: BrowserContext | None
+
+    def start(self) -> Browser:
+        """Запускает Camoufox (и прокси если задан)."""
+        self._closed = False
+        kwargs = self._launch_options(self._start_proxy())
+        use_persistent = bool(self._data_dir)
+        self._load_state()
 
         camoufox = Camoufox(**kwargs)
         result = camoufox.start()
@@ -98,33 +259,67 @@ class CamoufoxLauncher:
             self._browser = self._context.browser
         else:
             self._browser = result
-            self._context = self._browser.new_context(
-                extra_http_headers={"Accept-Language": self._settings.locale},
-                locale=self._settings.locale,
-            )
+            self._context = self._browser.new_context(**self._context_options())
+        self._subscribe_closed()
 
         # persistent_context уже открывает страницу — используем её, чтобы не было 2 вкладок
         page = (
             self._context.pages[0] if self._context.pages else self._context.new_page()
         )
         page.goto("about:blank")
-        # Заголовок окна = название профиля
-        if self._profile and self._profile.name:
-            page.evaluate(f"document.title = {json.dumps(self._profile.name)}")
+        title = self._title_script()
+        if title:
+            page.evaluate(title)
         page.bring_to_front()
         return self._browser
 
+    @property
+    def context(self) -> BrowserContext | None:
+        """Контекст браузера профиля; None — браузер не запущен."""
+        return self._context
+
+    @property
+    def page(self) -> Page | None:
+        """Первая вкладка профиля (открыта в start()); None — не запущен или вкладок нет."""
+        if self._context is None or not self._context.pages:
+            return None
+        return self._context.pages[0]
+
     def is_running(self) -> bool:
-        """Проверяет, подключён ли браузер (не закрыт ли вручную)."""
-        if not self._browser:
-            return False
+        """Браузер запущен и не закрыт (по событиям, без запроса к драйверу)."""
+        return self._context is not None and not self._closed
+
+    def wait_closed(self, timeout: float | None = None) -> bool:
+        """
+        Ждёт закрытия браузера (прокси к возврату уже остановлен).
+        False — истёк timeout, с (None — ждать без ограничения).
+        """
+        if self._closed or self._context is None:
+            return True
         try:
-            return self._browser.is_connected()
+            self._context.wait_for_event(
+                "close", timeout=timeout * 1000 if timeout is not None else 0
+            )
+        except PlaywrightTimeoutError:
+            return self._closed
         except Exception:
-            return False
+            # Соединение с драйвером оборвалось — браузера больше нет
+            self._on_gone()
+        return True
+
+    def _closed_hook(self) -> None:
+        # Туннель не нужен закрытому браузеру — останавливаем сразу
+        self._release_proxy()
 
     def stop(self) -> None:
         """Останавливает браузер и VLESS/xray-прокси (если был запущен)."""
+        self._closed = True
+        if self._context and self._snapshot:
+            try:
+                self._save_state(self._context.storage_state(indexed_db=True))
+            except Exception:
+                # Контекст уже закрыт — остаётся предыдущий снимок
+                pass
         if self._context:
             try:
                 self._context.close()
@@ -137,7 +332,4 @@ class CamoufoxLauncher:
             except Exception:
                 pass
             self._browser = None
-        if self._proxy_process:
-            self._proxy_process.stop()
-            self._proxy_process = None
-        self._proxy_config = None
+        self._release_proxy()
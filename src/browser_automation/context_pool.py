@@ -0,0 +1,144 @@
+"""Общие процессы Camoufox для непостоянных профилей: контекст на профиль вместо браузера."""
+
+import asyncio
+from collections.abc import Hashable
+from dataclasses import dataclass, field
+
+from camoufox.async_api import AsyncNewBrowser
+from playwright.async_api import Browser, BrowserContext, Playwright
+
+DEFAULT_MAX_CONTEXTS = 32
+DEFAULT_IDLE_TTL = 60.0
+
+# Опции запуска, которые задаются процессу целиком (у контекстов одинаковые)
+_PROCESS_OPTIONS = ("headless", "humanize", "exclude_addons", "enable_cache", "window")
+
+
+@dataclass
+class _Host:
+    key: Hashable
+    browser: Browser
+    contexts: set[BrowserContext] = field(default_factory=set)
+    reaper: asyncio.TimerHandle | None = None
+
+
+class ContextPool:
+    """
+    Выдаёт изолированные BrowserContext (свои куки, хранилища, прокси, locale
+    и заголовки) в общих процессах Camoufox: дополнительный профиль стоит
+    контекст, а не процесс Firefox. В одном процессе — до max_contexts
+    контекстов с одинаковыми опциями процесса (headless, аддоны, окно);
+    процесс без контекстов закрывается через idle_ttl секунд, упавший — заменяется
+    новым при следующем acquire(). Контекст после release() закрывается —
+    состояние профиля не переходит к следующему; повторно используется процесс.
+    Отпечаток Camoufox задаётся процессу, поэтому общий у его контекстов;
+    geoip по прокси не применяется — прокси у каждого контекста свой.
+    Работает в одном цикле asyncio (LaunchEngine).
+    """
+
+    def __init__(
+        self,
+        *,
+        max_contexts: int = DEFAULT_MAX_CONTEXTS,
+        idle_ttl: float = DEFAULT_IDLE_TTL,
+    ) -> None:
+        self._max_contexts = max(1, max_contexts)
+        self._idle_ttl = idle_ttl
+        self._hosts: list[_Host] = []
+        self._host_of: dict[BrowserContext, _Host] = {}
+        self._lock: asyncio.Lock | None = None
+
+    def __len__(self) -> int:
+        """Сколько контекстов выдано."""
+        return len(self._host_of)
+
+    @property
+    def process_count(self) -> int:
+        return len(self._hosts)
+
+    async def acquire(
+        self, playwright: Playwright, launch_options: dict, context_options: dict
+    ) -> BrowserContext:
+        """Новый контекст с context_options в процессе с launch_options."""
+        options = {k: v for k, v in launch_options.items() if k in _PROCESS_OPTIONS}
+        key = _options_key(options)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            host = self._free_host(key)
+            if host is None:
+                host = _Host(key, await AsyncNewBrowser(playwright, **options))
+                host.browser.on("disconnected", lambda _b, host=host: self._drop(host))
+                self._hosts.append(host)
+            if host.reaper is not None:
+                host.reaper.cancel()
+                host.reaper = None
+            context = await host.browser.new_context(**context_options)
+            host.contexts.add(context)
+            self._host_of[context] = host
+        return context
+
+    async def release(self, context: BrowserContext) -> None:
+        """Закрывает контекст; процесс остаётся для следующих профилей."""
+        host = self._host_of.pop(context, None)
+        try:
+            await context.close()
+        except Exception:
+            pass
+        if host is None:
+            return
+        host.contexts.discard(context)
+        if not host.contexts and host in self._hosts:
+            loop = asyncio.get_running_loop()
+            host.reaper = loop.call_later(
+                self._idle_ttl, lambda: loop.create_task(self._reap(host))
+            )
+
+    async def _reap(self, host: _Host) -> None:
+        if host.contexts or host not in self._hosts:
+            return
+        self._hosts.remove(host)
+        try:
+            await host.browser.close()
+        except Exception:
+            pass
+
+    def _free_host(self, key: Hashable) -> _Host | None:
+        for host in self._hosts:
+            if (
+                host.key == key
+                and len(host.contexts) < self._max_contexts
+                and host.browser.is_connected()
+            ):
+                return host
+        return None
+
+    def _drop(self, host: _Host) -> None:
+        # Процесс упал: его контексты уже закрыты (их лаунчеры получили close)
+        if host in self._hosts:
+            self._hosts.remove(host)
+        for context in host.contexts:
+            self._host_of.pop(context, None)
+        host.contexts.clear()
+        if host.reaper is not None:
+            host.reaper.cancel()
+
+    async def close(self) -> None:
+        """Закрывает все процессы пула."""
+        hosts, self._hosts = self._hosts, []
+        self._host_of.clear()
+        for host in hosts:
+            if host.reaper is not None:
+                host.reaper.cancel()
+            try:
+                await host.browser.close()
+            except Exception:
+                pass
+
+
+def _options_key(options: dict) -> Hashable:
+    return tuple(
+        sorted(
+            (k, tuple(v) if isinstance(v, list) else v) for k, v in options.items()
+        )
+    )
@@ -1,99 +1,176 @@
 """PySide6 GUI: профили в таблице, CRUD, экспорт/импорт, статус запуска."""
 
+import dataclasses
 import json
 import uuid
+from concurrent.futures import Future
+from concurrent.futures import wait as wait_futures
 from pathlib import Path
 
-from PySide6.QtCore import Qt, QThread, QTimer, Signal
+from PySide6.QtCore import (
+    QFileSystemWatcher,
+    QModelIndex,
+    QObject,
+    QSortFilterProxyModel,
+    Qt,
+    QThread,
+    QTimer,
+    Signal,
+)
 from PySide6.QtWidgets import (
     QApplication,
+    QComboBox,
     QDialog,
     QDialogButtonBox,
     QFileDialog,
     QFormLayout,
     QHBoxLayout,
     QHeaderView,
+    QInputDialog,
     QLabel,
     QLineEdit,
     QMainWindow,
     QMessageBox,
+    QProgressDialog,
     QPushButton,
-    QTableWidget,
-    QTableWidgetItem,
+    QSpinBox,
+    QTableView,
     QTextEdit,
     QVBoxLayout,
     QWidget,
 )
 
-from browser_automation.camoufox_launcher import CamoufoxLauncher
+from browser_automation.async_launcher import AsyncCamoufoxLauncher, LaunchEngine
+from browser_automation.context_pool import ContextPool
+from browser_automation.launch_scheduler import LaunchScheduler, LaunchState
+from browser_automation.profile_import import ImportProgress, stream_import
 from browser_automation.profile_repository import ProfileRepository
+from browser_automation.profile_table_model import COLUMN_NAME, ProfileTableModel
+from browser_automation.proxy import TrafficCollector, TunnelPool, XrayHub
+from browser_automation.snapshot import snapshot_path
+from browser_automation.storage import StaleProfileError
+from browser_automation.subscription import SubscriptionResult, import_subscription
 from browser_automation.value_objects import (
     PROFILE_VERSION,
+    STORAGE_EPHEMERAL,
+    STORAGE_PERSISTENT,
+    STORAGE_SNAPSHOT,
     CamoufoxSettings,
     Profile,
     ProxyConfig,
+    TunnelSettings,
 )
 
 DEFAULT_PROFILES_PATH = Path.home() / ".config" / "browser-automation" / "profiles.json"
 
 
-class LaunchWorker(QThread):
-    """Запуск Camoufox в отдельном потоке — избегает 'Sync API inside asyncio loop'."""
+class LaunchBridge(QObject):
+    """
+    Сигналы LaunchEngine и LaunchScheduler для GUI: колбэки приходят из чужих
+    потоков (цикл asyncio, таймер очереди), сигналы доставляются в поток окна.
+    """
+
+    launched = Signal(str, str)  # instance_id, profile_id
+    failed = Signal(str, str, str)  # instance_id, profile_name, error
+    closed = Signal(str)  # instance_id
+    state_changed = Signal(str, object)  # profile_id, LaunchState | None
+    invoke = Signal(object)  # функция, которую надо вызвать в потоке окна
+
+    def watch(self, instance_id: str, profile: Profile, future: Future) -> None:
+        def done(f: Future) -> None:
+            if f.cancelled():
+                return
+            error = f.exception()
+            if error is not None:
+                self.failed.emit(instance_id, profile.name, str(error))
+            else:
+                self.launched.emit(instance_id, profile.id)
 
-    finished = Signal(str, str, object)  # instance_id, profile_id, launcher
-    error = Signal(str, str)
-    browser_closed = Signal(str)  # instance_id
-    stop_requested = Signal()
+        future.add_done_callback(done)
 
-    def __init__(
-        self,
-        instance_id: str,
-        profile_id: str,
-        profile: Profile,
-        profiles_data_dir: Path,
-    ) -> None:
+
+class ImportWorker(QThread):
+    """Потоковый импорт файла в отдельном потоке — окно не замирает на больших файлах."""
+
+    progress = Signal(int, int)  # percent, records
+    done = Signal(object)  # ImportProgress
+    error = Signal(str)
+
+    def __init__(self, profiles_path: Path, file_path: Path) -> None:
         super().__init__()
-        self.instance_id = instance_id
-        self.profile_id = profile_id
-        self.profile = profile
-        self._profiles_data_dir = profiles_data_dir
-        self._launcher: CamoufoxLauncher | None = None
-        self._check_timer: QTimer | None = None
+        self._profiles_path = profiles_path
+        self._file_path = file_path
 
     def run(self) -> None:
+        # Своё подключение к хранилищу: репозиторий GUI увидит изменения по сигнатуре
+        repo = ProfileRepository(self._profiles_path)
         try:
-            data_dir = self._profiles_data_dir / self.profile_id
-            data_dir.mkdir(parents=True, exist_ok=True)
-            self._launcher = CamoufoxLauncher(profile=self.profile, data_dir=data_dir)
-            self._launcher.start()
-            self.finished.emit(self.instance_id, self.profile_id, self._launcher)
-            self.stop_requested.connect(
-                self._do_stop, Qt.ConnectionType.QueuedConnection
+            result = stream_import(
+                repo,
+                self._file_path,
+                progress=self._on_progress,
+                cancelled=self.isInterruptionRequested,
+            )
+        except Exception as e:
+            self.error.emit(str(e))
+            return
+        finally:
+            repo.close()
+        self.done.emit(result)
+
+    def _on_progress(self, p: ImportProgress) -> None:
+        self.progress.emit(p.percent, p.records)
+
+
+class UpgradeWorker(QThread):
+    """
+    Запись старых записей в текущей версии схемы порциями — в своём потоке
+    и со своим репозиторием: перезапись хранилища не держит окно.
+    """
+
+    BATCH_SIZE = 200
+
+    def __init__(self, profiles_path: Path) -> None:
+        super().__init__()
+        self._profiles_path = profiles_path
+
+    def run(self) -> None:
+        repo = ProfileRepository(self._profiles_path)
+        try:
+            while not self.isInterruptionRequested():
+                if repo.upgrade_pending(self.BATCH_SIZE):
+                    continue
+                if not repo.outdated_count():
+                    break
+                # Пачку изменили извне — перечитаем и попробуем позже
+                self.msleep(500)
+        finally:
+            repo.close()
+
+
+class SubscriptionWorker(QThread):
+    """Импорт подписки в отдельном потоке: замер задержки до серверов идёт по сети."""
+
+    done = Signal(object)  # SubscriptionResult
+    error = Signal(str)
+
+    def __init__(self, profiles_path: Path, blob: str) -> None:
+        super().__init__()
+        self._profiles_path = profiles_path
+        self._blob = blob
+
+    def run(self) -> None:
+        repo = ProfileRepository(self._profiles_path)
+        try:
+            result = import_subscription(
+                repo, self._blob, cancelled=self.isInterruptionRequested
             )
-            self._check_timer = QTimer()
-            self._check_timer.timeout.connect(self._check_browser_closed)
-            self._check_timer.start(2000)
         except Exception as e:
-            self.error.emit(self.profile.name, str(e))
+            self.error.emit(str(e))
             return
-        self.exec()
-
-    def _check_browser_closed(self) -> None:
-        """Браузер закрыт вручную — stop, quit."""
-        if self._launcher and not self._launcher.is_running():
-            if self._check_timer:
-                self._check_timer.stop()
-            self._launcher.stop()
-            self.browser_closed.emit(self.instance_id)
-            self.quit()
-
-    def _do_stop(self) -> None:
-        """Остановка по запросу."""
-        if self._check_timer:
-            self._check_timer.stop()
-        if self._launcher:
-            self._launcher.stop()
-        self.quit()
+        finally:
+            repo.close()
+        self.done.emit(result)
 
 
 class ProfileEditDialog(QDialog):
@@ -134,6 +211,36 @@ class ProfileEditDialog(QDialog):
         )
         form.addRow("Прокси port:", self.proxy_port)
 
+        self.mux_spin = QSpinBox()
+        self.mux_spin.setRange(0, 1024)
+        self.mux_spin.setSpecialValueText("выкл.")
+        self.mux_spin.setToolTip(
+            "Потоков на одно соединение с VLESS-сервером (mux xray). 0 — выключен."
+        )
+        form.addRow("Mux:", self.mux_spin)
+        self.dns_edit = QLineEdit()
+        self.dns_edit.setPlaceholderText(
+            "Через запятую, например 1.1.1.1, https://dns.google/dns-query. Пусто — системный."
+        )
+        form.addRow("DNS:", self.dns_edit)
+        self.direct_edit = QLineEdit()
+        self.direct_edit.setPlaceholderText(
+            "Домены мимо туннеля через запятую, например domain:example.com, geosite:private"
+        )
+        form.addRow("Напрямую:", self.direct_edit)
+
+        self.storage_combo = QComboBox()
+        self.storage_combo.addItem("Постоянное (папка профиля)", STORAGE_PERSISTENT)
+        self.storage_combo.addItem("Снимок (куки и хранилища)", STORAGE_SNAPSHOT)
+        self.storage_combo.addItem("Временное (общий процесс)", STORAGE_EPHEMERAL)
+        self.storage_combo.setToolTip(
+            "Снимок: без папки профиля Firefox — куки, localStorage и IndexedDB "
+            "сохраняются в сжатый файл при закрытии (кэш и история — нет).\n"
+            "Временное: вкладка в общем процессе Camoufox, куки и данные сайтов "
+            "удаляются при закрытии; отпечаток общий с соседями по процессу."
+        )
+        form.addRow("Хранилище:", self.storage_combo)
+
         layout.addLayout(form)
 
         if profile:
@@ -143,6 +250,17 @@ class ProfileEditDialog(QDialog):
             if profile.proxy_config:
                 self.proxy_host.setText(profile.proxy_config.host)
                 self.proxy_port.setText(str(profile.proxy_config.port))
+            if profile.tunnel_settings:
+                t = profile.tunnel_settings
+                self.mux_spin.setValue(t.mux_concurrency)
+                self.dns_edit.setText(", ".join(t.dns_servers))
+                self.direct_edit.setText(", ".join(t.direct_domains))
+            if profile.camoufox_settings:
+                index = self.storage_combo.findData(
+                    profile.camoufox_settings.storage_mode
+                )
+                if index >= 0:
+                    self.storage_combo.setCurrentIndex(index)
 
         bb = QDialogButtonBox(
             QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
@@ -175,22 +293,49 @@ class ProfileEditDialog(QDialog):
                     )
                 except ValueError:
                     pass
+        base = self._profile.tunnel_settings if self._profile else None
+        tunnel = TunnelSettings(
+            mux_concurrency=self.mux_spin.value(),
+            # XUDP в форме не настраивается — сохраняем значение из профиля
+            xudp_concurrency=base.xudp_concurrency if base else 0,
+            dns_servers=_split_list(self.dns_edit.text()),
+            direct_domains=_split_list(self.direct_edit.text()),
+        )
+        # Остальные настройки Camoufox в форме не редактируются — сохраняем из профиля
+        settings = dataclasses.replace(
+            (self._profile.camoufox_settings if self._profile else None)
+            or CamoufoxSettings(),
+            storage_mode=self.storage_combo.currentData(),
+        )
         return Profile(
             id=self._profile.id if self._profile else "",
             name=name,
             vless_raw=vless,
             proxy_config=proxy,
-            camoufox_settings=CamoufoxSettings(),
+            camoufox_settings=settings,
             version=getattr(self._profile, "version", PROFILE_VERSION)
             if self._profile
             else PROFILE_VERSION,
+            tunnel_settings=None if tunnel.is_default else tunnel,
         )
 
 
+def _split_list(text: str) -> tuple[str, ...]:
+    return tuple(item.strip() for item in text.split(",") if item.strip())
+
+
 class MainWindow(QMainWindow):
     """Главное окно: таблица профилей, панель действий."""
 
-    def __init__(self, profiles_path: Path | str = DEFAULT_PROFILES_PATH) -> None:
+    def __init__(
+        self,
+        profiles_path: Path | str = DEFAULT_PROFILES_PATH,
+        *,
+        shared_xray: bool = False,
+        tunnel_pool: int = 0,
+        max_parallel_launches: int | None = None,
+        min_free_memory_mb: int = 0,
+    ) -> None:
         super().__init__()
         self.setWindowTitle("Browser Automation — Профили")
         self.setMinimumSize(600, 450)
@@ -198,26 +343,73 @@ class MainWindow(QMainWindow):
         self._profiles_path = Path(profiles_path)
         self._repo = ProfileRepository(self._profiles_path)
         self._profiles_data_dir = self._profiles_path.parent / "profiles-data"
-        self._launchers: dict[str, CamoufoxLauncher] = {}
-        self._workers: dict[str, LaunchWorker] = {}
-        self._launch_workers: list[LaunchWorker] = []
+        # shared_xray — один xray на все запущенные профили вместо процесса на каждый
+        self._hub = XrayHub() if shared_xray else None
+        # tunnel_pool > 0 — столько готовых туннелей держать для повторных запусков
+        self._pool = TunnelPool(size=tunnel_pool) if tunnel_pool > 0 else None
+        # Трафик профилей через прокси — итоги за всё время рядом с профилями
+        self._traffic = TrafficCollector(self._profiles_path.parent / "traffic.json")
+        self._bridge = LaunchBridge(self)
+        # Слот окна (не lambda): вызов из чужого потока попадает в поток окна
+        self._bridge.invoke.connect(self._invoke)
+        # Все браузеры — в одном цикле asyncio; закрытие окна приходит событием
+        # Временные профили — контекстами в общих процессах Camoufox
+        self._engine = LaunchEngine(
+            on_closed=self._bridge.closed.emit, contexts=ContextPool()
+        )
+        self._engine_instances: dict[str, str] = {}  # instance_id → profile_id
+        self._bridge.launched.connect(self._on_engine_launched)
+        self._bridge.failed.connect(self._on_engine_failed)
+        self._bridge.closed.connect(self._on_engine_closed)
+        # Массовый запуск — волнами: не больше max_parallel_launches стартов сразу
+        self._scheduler = LaunchScheduler(
+            max_starting=max_parallel_launches,
+            min_free_memory=min_free_memory_mb * 1024 * 1024,
+            dispatch=self._bridge.invoke.emit,
+            on_state=self._bridge.state_changed.emit,
+        )
+        self._bridge.state_changed.connect(self._on_launch_state)
+        self._import_worker: ImportWorker | None = None
+        self._import_dialog: QProgressDialog | None = None
+        self._subscription_worker: SubscriptionWorker | None = None
 
         central = QWidget()
         self.setCentralWidget(central)
         layout = QVBoxLayout(central)
 
-        # Таблица
-        self.table = QTableWidget()
-        self.table.setColumnCount(2)
-        self.table.setHorizontalHeaderLabels(["Название", "ID"])
+        # Поиск по названию
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Поиск…")
+        self.search_edit.setClearButtonEnabled(True)
+        layout.addWidget(self.search_edit)
+
+        # Таблица: модель поверх репозитория, фильтр/сортировка — прокси-моделью
+        self.model = ProfileTableModel(self._repo, self)
+        self.proxy_model = QSortFilterProxyModel(self)
+        self.proxy_model.setSourceModel(self.model)
+        self.proxy_model.setFilterKeyColumn(COLUMN_NAME)
+        self.proxy_model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.search_edit.textChanged.connect(self.proxy_model.setFilterFixedString)
+
+        self.table = QTableView()
+        self.table.setModel(self.proxy_model)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(-1, Qt.SortOrder.AscendingOrder)
         self.table.horizontalHeader().setSectionResizeMode(
-            0, QHeaderView.ResizeMode.Stretch
+            COLUMN_NAME, QHeaderView.ResizeMode.Stretch
         )
-        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.table.setSelectionMode(QTableWidget.SelectionMode.ExtendedSelection)
+        # Фиксированная высота строк: без пересчёта размеров по содержимому
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(28)
+        self.table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QTableView.SelectionMode.ExtendedSelection)
         self.table.setAlternatingRowColors(True)
-        self.table.itemSelectionChanged.connect(self._on_selection_changed)
-        self.table.cellDoubleClicked.connect(self._on_cell_double_clicked)
+        self.table.selectionModel().selectionChanged.connect(
+            self._on_selection_changed
+        )
+        self.table.doubleClicked.connect(self._on_row_double_clicked)
+        # Удаление выделенных строк не вызывает selectionChanged
+        self.proxy_model.rowsRemoved.connect(self._on_selection_changed)
         layout.addWidget(self.table)
 
         # Панель действий
@@ -256,6 +448,11 @@ class MainWindow(QMainWindow):
         import_clip_btn.clicked.connect(self._import_from_clipboard)
         panel.addWidget(import_clip_btn)
 
+        subscription_btn = QPushButton("🔗 Подписка")
+        subscription_btn.clicked.connect(self._import_subscription)
+        self._subscription_btn = subscription_btn
+        panel.addWidget(subscription_btn)
+
         delete_btn = QPushButton("🗑️ Удалить")
         delete_btn.clicked.connect(self._delete_selected)
         self._delete_btn = delete_btn
@@ -269,33 +466,69 @@ class MainWindow(QMainWindow):
         self._launch_btn = launch_btn
         panel.addWidget(launch_btn)
 
+        cancel_btn = QPushButton("✖ Отменить запуск")
+        cancel_btn.setToolTip("Убрать выделенные профили из очереди запуска")
+        cancel_btn.clicked.connect(self._cancel_selected_launches)
+        self._cancel_btn = cancel_btn
+        panel.addWidget(cancel_btn)
+
         layout.addLayout(panel)
-        self._refresh_table()
         self._on_selection_changed()
 
-    def _refresh_table(self) -> None:
-        self.table.setRowCount(0)
-        for p in self._repo.list_all():
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(p.name))
-            id_item = QTableWidgetItem(p.id[:12] + "…")
-            id_item.setData(Qt.ItemDataRole.UserRole, p.id)
-            self.table.setItem(row, 1, id_item)
-            self.table.setRowHeight(row, 28)
+        # Изменения хранилища другими процессами и скриптами
+        self._watch_debounce = QTimer(self)
+        self._watch_debounce.setSingleShot(True)
+        self._watch_debounce.setInterval(250)
+        self._watch_debounce.timeout.connect(self._on_storage_settled)
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_storage_file_changed)
+        self._watcher.directoryChanged.connect(self._on_storage_file_changed)
+        self._watch_storage()
+
+        # Фоновое обновление старых записей до текущей версии схемы — в своём потоке
+        self._upgrade_worker: UpgradeWorker | None = None
+        if self._repo.outdated_count():
+            self._upgrade_worker = UpgradeWorker(self._profiles_path)
+            self._upgrade_worker.finished.connect(self._on_upgrade_finished)
+            self._upgrade_worker.start()
+
+        # Колонка «Трафик»: итоги читаются из TrafficCollector, опрос xray — в его потоке
+        self.model.set_traffic(self._traffic.totals())
+        self._traffic_timer = QTimer(self)
+        self._traffic_timer.timeout.connect(
+            lambda: self.model.set_traffic(self._traffic.totals())
+        )
+        self._traffic_timer.start(2000)
+
+    def _watch_storage(self) -> None:
+        """(Пере)подписывает наблюдатель: атомарная замена файла снимает с него слежение."""
+        watched = set(self._watcher.files()) | set(self._watcher.directories())
+        paths = [str(p) for p in self._repo.watch_paths() if p.exists()]
+        paths.append(str(self._profiles_path.parent))
+        missing = [p for p in paths if p not in watched]
+        if missing:
+            self._watcher.addPaths(missing)
+
+    def _on_storage_file_changed(self, _path: str) -> None:
+        # Несколько событий подряд (tmp, rename, -wal) — одно перечитывание
+        self._watch_debounce.start()
+
+    def _on_storage_settled(self) -> None:
+        self._watch_storage()
+        self._repo.refresh()
+
+    def _on_upgrade_finished(self) -> None:
+        self._upgrade_worker = None
+        self._repo.refresh()
+
+    def _profile_id_at(self, index: QModelIndex) -> str:
+        return self.model.profile_id(self.proxy_model.mapToSource(index).row())
 
     def _selected_ids(self) -> list[str]:
-        ids = []
-        for item in self.table.selectedItems():
-            row = item.row()
-            id_cell = self.table.item(row, 1)
-            if id_cell:
-                pid = id_cell.data(Qt.ItemDataRole.UserRole)
-                if pid and pid not in ids:
-                    ids.append(pid)
-        return ids
-
-    def _on_selection_changed(self) -> None:
+        rows = self.table.selectionModel().selectedRows()
+        return [self._profile_id_at(index) for index in rows]
+
+    def _on_selection_changed(self, *_args) -> None:
         ids = self._selected_ids()
         has_sel = len(ids) > 0
         single_sel = len(ids) == 1
@@ -305,13 +538,13 @@ class MainWindow(QMainWindow):
         self._export_btn.setEnabled(has_sel)
         self._delete_btn.setEnabled(has_sel)
         self._launch_btn.setEnabled(has_sel)
+        self._cancel_btn.setEnabled(
+            any(self._scheduler.state(pid) == LaunchState.QUEUED for pid in ids)
+        )
 
-    def _on_cell_double_clicked(self, row: int, _col: int) -> None:
-        id_cell = self.table.item(row, 1)
-        if id_cell:
-            pid = id_cell.data(Qt.ItemDataRole.UserRole)
-            if pid:
-                self._edit_profile(pid)
+    def _on_row_double_clicked(self, index: QModelIndex) -> None:
+        if index.isValid():
+            self._edit_profile(self._profile_id_at(index))
 
     def _edit_selected(self) -> None:
         ids = self._selected_ids()
@@ -323,7 +556,6 @@ class MainWindow(QMainWindow):
         if dlg.exec() == QDialog.DialogCode.Accepted:
             p = dlg.profile()
             self._repo.create(p)
-            self._refresh_table()
             QMessageBox.information(self, "Готово", f"Профиль «{p.name}» создан.")
 
     def _edit_profile(self, profile_id: str) -> None:
@@ -340,33 +572,37 @@ class MainWindow(QMainWindow):
                 proxy_config=new_p.proxy_config,
                 camoufox_settings=new_p.camoufox_settings,
                 version=p.version,
+                revision=p.revision,
+                tunnel_settings=new_p.tunnel_settings,
             )
-            self._repo.update(new_p)
-            self._refresh_table()
+            try:
+                self._repo.update(new_p)
+            except StaleProfileError as e:
+                self._repo.refresh()
+                QMessageBox.warning(self, "Профиль изменён", str(e))
+                return
             QMessageBox.information(self, "Готово", f"Профиль «{new_p.name}» обновлён.")
 
     def _duplicate_selected(self) -> None:
-        for pid in self._selected_ids():
-            new_p = self._repo.copy(pid)
-            if new_p:
-                QMessageBox.information(
-                    self, "Готово", f"Скопировано как «{new_p.name}»."
-                )
-        self._refresh_table()
-
-    def _export_profile_data(self, pid: str) -> dict | None:
-        """Экспорт метаданных профиля (id, name, proxy, vless, camoufox)."""
-        p = self._repo.get(pid)
-        if not p:
-            return None
-        return p.to_dict()
+        copies = [p for p in self._repo.copy_many(self._selected_ids()).values() if p]
+        if copies:
+            QMessageBox.information(
+                self,
+                "Готово",
+                f"Скопировано {len(copies)} профиль(ей): "
+                + ", ".join(f"«{p.name}»" for p in copies[:5])
+                + (" …" if len(copies) > 5 else ""),
+            )
 
-    def _export_to_clipboard(self) -> None:
+    def _export_selected_data(self) -> list[dict]:
+        """Экспорт метаданных выделенных профилей (id, name, proxy, vless, camoufox)."""
         ids = self._selected_ids()
         if not ids:
-            return
-        data = [self._export_profile_data(pid) for pid in ids]
-        data = [d for d in data if d]
+            return []
+        return [d for d in self._repo.export_many(ids).values() if d]
+
+    def _export_to_clipboard(self) -> None:
+        data = self._export_selected_data()
         if not data:
             return
         text = json.dumps(data, ensure_ascii=False, indent=2)
@@ -376,11 +612,7 @@ class MainWindow(QMainWindow):
         )
 
     def _export_to_file(self) -> None:
-        ids = self._selected_ids()
-        if not ids:
-            return
-        data = [self._export_profile_data(pid) for pid in ids]
-        data = [d for d in data if d]
+        data = self._export_selected_data()
         if not data:
             return
         path, _ = QFileDialog.getSaveFileName(self, "Экспорт", "", "JSON (*.json)")
@@ -392,22 +624,109 @@ class MainWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", str(e))
 
+    def _import_data(self, data: list | dict) -> str:
+        """Импорт одной пачкой. Возвращает текст итога для пользователя."""
+        results = self._repo.import_many(data if isinstance(data, list) else [data])
+        errors = [r for r in results if not r.ok]
+        msg = f"Импортировано профилей: {len(results) - len(errors)}."
+        if errors:
+            msg += f"\nПропущено с ошибками: {len(errors)}\n" + "\n".join(
+                f"#{r.index + 1}: {r.error}" for r in errors[:5]
+            )
+        return msg
+
     def _import_from_file(self) -> None:
-        path, _ = QFileDialog.getOpenFileName(self, "Импорт", "", "JSON (*.json)")
+        if self._import_worker is not None:
+            return
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Импорт", "", "JSON (*.json *.ndjson *.jsonl)"
+        )
         if not path:
             return
-        try:
-            raw = Path(path).read_text()
-            data = json.loads(raw)
-            if isinstance(data, list):
-                for d in data:
-                    self._repo.import_profile(d)
-            else:
-                self._repo.import_profile(data)
-            self._refresh_table()
-            QMessageBox.information(self, "Готово", "Импорт выполнен.")
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка импорта", str(e))
+        dlg = QProgressDialog("Импорт профилей…", "Отмена", 0, 100, self)
+        dlg.setWindowTitle("Импорт")
+        dlg.setMinimumDuration(300)
+        worker = ImportWorker(self._profiles_path, Path(path))
+        # Слоты — методы окна, чтобы сигналы из потока доставлялись в GUI-поток
+        worker.progress.connect(self._on_import_progress)
+        worker.done.connect(self._on_import_done)
+        worker.error.connect(self._on_import_error)
+        worker.finished.connect(self._on_import_worker_finished)
+        dlg.canceled.connect(worker.requestInterruption)
+        self._import_worker = worker
+        self._import_dialog = dlg
+        worker.start()
+
+    def _on_import_progress(self, percent: int, records: int) -> None:
+        if self._import_dialog:
+            self._import_dialog.setValue(percent)
+            self._import_dialog.setLabelText(f"Импорт профилей… записей: {records}")
+
+    def _on_import_error(self, msg: str) -> None:
+        QMessageBox.critical(self, "Ошибка импорта", msg)
+
+    def _on_import_done(self, result: ImportProgress) -> None:
+        msg = f"Импортировано профилей: {result.imported}."
+        if result.failed:
+            msg += f"\nПропущено с ошибками: {result.failed}\n" + "\n".join(
+                result.errors[:5]
+            )
+        QMessageBox.information(self, "Готово", msg)
+
+    def _on_import_worker_finished(self) -> None:
+        if self._import_dialog:
+            self._import_dialog.close()
+        self._import_dialog = None
+        self._import_worker = None
+        self._repo.refresh()
+
+    def _import_subscription(self) -> None:
+        if self._subscription_worker is not None:
+            return
+        blob, ok = QInputDialog.getMultiLineText(
+            self,
+            "Подписка",
+            "Подписка (base64) или ссылки vless://, по одной на строку:",
+            QApplication.clipboard().text(),
+        )
+        if not ok or not blob.strip():
+            return
+        worker = SubscriptionWorker(self._profiles_path, blob)
+        worker.done.connect(self._on_subscription_done)
+        worker.error.connect(self._on_subscription_error)
+        worker.finished.connect(self._on_subscription_worker_finished)
+        self._subscription_worker = worker
+        self._subscription_btn.setEnabled(False)
+        self._subscription_btn.setText("🔗 Замер серверов…")
+        worker.start()
+
+    def _on_subscription_done(self, result: SubscriptionResult) -> None:
+        unreachable = sum(1 for e in result.ranked if not e.ok)
+        msg = (
+            f"Серверов: {len(result.ranked)}, недоступно: {unreachable}.\n"
+            f"Создано профилей: {len(result.created)}, "
+            f"обновлено: {len(result.updated)}."
+        )
+        if result.duplicates:
+            msg += f"\nДублей пропущено: {result.duplicates}."
+        if result.invalid:
+            msg += f"\nНе разобрано ссылок: {len(result.invalid)}."
+        fastest = [e for e in result.ranked if e.ok][:5]
+        if fastest:
+            msg += "\n\nБыстрые:\n" + "\n".join(
+                f"{e.vless.name or e.vless.host} — {e.latency * 1000:.0f} мс"
+                for e in fastest
+            )
+        QMessageBox.information(self, "Подписка", msg)
+
+    def _on_subscription_error(self, msg: str) -> None:
+        QMessageBox.critical(self, "Ошибка подписки", msg)
+
+    def _on_subscription_worker_finished(self) -> None:
+        self._subscription_worker = None
+        self._subscription_btn.setEnabled(True)
+        self._subscription_btn.setText("🔗 Подписка")
+        self._repo.refresh()
 
     def _import_from_clipboard(self) -> None:
         text = QApplication.clipboard().text()
@@ -415,14 +734,8 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Буфер обмена пуст.")
             return
         try:
-            data = json.loads(text)
-            if isinstance(data, list):
-                for d in data:
-                    self._repo.import_profile(d)
-            else:
-                self._repo.import_profile(data)
-            self._refresh_table()
-            QMessageBox.information(self, "Готово", "Импорт из буфера выполнен.")
+            msg = self._import_data(json.loads(text))
+            QMessageBox.information(self, "Готово", msg)
         except Exception as e:
             QMessageBox.critical(self, "Ошибка импорта", str(e))
 
@@ -430,94 +743,152 @@ class MainWindow(QMainWindow):
         ids = self._selected_ids()
         if not ids:
             return
-        names = [self._repo.get(pid).name for pid in ids if self._repo.get(pid)]
+        # В вопросе — пять названий: краткие строки, без разбора профилей
+        summaries = (self._repo.get_summary(pid) for pid in ids[:5])
+        names = [s.name for s in summaries if s]
         if (
             QMessageBox.question(
                 self,
                 "Удалить?",
                 f"Удалить {len(ids)} профиль(ей)? Браузеры будут закрыты.\n"
-                + ", ".join(names[:5])
-                + (" …" if len(names) > 5 else ""),
+                + ", ".join(names)
+                + (" …" if len(ids) > 5 else ""),
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
                 QMessageBox.StandardButton.No,
             )
             != QMessageBox.StandardButton.Yes
         ):
             return
-        workers_to_wait = []
-        for instance_id, worker in list(self._workers.items()):
-            if worker.profile_id in ids:
-                launcher = self._launchers.pop(instance_id, None)
-                self._workers.pop(instance_id, None)
-                if worker and launcher:
-                    worker.stop_requested.emit()
-                    workers_to_wait.append(worker)
-                elif launcher:
-                    launcher.stop()
-        for w in workers_to_wait:
-            w.wait(5000)
+        # Стартующий сейчас профиль не станет «запущен» после удаления
         for pid in ids:
-            self._repo.delete(pid)
-        self._refresh_table()
+            self._scheduler.forget(pid)
+        id_set = set(ids)
+        instances = [
+            iid for iid, pid in self._engine_instances.items() if pid in id_set
+        ]
+        wait_futures([self._engine.stop(iid) for iid in instances], timeout=10)
+        for iid in instances:
+            del self._engine_instances[iid]
+        self._repo.delete_many(ids)
         QMessageBox.information(self, "Готово", "Профили удалены.")
 
     def _launch_selected(self) -> None:
         ids = self._selected_ids()
         if not ids:
             return
+        active = 0
         for pid in ids:
-            p = self._repo.get(pid)
-            if not p:
+            # Уже в очереди, стартует или запущен: второй браузер на тот же каталог не нужен
+            if self._scheduler.state(pid) is not None:
+                active += 1
                 continue
-            instance_id = str(uuid.uuid4())
-            worker = LaunchWorker(instance_id, pid, p, self._profiles_data_dir)
-            worker.finished.connect(self._on_launch_finished)
-            worker.error.connect(self._on_launch_error)
-            worker.browser_closed.connect(self._on_browser_closed)
-            self._launch_workers.append(worker)
-            worker.start()
-
-    def _on_launch_finished(
-        self, instance_id: str, profile_id: str, launcher: CamoufoxLauncher
-    ) -> None:
-        self._launchers[instance_id] = launcher
-        worker = self.sender()
-        if isinstance(worker, LaunchWorker):
-            self._workers[instance_id] = worker
-            if worker in self._launch_workers:
-                self._launch_workers.remove(worker)
-        self._refresh_table()
+            p = self._repo.get(pid)
+            if p:
+                self._scheduler.submit(pid, lambda p=p: self._start_launch(p))
+        if active:
+            self.statusBar().showMessage(f"Уже запущены или в очереди: {active}", 3000)
+        elif self._scheduler.pending():
+            self.statusBar().showMessage(
+                f"В очереди на запуск: {self._scheduler.pending()}", 3000
+            )
+        self._on_selection_changed()
+
+    def _invoke(self, fn) -> None:
+        fn()
+
+    def _cancel_selected_launches(self) -> None:
+        cancelled = sum(self._scheduler.cancel(pid) for pid in self._selected_ids())
+        if cancelled:
+            self.statusBar().showMessage(f"Запусков отменено: {cancelled}", 3000)
+        self._on_selection_changed()
+
+    def _on_launch_state(self, profile_id: str, state: LaunchState | None) -> None:
+        self.model.set_launch_state(profile_id, state)
+        if state != LaunchState.QUEUED:
+            self._on_selection_changed()
+
+    def _start_launch(self, p: Profile) -> Future:
+        """Начинает запуск профиля (вызывает очередь); Future — браузер поднят."""
+        instance_id = str(uuid.uuid4())
+        data_dir = snapshot = None
+        mode = (p.camoufox_settings or CamoufoxSettings()).storage_mode
+        if mode == STORAGE_PERSISTENT:
+            data_dir = self._profiles_data_dir / p.id
+            data_dir.mkdir(parents=True, exist_ok=True)
+        elif mode == STORAGE_SNAPSHOT:
+            snapshot = snapshot_path(self._profiles_data_dir, p.id)
+        launcher = AsyncCamoufoxLauncher(
+            profile=p,
+            data_dir=data_dir,
+            snapshot=snapshot,
+            contexts=self._engine.contexts if mode == STORAGE_EPHEMERAL else None,
+            hub=self._hub,
+            pool=self._pool,
+            traffic=self._traffic,
+        )
+        self._engine_instances[instance_id] = p.id
+        future = self._engine.submit(instance_id, launcher)
+        self._bridge.watch(instance_id, p, future)
+        return future
+
+    def _on_engine_launched(self, instance_id: str, profile_id: str) -> None:
         p = self._repo.get(profile_id)
         name = p.name if p else profile_id
         self.statusBar().showMessage(f"Браузер запущен: {name}", 3000)
 
-    def _on_browser_closed(self, instance_id: str) -> None:
-        """Браузер закрыт вручную."""
-        self._launchers.pop(instance_id, None)
-        self._workers.pop(instance_id, None)
-
-    def _on_launch_error(self, profile_name: str, error_msg: str) -> None:
-        worker = self.sender()
-        if isinstance(worker, LaunchWorker) and worker in self._launch_workers:
-            self._launch_workers.remove(worker)
+    def _on_engine_failed(
+        self, instance_id: str, profile_name: str, error_msg: str
+    ) -> None:
+        self._engine_instances.pop(instance_id, None)
         QMessageBox.critical(self, "Ошибка запуска", f"{profile_name}: {error_msg}")
 
+    def _on_engine_closed(self, instance_id: str) -> None:
+        """Браузер закрыт вручную."""
+        pid = self._engine_instances.pop(instance_id, None)
+        if pid is not None:
+            self._scheduler.finished(pid)
+
     def closeEvent(self, event) -> None:
-        workers_to_wait = []
-        for instance_id in list(self._launchers.keys()):
-            launcher = self._launchers.get(instance_id)
-            worker = self._workers.get(instance_id)
-            if worker and launcher:
-                worker.stop_requested.emit()
-                workers_to_wait.append(worker)
-        # Ждём завершения воркеров, обрабатывая события — иначе окно не закрывается
-        for _ in range(50):
-            if all(not w.isRunning() for w in workers_to_wait):
-                break
-            QApplication.processEvents()
-            QThread.msleep(100)
-        self._launchers.clear()
-        self._workers.clear()
+        self._scheduler.close()
+        # Закрывает все браузеры (куки persistent-профилей сохраняются) и туннели
+        self._engine.shutdown()
+        self._engine_instances.clear()
+        self._watcher.blockSignals(True)
+        self._watch_debounce.stop()
+        if self._upgrade_worker is not None:
+            self._upgrade_worker.finished.disconnect(self._on_upgrade_finished)
+            self._upgrade_worker.requestInterruption()
+            self._upgrade_worker.wait()
+        # Замер подписки не прерывается: ждём его конца, профили при отмене не пишутся
+        if self._subscription_worker is not None:
+            worker = self._subscription_worker
+            worker.finished.disconnect(self._on_subscription_worker_finished)
+            worker.done.disconnect(self._on_subscription_done)
+            worker.error.disconnect(self._on_subscription_error)
+            worker.requestInterruption()
+            worker.wait()
+            self._subscription_worker = None
+        # Импорт прерывается на границе пачки: прочитанное записывается одной записью
+        if self._import_worker is not None:
+            worker = self._import_worker
+            worker.finished.disconnect(self._on_import_worker_finished)
+            worker.progress.disconnect(self._on_import_progress)
+            worker.done.disconnect(self._on_import_done)
+            worker.error.disconnect(self._on_import_error)
+            worker.requestInterruption()
+            worker.wait()
+            self._import_worker = None
+            if self._import_dialog:
+                self._import_dialog.close()
+                self._import_dialog = None
+        self._traffic_timer.stop()
+        self._traffic.stop()
+        self.model.detach()
+        self._repo.close()
+        if self._hub:
+            self._hub.stop()
+        if self._pool:
+            self._pool.close()
         event.accept()
 
 
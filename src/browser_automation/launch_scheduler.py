@@ -0,0 +1,254 @@
+"""Очередь массовых запусков: ограничение одновременных стартов, приоритеты, допуск по ресурсам."""
+
+import heapq
+import itertools
+import os
+import threading
+from collections import Counter
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from enum import StrEnum
+
+
+class LaunchState(StrEnum):
+    QUEUED = "queued"
+    STARTING = "starting"
+    RUNNING = "running"
+
+
+# Запуск: начинает старт и возвращает Future, завершающийся, когда браузер поднят
+StartFn = Callable[[], Future]
+# Как вызвать старт (например, в потоке GUI); по умолчанию — сразу
+Dispatch = Callable[[Callable[[], None]], object]
+# Смена состояния профиля; None — не в очереди и не запущен
+StateCallback = Callable[[str, LaunchState | None], object]
+
+
+@dataclass(order=True)
+class _Job:
+    sort_key: tuple[int, int]
+    key: str = field(compare=False)
+    start: StartFn = field(compare=False)
+    cancelled: bool = field(default=False, compare=False)
+
+
+def available_memory() -> int | None:
+    """MemAvailable из /proc/meminfo, байт; None — недоступно (не Linux)."""
+    try:
+        with open("/proc/meminfo", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def load_per_cpu() -> float | None:
+    """Средняя загрузка за минуту на одно ядро; None — недоступно (Windows)."""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (OSError, AttributeError):
+        return None
+
+
+def default_max_starting() -> int:
+    """Половина ядер, но не меньше двух: xray и Firefox на старте грузят CPU и диск."""
+    return max(2, (os.cpu_count() or 2) // 2)
+
+
+class LaunchScheduler:
+    """
+    Запуски идут волнами: одновременно стартует не больше max_starting профилей,
+    следующий — когда предыдущий поднялся или упал. Очередь приоритетная
+    (больше priority — раньше, при равных — в порядке submit()).
+    Допуск: следующий старт откладывается, пока свободной памяти меньше
+    min_free_memory байт или загрузка на ядро выше max_load — но один старт
+    разрешается всегда, иначе очередь встанет навсегда. Проверка повторяется
+    раз в recheck_interval секунд.
+    Ключ — обычно id профиля; состояние (queued/starting/running) сообщается
+    в on_state из того потока, где оно изменилось. Ключ в любом из этих
+    состояний повторно не принимается: у профиля один браузер на каталог.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_starting: int | None = None,
+        min_free_memory: int = 0,
+        max_load: float | None = None,
+        dispatch: Dispatch | None = None,
+        on_state: StateCallback | None = None,
+        recheck_interval: float = 1.0,
+    ) -> None:
+        self._max_starting = max(1, max_starting or default_max_starting())
+        self._min_free_memory = min_free_memory
+        self._max_load = max_load
+        self._dispatch = dispatch or (lambda fn: fn())
+        self._on_state = on_state
+        self._recheck_interval = recheck_interval
+        self._queue: list[_Job] = []
+        self._queued: dict[str, _Job] = {}
+        self._starting: set[str] = set()
+        self._running: Counter[str] = Counter()
+        # Забытые (удалённые) ключи, чей старт ещё идёт: итог старта не учитывается
+        self._forgotten: set[str] = set()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._closed = False
+
+    def submit(self, key: str, start: StartFn, *, priority: int = 0) -> bool:
+        """Ставит запуск в очередь. False — key уже в очереди, стартует или запущен."""
+        with self._lock:
+            # Забытый ключ ещё занимает место стартующего — до конца его старта тоже нет
+            if (
+                self._closed
+                or key in self._starting
+                or self._state_locked(key) is not None
+            ):
+                return False
+            job = _Job((-priority, next(self._seq)), key, start)
+            heapq.heappush(self._queue, job)
+            self._queued[key] = job
+        self._notify(key, LaunchState.QUEUED)
+        self._pump()
+        return True
+
+    def cancel(self, key: str) -> bool:
+        """Убирает запуск из очереди (уже стартующий не прерывается)."""
+        with self._lock:
+            job = self._queued.pop(key, None)
+            if job is None:
+                return False
+            job.cancelled = True
+        self._notify(key, self._state_after(key))
+        return True
+
+    def forget(self, key: str) -> None:
+        """
+        Профиль key удалён: убирает его из очереди и из запущенных; если он
+        стартует, завершение старта уже не сделает его запущенным.
+        """
+        with self._lock:
+            job = self._queued.pop(key, None)
+            if job is not None:
+                job.cancelled = True
+            if key in self._starting:
+                self._forgotten.add(key)
+            self._running.pop(key, None)
+        self._notify(key, None)
+
+    def cancel_all(self) -> list[str]:
+        """Убирает из очереди все ожидающие запуски, возвращает их ключи."""
+        with self._lock:
+            keys = list(self._queued)
+        return [key for key in keys if self.cancel(key)]
+
+    def finished(self, key: str) -> None:
+        """Запущенный браузер key закрыт."""
+        with self._lock:
+            if self._running[key] > 0:
+                self._running[key] -= 1
+            if self._running[key] <= 0:
+                del self._running[key]
+        self._notify(key, self._state_after(key))
+
+    def state(self, key: str) -> LaunchState | None:
+        with self._lock:
+            return self._state_locked(key)
+
+    def pending(self) -> int:
+        """Сколько запусков ждёт в очереди."""
+        return len(self._queued)
+
+    def close(self) -> None:
+        """Отменяет ожидающие запуски; стартующие доводятся до конца."""
+        self.cancel_all()
+        with self._lock:
+            self._closed = True
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+
+    def _state_locked(self, key: str) -> LaunchState | None:
+        if key in self._forgotten:
+            return None
+        if key in self._starting:
+            return LaunchState.STARTING
+        if key in self._queued:
+            return LaunchState.QUEUED
+        if self._running.get(key):
+            return LaunchState.RUNNING
+        return None
+
+    def _state_after(self, key: str) -> LaunchState | None:
+        with self._lock:
+            return self._state_locked(key)
+
+    def _admitted(self) -> bool:
+        if not self._starting:
+            return True
+        if self._min_free_memory:
+            free = available_memory()
+            if free is not None and free < self._min_free_memory:
+                return False
+        if self._max_load is not None:
+            load = load_per_cpu()
+            if load is not None and load > self._max_load:
+                return False
+        return True
+
+    def _pump(self) -> None:
+        """Запускает из очереди, пока есть свободные места и допуск."""
+        while True:
+            with self._lock:
+                if self._closed or len(self._starting) >= self._max_starting:
+                    return
+                while self._queue and self._queue[0].cancelled:
+                    heapq.heappop(self._queue)
+                if not self._queue:
+                    return
+                if not self._admitted():
+                    self._schedule_recheck()
+                    return
+                job = heapq.heappop(self._queue)
+                del self._queued[job.key]
+                self._starting.add(job.key)
+            self._notify(job.key, LaunchState.STARTING)
+            self._dispatch(lambda job=job: self._run(job))
+
+    def _schedule_recheck(self) -> None:
+        if self._timer is not None and self._timer.is_alive():
+            return
+        self._timer = threading.Timer(self._recheck_interval, self._pump)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _run(self, job: _Job) -> None:
+        try:
+            future = job.start()
+        except Exception:
+            self._started(job.key, ok=False)
+            raise
+        future.add_done_callback(
+            lambda f: self._started(
+                job.key, ok=not f.cancelled() and f.exception() is None
+            )
+        )
+
+    def _started(self, key: str, *, ok: bool) -> None:
+        with self._lock:
+            self._starting.discard(key)
+            forgotten = key in self._forgotten
+            self._forgotten.discard(key)
+            if ok and not forgotten:
+                self._running[key] += 1
+        if not forgotten:
+            self._notify(key, self._state_after(key))
+        self._pump()
+
+    def _notify(self, key: str, state: LaunchState | None) -> None:
+        if self._on_state is not None:
+            self._on_state(key, state)
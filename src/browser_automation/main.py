@@ -6,10 +6,22 @@ from pathlib import Path
 DEFAULT_PROFILES_PATH = Path.home() / ".config" / "browser-automation" / "profiles.json"
 
 
-def main(profiles_path: Path | str | None = None) -> None:
+def main(
+    profiles_path: Path | str | None = None,
+    *,
+    shared_xray: bool = False,
+    tunnel_pool: int = 0,
+    max_parallel_launches: int | None = None,
+    min_free_memory_mb: int = 0,
+) -> None:
     """
     Запуск GUI.
     Путь к profiles.json задаётся в init (по умолчанию ~/.config/browser-automation/profiles.json).
+    shared_xray=True — один общий xray на все запущенные профили.
+    tunnel_pool=N — держать до N готовых VLESS-туннелей для повторных запусков.
+    max_parallel_launches — сколько профилей стартует одновременно при массовом
+    запуске (None — половина ядер, не меньше двух); min_free_memory_mb — не начинать
+    следующий старт, пока свободной памяти меньше.
     Ctrl+C в терминале — завершение приложения.
     """
     from browser_automation.gui_main import MainWindow
@@ -18,7 +30,13 @@ def main(profiles_path: Path | str | None = None) -> None:
 
     path = profiles_path or DEFAULT_PROFILES_PATH
     app = QApplication([])
-    win = MainWindow(profiles_path=path)
+    win = MainWindow(
+        profiles_path=path,
+        shared_xray=shared_xray,
+        tunnel_pool=tunnel_pool,
+        max_parallel_launches=max_parallel_launches,
+        min_free_memory_mb=min_free_memory_mb,
+    )
     win.show()
 
     def _on_sigint(*_args):
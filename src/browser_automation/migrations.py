@@ -0,0 +1,86 @@
+"""Миграции схемы записей профиля (версия — PROFILE_VERSION)."""
+
+import copy
+import time
+from collections.abc import Callable
+
+from browser_automation.value_objects import PROFILE_VERSION
+
+# Версия записей без поля "version" — сохранённых до появления версий схемы
+LEGACY_VERSION = 0
+
+Migration = Callable[[dict], dict]
+
+# from_version → шаг from_version → from_version + 1
+_MIGRATIONS: dict[int, Migration] = {}
+
+
+def migration(from_version: int) -> Callable[[Migration], Migration]:
+    """Регистрирует шаг миграции from_version → from_version + 1."""
+
+    def register(fn: Migration) -> Migration:
+        if from_version in _MIGRATIONS:
+            raise ValueError(f"Миграция с версии {from_version} уже зарегистрирована")
+        _MIGRATIONS[from_version] = fn
+        return fn
+
+    return register
+
+
+def record_version(d: dict) -> int:
+    """Версия схемы записи."""
+    return int(d.get("version", LEGACY_VERSION))
+
+
+def needs_upgrade(d: dict) -> bool:
+    return record_version(d) < PROFILE_VERSION
+
+
+def upgrade(d: dict) -> dict:
+    """
+    Поднимает запись до PROFILE_VERSION по цепочке шагов. Исходный словарь не меняется.
+    Запись новее приложения возвращается как есть.
+    """
+    version = record_version(d)
+    if version >= PROFILE_VERSION:
+        return d
+    d = copy.deepcopy(d)
+    while version < PROFILE_VERSION:
+        step = _MIGRATIONS.get(version)
+        if step is None:
+            raise ValueError(f"Нет миграции профиля с версии {version}")
+        d = step(d)
+        version += 1
+        d["version"] = version
+    return d
+
+
+@migration(LEGACY_VERSION)
+def _legacy_to_v1(d: dict) -> dict:
+    """Записи без версии: порт прокси строкой, window списком любой длины."""
+    proxy = d.get("proxy")
+    if proxy and "port" in proxy:
+        proxy["port"] = int(proxy["port"])
+    camo = d.get("camoufox")
+    if camo and camo.get("window") and len(camo["window"]) != 2:
+        camo["window"] = None
+    return d
+
+
+def bench(count: int = 100_000) -> float:
+    """
+    Бенчмарк: стоимость upgrade() одной записи самой старой версии, мкс.
+    python -c "from browser_automation.migrations import bench; print(bench())"
+    """
+    record = {
+        "id": "00000000-0000-0000-0000-000000000000",
+        "name": "bench",
+        "proxy": {"host": "127.0.0.1", "port": "10808"},
+        "vless_raw": "vless://00000000-0000-0000-0000-000000000000@example.com:443",
+        "camoufox": {"headless": False, "window": [1280, 800]},
+    }
+    start = time.perf_counter()
+    for _ in range(count):
+        upgrade(record)
+    return (time.perf_counter() - start) / count * 1e6
+
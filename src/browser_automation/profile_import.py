@@ -0,0 +1,220 @@
+"""Потоковый импорт профилей из больших файлов экспорта (JSON-массив или NDJSON)."""
+
+import argparse
+import codecs
+import json
+import sys
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from browser_automation.profile_repository import ImportResult, ProfileRepository
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_BATCH_SIZE = 500
+MAX_ERRORS = 20
+# Запись больше этого — ошибка, а не повод дочитывать файл в память
+MAX_RECORD_SIZE = 16 * 1024 * 1024
+
+_WHITESPACE = " \t\r\n"
+_TOKEN_CHARS = frozenset("0123456789+-.eEtruefalsn")
+
+
+@dataclass
+class ImportProgress:
+    """Прогресс импорта. errors — первые MAX_ERRORS ошибок вида «#N: текст»."""
+
+    total_bytes: int = 0
+    bytes_read: int = 0
+    records: int = 0
+    imported: int = 0
+    failed: int = 0
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def percent(self) -> int:
+        if not self.total_bytes:
+            return 100
+        return min(100, self.bytes_read * 100 // self.total_bytes)
+
+
+class _Reader:
+    """Читает байты кусками, декодирует UTF-8 (с BOM) и считает прочитанные байты."""
+
+    def __init__(self, f: BinaryIO, chunk_size: int) -> None:
+        self._f = f
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.bytes_read = 0
+        self.eof = False
+
+    def read(self) -> str:
+        chunk = self._f.read(self._chunk_size)
+        self.bytes_read += len(chunk)
+        if not chunk:
+            self.eof = True
+            return self._decoder.decode(b"", final=True)
+        return self._decoder.decode(chunk)
+
+
+def _truncated(error: json.JSONDecodeError, buf: str) -> bool:
+    """Ошибка разбора из-за конца буфера (запись продолжится в следующем куске)."""
+    tail = buf[error.pos :]
+    if not tail or error.msg.startswith("Unterminated string"):
+        return True
+    if error.msg.startswith("Invalid \\uXXXX"):
+        return len(tail) < 6
+    # Число или true/false/null, разрезанные границей куска
+    return all(c in _TOKEN_CHARS for c in tail)
+
+
+def iter_records(
+    f: BinaryIO,
+    *,
+    chunk_size: int = CHUNK_SIZE,
+    on_chunk: Callable[[int], None] | None = None,
+) -> Iterator[Any]:
+    """
+    Разбирает JSON-массив или поток JSON-значений (NDJSON) по одной записи.
+    В памяти — только текущий кусок файла и недочитанная запись.
+    on_chunk(bytes_read) вызывается после каждого прочитанного куска.
+    Битая запись — ValueError сразу, без дочитывания остатка файла; дочитывается
+    только запись, оборванная границей куска (не больше MAX_RECORD_SIZE).
+    """
+    decoder = json.JSONDecoder()
+    reader = _Reader(f, chunk_size)
+    buf = ""
+    pos = 0
+    in_array: bool | None = None
+    while True:
+        if not reader.eof:
+            buf = buf[pos:] + reader.read()
+            pos = 0
+            if on_chunk:
+                on_chunk(reader.bytes_read)
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= len(buf):
+                break
+            if in_array is None:
+                in_array = buf[pos] == "["
+                if in_array:
+                    pos += 1
+                continue
+            if in_array and buf[pos] == ",":
+                pos += 1
+                continue
+            if in_array and buf[pos] == "]":
+                return
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                if reader.eof or not _truncated(e, buf):
+                    raise
+                if len(buf) - pos > MAX_RECORD_SIZE:
+                    raise ValueError(
+                        f"Запись длиннее {MAX_RECORD_SIZE} байт — файл повреждён?"
+                    ) from e
+                break
+            if end == len(buf) and not reader.eof and not isinstance(obj, (dict, list)):
+                # Число/литерал на границе куска может продолжиться в следующем
+                break
+            pos = end
+            yield obj
+        if reader.eof:
+            if in_array:
+                raise ValueError("Неожиданный конец файла: массив не закрыт")
+            return
+
+
+def stream_import(
+    repo: ProfileRepository,
+    path: str | Path,
+    *,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Callable[[ImportProgress], None] | None = None,
+    cancelled: Callable[[], bool] | None = None,
+) -> ImportProgress:
+    """
+    Импортирует профили из файла одной поэтапной записью хранилища
+    (ProfileRepository.import_stream): время и память не растут с числом уже
+    импортированных записей. Каждая запись проверяется Profile.from_dict;
+    невалидные пропускаются с ошибкой. progress и проверка cancelled() —
+    каждые batch_size записей; отмена записывает уже прочитанные записи.
+    Битый файл — ValueError, в хранилище ничего не записывается.
+    """
+    path = Path(path)
+    state = ImportProgress(total_bytes=path.stat().st_size)
+
+    def on_chunk(bytes_read: int) -> None:
+        state.bytes_read = bytes_read
+
+    def on_result(r: ImportResult) -> None:
+        if r.ok:
+            state.imported += 1
+            return
+        state.failed += 1
+        if len(state.errors) < MAX_ERRORS:
+            state.errors.append(f"#{r.index + 1}: {r.error}")
+
+    def records(f: BinaryIO) -> Iterator[Any]:
+        for record in iter_records(f, on_chunk=on_chunk):
+            state.records += 1
+            yield record
+            if state.records % batch_size == 0:
+                if progress:
+                    progress(state)
+                if cancelled and cancelled():
+                    return
+
+    with open(path, "rb") as f:
+        repo.import_stream(records(f), on_result=on_result)
+    if progress:
+        progress(state)
+    return state
+
+
+def main(argv: list[str] | None = None) -> int:
+    """CLI: browser-automation-import FILE [--profiles PATH] [--batch-size N]."""
+    from browser_automation.main import DEFAULT_PROFILES_PATH
+
+    parser = argparse.ArgumentParser(
+        description="Импорт профилей из JSON-массива или NDJSON с ограниченной памятью."
+    )
+    parser.add_argument("file", type=Path, help="файл экспорта (.json / .ndjson)")
+    parser.add_argument(
+        "--profiles",
+        type=Path,
+        default=DEFAULT_PROFILES_PATH,
+        help="хранилище профилей (profiles.json или *.db)",
+    )
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    def report(p: ImportProgress) -> None:
+        print(
+            f"\r{p.percent:3d}%  записей: {p.records}  импортировано: {p.imported}"
+            f"  ошибок: {p.failed}",
+            end="",
+            file=sys.stderr,
+            flush=True,
+        )
+
+    repo = ProfileRepository(args.profiles)
+    try:
+        result = stream_import(repo, args.file, batch_size=args.batch_size, progress=report)
+    except (OSError, ValueError) as e:
+        print(f"\nОшибка импорта: {e}", file=sys.stderr)
+        return 1
+    finally:
+        repo.close()
+    print(file=sys.stderr)
+    for err in result.errors:
+        print(err, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,52 +1,262 @@
-"""Хранилище профилей в JSON. CRUD операции."""
+"""Хранилище профилей. CRUD операции поверх ProfileStorage (JSON или SQLite)."""
 
-import json
 import uuid
+from collections.abc import Callable, Hashable, Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass, replace
 from pathlib import Path
 
-from browser_automation.value_objects import PROFILE_VERSION, Profile
+from browser_automation.migrations import needs_upgrade, upgrade
+from browser_automation.storage import ProfileStorage, StaleProfileError, open_storage
+from browser_automation.value_objects import (
+    PROFILE_VERSION,
+    PROXY_KIND_VLESS,
+    Profile,
+    ProfileSummary,
+)
+
+# Ошибки разбора записи профиля при импорте
+_RECORD_ERRORS = (TypeError, ValueError, KeyError, AttributeError)
+
+
+@dataclass
+class ImportResult:
+    """
+    Результат импорта одной записи: созданный профиль или текст ошибки.
+    У import_stream() profile не заполняется — профили не удерживаются.
+    """
+
+    index: int
+    profile: Profile | None = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass(frozen=True)
+class ProfileChanges:
+    """Какие профили добавлены, изменены и удалены (id в порядке хранилища)."""
+
+    added: tuple[str, ...] = ()
+    updated: tuple[str, ...] = ()
+    removed: tuple[str, ...] = ()
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
+
+
+ChangeListener = Callable[[ProfileChanges], None]
+ImportCallback = Callable[[ImportResult], None]
 
 
 class ProfileRepository:
-    """CRUD для профилей в JSON-файле."""
+    """
+    CRUD для профилей.
+    path — путь к файлу (profiles.json или *.db/*.sqlite для SQLite) либо готовый ProfileStorage.
+    journal=True — profiles.json с журналом изменений (см. JournaledJsonStorage).
+    Держит в памяти записи хранилища с индексами по id и по названию и краткие
+    строки ProfileSummary для списков; полный Profile разбирается лениво —
+    при первом get() (открытие, запуск) — и кэшируется.
+    Записи старых версий схемы поднимаются миграциями лениво при разборе;
+    в хранилище они записываются пачками через upgrade_pending().
+    Подписчики subscribe() получают ProfileChanges после каждой своей записи
+    и после перечитывания изменённого извне хранилища (refresh()).
+    Кэш сбрасывается только при изменении хранилища извне,
+    собственные записи обновляют кэш напрямую.
+    После import_stream() импортированные профили известны только краткими
+    строками; записи подгружаются из хранилища при первом обращении к ним.
+    """
 
-    def __init__(self, path: str | Path) -> None:
-        self._path = Path(path)
-        self._path.parent.mkdir(parents=True, exist_ok=True)
-        self._ensure_file()
+    def __init__(
+        self,
+        path: str | Path | ProfileStorage,
+        *,
+        journal: bool = False,
+    ) -> None:
+        if isinstance(path, ProfileStorage):
+            self._storage = path
+        else:
+            self._storage = open_storage(path, journal=journal)
+        self._loaded = False
+        self._signature: Hashable = None
+        self._items: dict[str, dict] = {}
+        self._summaries: dict[str, ProfileSummary] = {}
+        self._profiles: dict[str, Profile] = {}
+        self._by_name: dict[str, list[str]] = {}
+        # id записей, которые в хранилище лежат в старой версии схемы
+        self._outdated: dict[str, None] = {}
+        self._listeners: list[ChangeListener] = []
 
-    def _ensure_file(self) -> None:
-        if not self._path.exists():
-            self._path.write_text("[]", encoding="utf-8")
+    @property
+    def storage(self) -> ProfileStorage:
+        return self._storage
 
-    def _load(self) -> list[dict]:
-        try:
-            data = self._path.read_text(encoding="utf-8")
-            return json.loads(data)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return []
+    def _ensure_cache(self, *, force: bool = False) -> None:
+        """Перечитывает хранилище, только если оно изменилось с последнего чтения/записи."""
+        sig = self._storage.signature()
+        if self._loaded and sig == self._signature and not force:
+            return
+        old_items = self._items if self._loaded else None
+        old_summaries = self._summaries
+        self._items = {}
+        self._summaries = {}
+        self._profiles = {}
+        self._by_name = {}
+        self._outdated = {}
+        for d in self._storage.load():
+            self._index(d)
+        self._signature = sig
+        self._loaded = True
+        if old_items is not None:
+            self._emit(
+                _diff(old_items, self._items, old_summaries, self._summaries)
+            )
 
-    def _save(self, items: list[dict]) -> None:
-        self._path.write_text(
-            json.dumps(items, ensure_ascii=False, indent=2),
-            encoding="utf-8",
-        )
+    def _index(self, data: dict, profile: Profile | None = None) -> None:
+        summary = self._index_summary(data)
+        self._items[summary.id] = data
+        if profile is not None:
+            self._profiles[summary.id] = profile
+        else:
+            self._profiles.pop(summary.id, None)
+        if needs_upgrade(data):
+            self._outdated[summary.id] = None
+        else:
+            self._outdated.pop(summary.id, None)
+
+    def _index_summary(self, data: dict) -> ProfileSummary:
+        """Краткая строка и индекс по названию (без записи и Profile)."""
+        summary = ProfileSummary.from_dict(data)
+        self._unindex_name(summary.id)
+        self._items.pop(summary.id, None)
+        self._profiles.pop(summary.id, None)
+        self._summaries[summary.id] = summary
+        self._by_name.setdefault(summary.name, []).append(summary.id)
+        return summary
+
+    def _unindex(self, profile_id: str) -> None:
+        self._unindex_name(profile_id)
+        self._outdated.pop(profile_id, None)
+        self._items.pop(profile_id, None)
+        self._summaries.pop(profile_id, None)
+        self._profiles.pop(profile_id, None)
+
+    def _unindex_name(self, profile_id: str) -> None:
+        old = self._summaries.get(profile_id)
+        if old is None:
+            return
+        ids = self._by_name.get(old.name)
+        if not ids:
+            return
+        if profile_id in ids:
+            ids.remove(profile_id)
+        if not ids:
+            del self._by_name[old.name]
+
+    def _record(self, profile_id: str) -> dict | None:
+        """Запись хранилища; известную только краткой строкой — дочитывает."""
+        d = self._items.get(profile_id)
+        if d is None and profile_id in self._summaries:
+            self._ensure_cache(force=True)
+            d = self._items.get(profile_id)
+        return d
+
+    def _profile(self, profile_id: str) -> Profile | None:
+        """Полный Profile из кэша; разбирается из записи при первом обращении."""
+        p = self._profiles.get(profile_id)
+        if p is None:
+            d = self._record(profile_id)
+            if d is None:
+                return None
+            p = Profile.from_dict(upgrade(d))
+            self._profiles[profile_id] = p
+        return p
+
+    def _apply(
+        self,
+        upserts: Sequence[dict] = (),
+        deletes: Sequence[str] = (),
+        expected: Mapping[str, int] | None = None,
+    ) -> None:
+        sig = self._storage.apply(upserts, deletes, expected)
+        if sig is None:
+            # Хранилище успели изменить извне — перечитаем при следующем обращении
+            self._loaded = False
+        else:
+            self._signature = sig
+
+    def _emit(self, changes: ProfileChanges) -> None:
+        if not changes:
+            return
+        for listener in list(self._listeners):
+            listener(changes)
+
+    def subscribe(self, listener: ChangeListener) -> Callable[[], None]:
+        """Подписка на изменения профилей. Возвращает функцию отписки."""
+        self._listeners.append(listener)
+
+        def unsubscribe() -> None:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+        return unsubscribe
+
+    def refresh(self) -> None:
+        """
+        Перечитывает хранилище, если его изменили извне (другой процесс, скрипт),
+        и оповещает подписчиков о разнице. Дёшево, если изменений нет.
+        """
+        self._ensure_cache()
+
+    def watch_paths(self) -> list[Path]:
+        """Файлы хранилища, за которыми стоит следить, чтобы вызвать refresh()."""
+        return self._storage.watch_paths()
+
+    def close(self) -> None:
+        """Закрывает хранилище."""
+        self._storage.close()
 
     def list_all(self) -> list[Profile]:
-        """Список всех профилей."""
-        items = self._load()
-        return [Profile.from_dict(d) for d in items]
+        """Список всех профилей (полные объекты; для таблиц — list_summaries)."""
+        self._ensure_cache()
+        return [self._profile(pid) for pid in list(self._summaries)]
+
+    def list_summaries(self) -> list[ProfileSummary]:
+        """Краткие строки всех профилей (id, название, тип прокси, версия) без разбора Profile."""
+        self._ensure_cache()
+        return list(self._summaries.values())
+
+    def get_summary(self, profile_id: str) -> ProfileSummary | None:
+        """Краткая строка профиля по id."""
+        self._ensure_cache()
+        return self._summaries.get(profile_id)
+
+    def vless_links(self) -> dict[str, str]:
+        """id → VLESS-строка профилей с VLESS: из записей хранилища, без разбора Profile."""
+        self._ensure_cache()
+        links: dict[str, str] = {}
+        for pid, summary in list(self._summaries.items()):
+            if summary.proxy_kind != PROXY_KIND_VLESS:
+                continue
+            d = self._record(pid)
+            if d is not None and d.get("vless_raw"):
+                links[pid] = d["vless_raw"]
+        return links
 
     def get(self, profile_id: str) -> Profile | None:
         """Получить профиль по id."""
-        for p in self.list_all():
-            if p.id == profile_id:
-                return p
-        return None
+        self._ensure_cache()
+        return self._profile(profile_id)
+
+    def find_by_name(self, name: str) -> list[Profile]:
+        """Профили с указанным названием (в порядке добавления)."""
+        self._ensure_cache()
+        return [self._profile(pid) for pid in self._by_name.get(name, [])]
 
     def create(self, profile: Profile) -> Profile:
         """Создать профиль (id генерируется если пустой)."""
-        items = self._load()
+        self._ensure_cache()
         p = profile
         if not p.id:
             p = Profile(
@@ -55,29 +265,42 @@ class ProfileRepository:
                 proxy_config=p.proxy_config,
                 vless_raw=p.vless_raw,
                 camoufox_settings=p.camoufox_settings,
+                tunnel_settings=p.tunnel_settings,
                 version=getattr(p, "version", PROFILE_VERSION),
             )
-        items.append(p.to_dict())
-        self._save(items)
+        d = p.to_dict()
+        self._apply(upserts=[d])
+        p = replace(p, revision=d["rev"])
+        self._index(d, p)
+        self._emit(ProfileChanges(added=(p.id,)))
         return p
 
     def update(self, profile: Profile) -> Profile:
-        """Обновить профиль."""
-        items = self._load()
-        for i, d in enumerate(items):
-            if d.get("id") == profile.id:
-                items[i] = profile.to_dict()
-                self._save(items)
-                return profile
-        raise KeyError(f"Профиль не найден: {profile.id}")
+        """
+        Обновить профиль. Возвращает профиль с новой ревизией.
+        Если profile.revision задана и в хранилище уже другая (профиль изменили
+        в другом окне/процессе) — StaleProfileError, ничего не пишется.
+        revision=0 — перезапись без проверки.
+        """
+        self._ensure_cache()
+        if profile.id not in self._summaries:
+            raise KeyError(f"Профиль не найден: {profile.id}")
+        d = profile.to_dict()
+        expected = {profile.id: profile.revision} if profile.revision else None
+        self._apply(upserts=[d], expected=expected)
+        p = replace(profile, revision=d["rev"])
+        self._index(d, p)
+        self._emit(ProfileChanges(updated=(p.id,)))
+        return p
 
     def delete(self, profile_id: str) -> bool:
         """Удалить профиль. Возвращает True если удалён."""
-        items = self._load()
-        new_items = [d for d in items if d.get("id") != profile_id]
-        if len(new_items) == len(items):
+        self._ensure_cache()
+        if profile_id not in self._summaries:
             return False
-        self._save(new_items)
+        self._apply(deletes=[profile_id])
+        self._unindex(profile_id)
+        self._emit(ProfileChanges(removed=(profile_id,)))
         return True
 
     def copy(self, profile_id: str, new_name: str | None = None) -> Profile | None:
@@ -91,6 +314,7 @@ class ProfileRepository:
             proxy_config=p.proxy_config,
             vless_raw=p.vless_raw,
             camoufox_settings=p.camoufox_settings,
+            tunnel_settings=p.tunnel_settings,
             version=getattr(p, "version", PROFILE_VERSION),
         )
         return self.create(copy)
@@ -100,7 +324,7 @@ class ProfileRepository:
         p = self.get(profile_id)
         if not p:
             raise KeyError(f"Профиль не найден: {profile_id}")
-        return p.to_dict()
+        return _export_dict(p)
 
     def import_profile(self, data: dict) -> Profile:
         """Импорт профиля из словаря. id будет новый."""
@@ -111,6 +335,221 @@ class ProfileRepository:
             proxy_config=p.proxy_config,
             vless_raw=p.vless_raw,
             camoufox_settings=p.camoufox_settings,
+            tunnel_settings=p.tunnel_settings,
             version=getattr(p, "version", PROFILE_VERSION),
         )
         return self.create(p)
+
+    def import_many(self, items: Iterable[dict]) -> list[ImportResult]:
+        """
+        Импорт пачки профилей: одно чтение и одна запись хранилища на всю пачку.
+        id у всех новые. Невалидные записи пропускаются с ошибкой в результате.
+        """
+        self._ensure_cache()
+        results: list[ImportResult] = []
+        created: list[Profile] = []
+        for i, data in enumerate(items):
+            try:
+                p = _imported_profile(data)
+            except _RECORD_ERRORS as e:
+                results.append(ImportResult(index=i, error=str(e)))
+                continue
+            created.append(p)
+            results.append(ImportResult(index=i, profile=p))
+        # Импортированные профили не кэшируются — разберутся при открытии
+        self._create_many(created, cache=False)
+        return results
+
+    def import_stream(
+        self, items: Iterable[object], on_result: ImportCallback | None = None
+    ) -> int:
+        """
+        Импорт потока записей одной поэтапной записью хранилища (append_many):
+        память не растёт с размером импорта — индексируются только краткие строки.
+        on_result(ImportResult) — после каждой записи (profile не заполняется).
+        Исключение из items (битый файл) — ничего не записывается.
+        Возвращает число импортированных.
+        """
+        self._ensure_cache()
+        added: list[str] = []
+
+        def records() -> Iterator[dict]:
+            for i, data in enumerate(items):
+                try:
+                    d = _imported_profile(data).to_dict()
+                except _RECORD_ERRORS as e:
+                    if on_result:
+                        on_result(ImportResult(index=i, error=str(e)))
+                    continue
+                yield d
+                # Хранилище запись уже забрало — в памяти остаётся только краткая строка
+                self._index_summary(d)
+                added.append(d["id"])
+                if on_result:
+                    on_result(ImportResult(index=i))
+
+        try:
+            sig = self._storage.append_many(records())
+        except BaseException:
+            # Поток прерван: в хранилище ничего не записано, строки выше — лишние
+            self._loaded = False
+            raise
+        if sig is None:
+            self._loaded = False
+        else:
+            self._signature = sig
+        self._emit(ProfileChanges(added=tuple(added)))
+        return len(added)
+
+    def upsert_many(self, profiles: Iterable[Profile]) -> list[Profile]:
+        """
+        Создаёт и обновляет профили одной записью в хранилище.
+        Профиль с пустым id — новый (id генерируется), иначе — перезапись без проверки ревизии.
+        """
+        self._ensure_cache()
+        saved = [
+            replace(p, id=p.id or str(uuid.uuid4()), revision=0) for p in profiles
+        ]
+        if not saved:
+            return []
+        existing = {p.id for p in saved if p.id in self._summaries}
+        items = [p.to_dict() for p in saved]
+        self._apply(upserts=items)
+        for p, d in zip(saved, items):
+            p.revision = d["rev"]
+            self._index(d, p)
+        self._emit(
+            ProfileChanges(
+                added=tuple(p.id for p in saved if p.id not in existing),
+                updated=tuple(p.id for p in saved if p.id in existing),
+            )
+        )
+        return saved
+
+    def copy_many(self, profile_ids: Iterable[str]) -> dict[str, Profile | None]:
+        """Копирование пачки профилей за одну запись. id → копия (None — не найден)."""
+        self._ensure_cache()
+        results: dict[str, Profile | None] = {}
+        created: list[Profile] = []
+        for pid in profile_ids:
+            p = self._profile(pid)
+            if not p:
+                results[pid] = None
+                continue
+            copy = replace(
+                p, id=str(uuid.uuid4()), name=f"{p.name} (копия)", revision=0
+            )
+            created.append(copy)
+            results[pid] = copy
+        self._create_many(created)
+        return results
+
+    def delete_many(self, profile_ids: Iterable[str]) -> dict[str, bool]:
+        """Удаление пачки профилей за одну запись. id → True если удалён."""
+        self._ensure_cache()
+        results = {pid: pid in self._summaries for pid in profile_ids}
+        deleted = [pid for pid, ok in results.items() if ok]
+        if deleted:
+            self._apply(deletes=deleted)
+            for pid in deleted:
+                self._unindex(pid)
+            self._emit(ProfileChanges(removed=tuple(deleted)))
+        return results
+
+    def export_many(self, profile_ids: Iterable[str]) -> dict[str, dict | None]:
+        """Экспорт пачки профилей. id → словарь (None — не найден)."""
+        self._ensure_cache()
+        results: dict[str, dict | None] = {}
+        for pid in profile_ids:
+            p = self._profile(pid)
+            results[pid] = _export_dict(p) if p else None
+        return results
+
+    def outdated_count(self) -> int:
+        """Сколько записей в хранилище ещё в старой версии схемы."""
+        self._ensure_cache()
+        return len(self._outdated)
+
+    def upgrade_pending(self, limit: int = 500) -> int:
+        """
+        Записывает в хранилище до limit записей старой версии, поднятых миграциями,
+        одной пачкой. Возвращает число обновлённых.
+        Рассчитано на вызов порциями в фоновом потоке со своим репозиторием
+        (UpgradeWorker в GUI), пока outdated_count() > 0, — старт не ждёт
+        перезаписи всего хранилища. Если пачку изменили извне,
+        она не пишется, и кэш перечитывается.
+        """
+        self._ensure_cache()
+        ids = []
+        for pid in self._outdated:
+            ids.append(pid)
+            if len(ids) >= limit:
+                break
+        if not ids:
+            return 0
+        items = []
+        for pid in ids:
+            try:
+                items.append(upgrade(self._items[pid]))
+            except _RECORD_ERRORS:
+                # Битая запись: оставляем как есть, ошибка всплывёт при её открытии
+                self._outdated.pop(pid, None)
+        if not items:
+            return 0
+        expected = {d["id"]: d.get("rev", 0) for d in items}
+        try:
+            self._apply(upserts=items, expected=expected)
+        except StaleProfileError:
+            self._loaded = False
+            return 0
+        for d in items:
+            self._index(d)
+        self._emit(ProfileChanges(updated=tuple(d["id"] for d in items)))
+        return len(items)
+
+    def _create_many(self, profiles: list[Profile], *, cache: bool = True) -> None:
+        if not profiles:
+            return
+        items = [p.to_dict() for p in profiles]
+        self._apply(upserts=items)
+        for p, d in zip(profiles, items):
+            p.revision = d["rev"]
+            self._index(d, p if cache else None)
+        self._emit(ProfileChanges(added=tuple(p.id for p in profiles)))
+
+
+def _export_dict(p: Profile) -> dict:
+    """Словарь для экспорта: без ревизии — она внутренняя для хранилища."""
+    d = p.to_dict()
+    d.pop("rev", None)
+    return d
+
+
+def _imported_profile(data: object) -> Profile:
+    """Профиль из записи импорта: поднятый миграциями, с новым id."""
+    if not isinstance(data, dict):
+        raise ValueError("ожидается объект профиля")
+    return replace(Profile.from_dict(upgrade(data)), id=str(uuid.uuid4()), revision=0)
+
+
+def _diff(
+    old: Mapping[str, dict],
+    new: Mapping[str, dict],
+    old_summaries: Mapping[str, ProfileSummary],
+    new_summaries: Mapping[str, ProfileSummary],
+) -> ProfileChanges:
+    """
+    Разница кэшей. Профили, известные только краткой строкой (после import_stream),
+    сравниваются по ней: записи в old у них нет.
+    """
+
+    def changed(pid: str) -> bool:
+        if pid in old:
+            return old[pid] != new[pid]
+        return old_summaries[pid] != new_summaries[pid]
+
+    return ProfileChanges(
+        added=tuple(pid for pid in new if pid not in old_summaries),
+        updated=tuple(pid for pid in new if pid in old_summaries and changed(pid)),
+        removed=tuple(pid for pid in old_summaries if pid not in new),
+    )
@@ -0,0 +1,199 @@
+"""Qt-модель таблицы профилей поверх индекса ProfileRepository."""
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, QPersistentModelIndex, Qt
+
+from browser_automation.launch_scheduler import LaunchState
+from browser_automation.profile_repository import ProfileChanges, ProfileRepository
+from browser_automation.proxy.stats import Traffic
+from browser_automation.value_objects import ProfileSummary
+
+_Index = QModelIndex | QPersistentModelIndex
+
+COLUMN_NAME = 0
+COLUMN_ID = 1
+COLUMN_TRAFFIC = 2
+COLUMN_STATE = 3
+
+_STATE_TEXT = {
+    LaunchState.QUEUED: "в очереди",
+    LaunchState.STARTING: "запуск…",
+    LaunchState.RUNNING: "запущен",
+}
+
+
+class ProfileTableModel(QAbstractTableModel):
+    """
+    Строки — ProfileSummary из репозитория; QTableView запрашивает данные только
+    для видимых строк, виджетов на строку нет. Изменения репозитория применяются
+    точечно (insert/remove/dataChanged), без сброса модели.
+    Qt.ItemDataRole.UserRole в любой колонке — полный id профиля.
+    Трафик (set_traffic) хранится отдельно от строк: обновление перерисовывает
+    только изменившиеся ячейки одной колонки.
+    """
+
+    HEADERS = ("Название", "ID", "Трафик", "Состояние")
+
+    def __init__(self, repo: ProfileRepository, parent=None) -> None:
+        super().__init__(parent)
+        self._repo = repo
+        self._rows: list[ProfileSummary] = []
+        self._row_of: dict[str, int] = {}
+        self._traffic: dict[str, Traffic] = {}
+        self._states: dict[str, LaunchState] = {}
+        self.reload()
+        self._unsubscribe = repo.subscribe(self._on_changes)
+
+    def reload(self) -> None:
+        """Полная перезагрузка строк из репозитория."""
+        self.beginResetModel()
+        self._rows = self._repo.list_summaries()
+        self._reindex()
+        self.endResetModel()
+
+    def detach(self) -> None:
+        """Отписывается от репозитория."""
+        self._unsubscribe()
+
+    def _reindex(self, start: int = 0) -> None:
+        for row in range(start, len(self._rows)):
+            self._row_of[self._rows[row].id] = row
+
+    def profile_id(self, row: int) -> str:
+        return self._rows[row].id
+
+    def row_of(self, profile_id: str) -> int | None:
+        return self._row_of.get(profile_id)
+
+    def set_traffic(self, traffic: dict[str, Traffic]) -> None:
+        """Новые итоги трафика (TrafficCollector.totals())."""
+        changed = [
+            pid
+            for pid in traffic.keys() | self._traffic.keys()
+            if traffic.get(pid) != self._traffic.get(pid)
+        ]
+        self._traffic = traffic
+        for pid in changed:
+            row = self._row_of.get(pid)
+            if row is not None:
+                cell = self.index(row, COLUMN_TRAFFIC)
+                self.dataChanged.emit(cell, cell)
+
+    def set_launch_state(self, profile_id: str, state: LaunchState | None) -> None:
+        """Состояние запуска профиля (LaunchScheduler); None — не запущен."""
+        if state is None:
+            if self._states.pop(profile_id, None) is None:
+                return
+        elif self._states.get(profile_id) == state:
+            return
+        else:
+            self._states[profile_id] = state
+        row = self._row_of.get(profile_id)
+        if row is not None:
+            cell = self.index(row, COLUMN_STATE)
+            self.dataChanged.emit(cell, cell)
+
+    def rowCount(self, parent: _Index = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent: _Index = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(
+        self,
+        section: int,
+        orientation: Qt.Orientation,
+        role: int = Qt.ItemDataRole.DisplayRole,
+    ):
+        if (
+            role == Qt.ItemDataRole.DisplayRole
+            and orientation == Qt.Orientation.Horizontal
+        ):
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index: _Index, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        p = self._rows[index.row()]
+        col = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if col == COLUMN_NAME:
+                return p.name
+            if col == COLUMN_ID:
+                return p.id[:12] + "…"
+            if col == COLUMN_TRAFFIC:
+                return _format_traffic(self._traffic.get(p.id))
+            if col == COLUMN_STATE:
+                state = self._states.get(p.id)
+                return _STATE_TEXT[state] if state else ""
+        elif role == Qt.ItemDataRole.UserRole:
+            return p.id
+        elif role == Qt.ItemDataRole.ToolTipRole and col == COLUMN_ID:
+            return p.id
+        elif role == Qt.ItemDataRole.ToolTipRole and col == COLUMN_TRAFFIC:
+            t = self._traffic.get(p.id)
+            if t is not None:
+                return f"Отправлено: {t.uplink} Б\nПолучено: {t.downlink} Б"
+        return None
+
+    def _on_changes(self, changes: ProfileChanges) -> None:
+        if changes.removed:
+            self._remove(changes.removed)
+        for pid in changes.updated:
+            row = self._row_of.get(pid)
+            summary = self._repo.get_summary(pid)
+            if row is None or summary is None:
+                continue
+            self._rows[row] = summary
+            self.dataChanged.emit(
+                self.index(row, 0), self.index(row, self.columnCount() - 1)
+            )
+        added = [
+            s
+            for s in map(self._repo.get_summary, changes.added)
+            if s is not None and s.id not in self._row_of
+        ]
+        if added:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(added) - 1)
+            self._rows.extend(added)
+            self._reindex(first)
+            self.endInsertRows()
+
+    def _remove(self, ids: tuple[str, ...]) -> None:
+        rows = sorted(
+            (self._row_of.pop(pid) for pid in ids if pid in self._row_of),
+            reverse=True,
+        )
+        if not rows:
+            return
+        # Соседние строки удаляются одним диапазоном
+        i = 0
+        while i < len(rows):
+            last = first = rows[i]
+            while i + 1 < len(rows) and rows[i + 1] == first - 1:
+                i += 1
+                first = rows[i]
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._rows[first : last + 1]
+            self.endRemoveRows()
+            i += 1
+        self._reindex(rows[-1])
+
+
+def _format_bytes(n: int) -> str:
+    value = float(n)
+    for unit in ("Б", "КБ", "МБ", "ГБ"):
+        if value < 1024:
+            return f"{value:.0f} {unit}" if unit == "Б" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} ТБ"
+
+
+def _format_traffic(t: Traffic | None) -> str:
+    if t is None or (not t.total and t.connections is None):
+        return ""
+    text = f"↑{_format_bytes(t.uplink)} ↓{_format_bytes(t.downlink)}"
+    if t.connections is not None:
+        text += f" · {t.connections} соед."
+    return text
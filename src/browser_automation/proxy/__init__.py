@@ -1,4 +1,26 @@
+from browser_automation.proxy.api import XrayApi, XrayApiError
 from browser_automation.proxy.base import ProxyBase
+from browser_automation.proxy.config_cache import ConfigCache
+from browser_automation.proxy.hub import SharedVlessProxy, XrayHub
+from browser_automation.proxy.pool import TunnelPool
+from browser_automation.proxy.ports import PortAllocator
+from browser_automation.proxy.probe import ProxyStartError
+from browser_automation.proxy.stats import Traffic, TrafficCollector
+from browser_automation.proxy.supervisor import XraySupervisor
 from browser_automation.proxy.vless import VlessProxy
 
-__all__ = ["ProxyBase", "VlessProxy"]
+__all__ = [
+    "ConfigCache",
+    "PortAllocator",
+    "ProxyBase",
+    "ProxyStartError",
+    "SharedVlessProxy",
+    "Traffic",
+    "TrafficCollector",
+    "TunnelPool",
+    "VlessProxy",
+    "XrayApi",
+    "XrayApiError",
+    "XrayHub",
+    "XraySupervisor",
+]
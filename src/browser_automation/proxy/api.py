@@ -0,0 +1,118 @@
+"""Клиент API xray (HandlerService/RoutingService/StatsService) через `xray api`."""
+
+import json
+import os
+import subprocess
+import tempfile
+from collections.abc import Sequence
+
+# Тег inbound и outbound сервиса API в конфиге xray
+API_TAG = "api"
+API_SERVICES = ["HandlerService", "RoutingService", "StatsService"]
+
+
+def build_api_config(port: int) -> tuple[dict, dict, dict]:
+    """(секция api, dokodemo inbound на 127.0.0.1:port, правило маршрута к API)."""
+    api = {"tag": API_TAG, "services": list(API_SERVICES)}
+    inbound = {
+        "tag": API_TAG,
+        "listen": "127.0.0.1",
+        "port": port,
+        "protocol": "dokodemo-door",
+        "settings": {"address": "127.0.0.1"},
+    }
+    rule = {"type": "field", "inboundTag": [API_TAG], "outboundTag": API_TAG}
+    return api, inbound, rule
+
+
+def build_stats_config() -> tuple[dict, dict]:
+    """(секция stats, policy): счётчики байт по каждому inbound и outbound."""
+    policy = {
+        "system": {
+            "statsInboundUplink": True,
+            "statsInboundDownlink": True,
+            "statsOutboundUplink": True,
+            "statsOutboundDownlink": True,
+        }
+    }
+    return {}, policy
+
+
+class XrayApiError(RuntimeError):
+    """Команда API xray завершилась ошибкой."""
+
+
+class XrayApi:
+    """
+    Изменение конфига запущенного xray без перезапуска: inbound/outbound
+    и правила маршрутизации добавляются и удаляются по тегам; чтение счётчиков.
+    Работает через `xray api … --server=host:port` того же бинарника,
+    фрагменты конфига передаются временным JSON-файлом.
+    """
+
+    def __init__(self, xray_path: str, server: str, *, timeout: float = 10.0) -> None:
+        self._xray_path = xray_path
+        self._server = server
+        self._timeout = timeout
+
+    @property
+    def server(self) -> str:
+        return self._server
+
+    def add_inbounds(self, inbounds: Sequence[dict]) -> None:
+        self._call("adi", config={"inbounds": list(inbounds)})
+
+    def remove_inbounds(self, tags: Sequence[str]) -> None:
+        self._call("rmi", *tags)
+
+    def add_outbounds(self, outbounds: Sequence[dict]) -> None:
+        self._call("ado", config={"outbounds": list(outbounds)})
+
+    def remove_outbounds(self, tags: Sequence[str]) -> None:
+        self._call("rmo", *tags)
+
+    def add_rules(self, rules: Sequence[dict]) -> None:
+        """Дописывает правила в конец (у каждого должен быть ruleTag для удаления)."""
+        self._call("adrules", "-append", config={"routing": {"rules": list(rules)}})
+
+    def remove_rules(self, rule_tags: Sequence[str]) -> None:
+        self._call("rmrules", *rule_tags)
+
+    def query_stats(self, pattern: str = "", *, reset: bool = False) -> dict[str, int]:
+        """
+        Счётчики, имя которых содержит pattern: {"outbound>>>tag>>>traffic>>>uplink": байт}.
+        reset — обнулить их в xray (следующий запрос вернёт прирост).
+        """
+        args = ["-pattern", pattern] if pattern else []
+        if reset:
+            args.append("-reset")
+        out = self._call("statsquery", *args)
+        try:
+            stats = json.loads(out or "{}").get("stat") or []
+        except (ValueError, AttributeError) as e:
+            raise XrayApiError(f"xray api statsquery: не JSON: {out[:200]!r}") from e
+        # Нулевые значения xray не выводит (поле value отсутствует)
+        return {s["name"]: int(s.get("value") or 0) for s in stats if "name" in s}
+
+    def _call(self, command: str, *args: str, config: dict | None = None) -> str:
+        cmd = [self._xray_path, "api", command, f"--server={self._server}", *args]
+        path = None
+        if config is not None:
+            fd, path = tempfile.mkstemp(prefix="xray-api-", suffix=".json")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(config, f)
+            cmd.append(path)
+        try:
+            result = subprocess.run(
+                cmd, capture_output=True, text=True, timeout=self._timeout
+            )
+        except subprocess.TimeoutExpired as e:
+            raise XrayApiError(f"xray api {command}: нет ответа от {self._server}") from e
+        finally:
+            if path:
+                os.unlink(path)
+        if result.returncode != 0:
+            raise XrayApiError(
+                f"xray api {command}: {(result.stderr or result.stdout).strip()}"
+            )
+        return result.stdout
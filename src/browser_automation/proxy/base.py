@@ -2,6 +2,7 @@
 
 from abc import ABC, abstractmethod
 
+from browser_automation.proxy.api import XrayApi
 from browser_automation.value_objects import ProxyConfig
 
 
@@ -22,3 +23,7 @@ class ProxyBase(ABC):
     def is_running(self) -> bool:
         """Проверяет, запущен ли прокси."""
         ...
+
+    def stats_source(self) -> tuple[XrayApi, str] | None:
+        """(API xray, тег outbound) для счётчиков трафика; None — счётчиков нет."""
+        return None
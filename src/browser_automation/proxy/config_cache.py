@@ -0,0 +1,170 @@
+"""Кэш конфигов xray на диске: один файл на содержимое, переиспользуется между запусками."""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from pathlib import Path
+
+DEFAULT_CONFIG_DIR = Path.home() / ".config" / "browser-automation" / "xray-configs"
+DEFAULT_MAX_FILES = 512
+DEFAULT_MAX_AGE = 7 * 24 * 3600.0
+
+# Через сколько записей новых файлов запускать сборку мусора
+_GC_EVERY = 64
+# Сколько ключей → путь помнить в памяти процесса
+_MEMO_SIZE = 1024
+# Временный файл моложе этого может дописываться другим процессом
+TMP_GRACE = 3600.0
+
+# Файлы кэша: <хэш>.json и <хэш>.json.<pid>.<поток>.tmp; чужие (hub-*.json) не трогаем
+_CACHED_NAME = re.compile(r"[0-9a-f]{32}\.json")
+_TMP_NAME = re.compile(r"[0-9a-f]{32}\.json\.\d+\.\d+\.tmp")
+
+
+def dump_config(config: dict) -> bytes:
+    """Детерминированный компактный JSON: одинаковый конфиг — одинаковые байты."""
+    return json.dumps(
+        config, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+
+
+def write_private(path: Path, data: bytes, tmp: Path) -> None:
+    """
+    Атомарно записывает data в path через tmp; файл создаётся с правами 0600
+    (в конфигах xray — uuid VLESS). Недописанный tmp удаляется.
+    """
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+class ConfigCache:
+    """
+    Конфиги xray в directory под именем sha256 содержимого: тот же профиль
+    на тех же портах — тот же файл, он не пишется заново и не удаляется при stop().
+    В памяти — ключ (VLESS-строка, порт) → путь: повторный запуск не строит конфиг.
+    Файлы, к которым не обращались дольше max_age, удаляются; сверх max_files —
+    самые давние по времени последнего использования (mtime обновляется при выдаче).
+    """
+
+    def __init__(
+        self,
+        directory: str | Path = DEFAULT_CONFIG_DIR,
+        *,
+        max_files: int = DEFAULT_MAX_FILES,
+        max_age: float = DEFAULT_MAX_AGE,
+    ) -> None:
+        self._dir = Path(directory)
+        self._max_files = max_files
+        self._max_age = max_age
+        self._memo: OrderedDict[Hashable, Path] = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._collected = False
+
+    @property
+    def directory(self) -> Path:
+        return self._dir
+
+    def path_for(self, key: Hashable, build: Callable[[], dict]) -> Path:
+        """Путь к файлу конфига для key; build() вызывается, только если его нет."""
+        with self._lock:
+            path = self._memo.get(key)
+            if path is not None:
+                self._memo.move_to_end(key)
+        if path is not None and _touch(path):
+            return path
+        path = self.store(build())
+        with self._lock:
+            self._memo[key] = path
+            while len(self._memo) > _MEMO_SIZE:
+                self._memo.popitem(last=False)
+        return path
+
+    def store(self, config: dict) -> Path:
+        """Сохраняет конфиг (если такого ещё нет), возвращает путь к файлу."""
+        data = dump_config(config)
+        path = self._dir / f"{hashlib.sha256(data).hexdigest()[:32]}.json"
+        if _touch(path):
+            return path
+        # В конфиге uuid VLESS (учётные данные): каталог и файлы — только владельцу
+        self._dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        write_private(path, data, tmp)
+        with self._lock:
+            self._writes += 1
+            need_gc = not self._collected or self._writes % _GC_EVERY == 0
+            self._collected = True
+        if need_gc:
+            self.gc(keep=path)
+        return path
+
+    def gc(self, keep: Path | None = None) -> int:
+        """
+        Удаляет старые и лишние файлы кэша (имя — хэш содержимого) и брошенные
+        временные файлы старше TMP_GRACE. Возвращает число удалённых.
+        """
+        now = time.time()
+        entries: list[tuple[float, Path]] = []
+        removed = 0
+        try:
+            for p in self._dir.iterdir():
+                if _TMP_NAME.fullmatch(p.name):
+                    if _mtime(p) < now - TMP_GRACE and _unlink(p):
+                        removed += 1
+                elif _CACHED_NAME.fullmatch(p.name):
+                    entries.append((_mtime(p), p))
+        except FileNotFoundError:
+            return removed
+        entries.sort()
+        deadline = now - self._max_age
+        excess = len(entries) - self._max_files
+        for mtime, p in entries:
+            if p == keep:
+                continue
+            if mtime >= deadline and excess <= 0:
+                break
+            if not _unlink(p):
+                continue
+            removed += 1
+            excess -= 1
+        return removed
+
+
+def _mtime(path: Path) -> float:
+    """Время изменения; удалённый между листингом и stat() файл — «сейчас»."""
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return time.time()
+
+
+def _unlink(path: Path) -> bool:
+    try:
+        path.unlink()
+        return True
+    except OSError:
+        return False
+
+
+def _touch(path: Path) -> bool:
+    """Обновляет mtime (для LRU). False — файла нет (удалён сборкой мусора)."""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+# Общий кэш процесса
+default_config_cache = ConfigCache()
@@ -0,0 +1,361 @@
+"""Общий процесс xray для всех запущенных профилей."""
+
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from browser_automation.proxy.api import (
+    XrayApi,
+    XrayApiError,
+    build_api_config,
+    build_stats_config,
+)
+from browser_automation.proxy.base import ProxyBase
+from browser_automation.proxy.config_cache import (
+    ConfigCache,
+    default_config_cache,
+    dump_config,
+    write_private,
+)
+from browser_automation.proxy.ports import PortAllocator, default_allocator
+from browser_automation.proxy.probe import probe_latency, wait_socks_ready
+from browser_automation.proxy.supervisor import XraySupervisor
+from browser_automation.proxy.vless import (
+    _find_xray,
+    build_direct_outbound,
+    build_direct_rule,
+    build_local_inbounds,
+    build_vless_outbound,
+    resolve_xray,
+)
+from browser_automation.value_objects import (
+    ProxyConfig,
+    TunnelSettings,
+    VlessString,
+    parse_vless,
+)
+
+# Исходящий по умолчанию (первый в списке): трафик без правила никуда не уходит
+BLOCK_TAG = "block"
+
+
+@dataclass(frozen=True)
+class _Route:
+    tag: str
+    vless: VlessString
+    port: int
+    tunnel: TunnelSettings | None = None
+
+    def inbounds(self) -> list[dict]:
+        return build_local_inbounds(self.port, self.tag)
+
+    def outbound(self) -> dict:
+        return build_vless_outbound(self.vless, self.tag, self.tunnel)
+
+    def rules(self) -> list[dict]:
+        """Домены в обход туннеля (если заданы), затем всё остальное — в туннель."""
+        inbound_tags = [i["tag"] for i in self.inbounds()]
+        rules = [
+            {
+                "type": "field",
+                "ruleTag": self.tag,
+                "inboundTag": inbound_tags,
+                "outboundTag": self.tag,
+            }
+        ]
+        direct = build_direct_rule(self.tunnel, inbound_tags)
+        if direct:
+            rules.insert(0, {"ruleTag": f"{self.tag}-direct", **direct})
+        return rules
+
+    def rule_tags(self) -> list[str]:
+        return [r["ruleTag"] for r in self.rules()]
+
+
+class XrayHub:
+    """
+    Один xray на все профили. Для каждого маршрута (ключ — обычно id профиля)
+    в конфиге своя пара inbound SOCKS5/HTTP и свой VLESS outbound; правила
+    routing по inboundTag связывают их, так что у каждого профиля свой выход.
+    Трафик без правила уходит в blackhole — профили не могут попасть в чужой туннель.
+    xray запускается один раз; маршруты добавляются и удаляются на лету через
+    его API (HandlerService/RoutingService), остальные профили это не затрагивает.
+    Если API не ответил, xray перезапускается с полным конфигом — порты
+    маршрутов при этом не меняются. Упавший xray перезапускает XraySupervisor
+    с конфигом, в котором всегда записаны все текущие маршруты.
+    add() возвращается, когда SOCKS5 inbound маршрута принял рукопожатие.
+    TunnelSettings маршрута: mux и домены в обход туннеля — свои у каждого;
+    dns_servers не применяются — блок DNS у xray один на процесс.
+    Счётчики трафика — по outbound маршрута (stats_source()).
+    """
+
+    def __init__(
+        self,
+        *,
+        xray_path: str | Path | None = None,
+        ready_timeout: float = 10.0,
+        ports: PortAllocator | None = None,
+        configs: ConfigCache | None = None,
+    ) -> None:
+        # xray ищется при первом запуске: пустой хаб не требует xray в PATH
+        self._xray_path = str(xray_path) if xray_path else None
+        self._routes: dict[str, _Route] = {}
+        self._tags = itertools.count()
+        self._lock = threading.RLock()
+        self._supervisor: XraySupervisor | None = None
+        self._ready_timeout = ready_timeout
+        self._config_path: Path | None = None
+        self._api: XrayApi | None = None
+        self._api_port: int | None = None
+        self._ports = ports or default_allocator
+        self._configs = configs or default_config_cache
+
+    def add(
+        self,
+        key: str,
+        vless: str | VlessString,
+        *,
+        local_port: int = 10808,
+        tunnel: TunnelSettings | None = None,
+    ) -> ProxyConfig:
+        """Добавляет маршрут key → VLESS, возвращает его локальный прокси."""
+        if isinstance(vless, str):
+            vless = parse_vless(vless)
+        with self._lock:
+            route = self._routes.get(key)
+            if route is None:
+                port = self._ports.reserve(max(10808, local_port))
+                route = _Route(f"r{next(self._tags)}", vless, port, tunnel)
+                self._routes[key] = route
+                try:
+                    self._add_route(route)
+                except Exception:
+                    del self._routes[key]
+                    self._ports.release(port)
+                    raise
+                try:
+                    self._wait_ready(route.port)
+                except Exception:
+                    # inbound уже в xray: порт возвращается после его удаления
+                    self.remove(key)
+                    raise
+            return ProxyConfig("127.0.0.1", route.port)
+
+    def remove(self, key: str) -> None:
+        """Убирает маршрут; xray продолжает работать для остальных."""
+        with self._lock:
+            route = self._routes.pop(key, None)
+            if route is None:
+                return
+            try:
+                if self.is_running():
+                    self._save_config()
+                    try:
+                        self._remove_route(route)
+                    except XrayApiError:
+                        self._restart()
+            finally:
+                # Порт свободен, только когда xray убрал inbound (или перезапущен без него)
+                self._ports.release(route.port)
+
+    def stats_source(self, key: str) -> tuple[XrayApi, str] | None:
+        """(API xray, тег outbound маршрута key) для счётчиков трафика."""
+        route = self._routes.get(key)
+        api = self._api
+        if route is None or api is None or not self.is_running():
+            return None
+        return api, route.tag
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._routes
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    def _add_route(self, route: _Route) -> None:
+        if not self.is_running() or self._api is None:
+            self._restart()
+            return
+        self._save_config()
+        try:
+            # Сначала выход и правило, затем вход: трафик не попадёт в blackhole
+            self._api.add_outbounds([route.outbound()])
+            self._api.add_rules(route.rules())
+            self._api.add_inbounds(route.inbounds())
+        except XrayApiError:
+            self._restart()
+
+    def _wait_ready(self, port: int) -> None:
+        assert self._supervisor is not None
+        wait_socks_ready(
+            "127.0.0.1",
+            port,
+            timeout=self._ready_timeout,
+            process=self._supervisor.process,
+            stderr=self._supervisor.stderr,
+        )
+
+    def _remove_route(self, route: _Route) -> None:
+        assert self._api is not None
+        self._api.remove_inbounds([i["tag"] for i in route.inbounds()])
+        self._api.remove_rules(route.rule_tags())
+        self._api.remove_outbounds([route.tag])
+
+    def build_config(self, api_port: int) -> dict:
+        """Конфиг xray со всеми текущими маршрутами и API на 127.0.0.1:api_port."""
+        api, api_inbound, api_rule = build_api_config(api_port)
+        inbounds: list[dict] = [api_inbound]
+        outbounds: list[dict] = [
+            {"protocol": "blackhole", "tag": BLOCK_TAG},
+            build_direct_outbound(),
+        ]
+        rules: list[dict] = [api_rule]
+        for route in self._routes.values():
+            inbounds += route.inbounds()
+            outbounds.append(route.outbound())
+            rules += route.rules()
+        stats, policy = build_stats_config()
+        return {
+            "log": {"loglevel": "warning"},
+            "api": api,
+            "stats": stats,
+            "policy": policy,
+            "inbounds": inbounds,
+            "outbounds": outbounds,
+            "routing": {"rules": rules},
+        }
+
+    def _save_config(self) -> None:
+        """Файл конфига = текущие маршруты: перезапуск после падения поднимет их все."""
+        if self._api_port is not None:
+            self._write_config(self._api_port)
+
+    def _ensure_config(self) -> None:
+        # Файл обновляется при каждом изменении маршрутов; пишем, только если его удалили
+        if self._config_path is not None and not self._config_path.exists():
+            self._save_config()
+
+    def _write_config(self, api_port: int) -> Path:
+        # Конфиг хаба меняется с маршрутами — свой файл рядом с кэшем конфигов
+        if self._config_path is None:
+            self._config_path = (
+                self._configs.directory / f"hub-{os.getpid()}-{id(self):x}.json"
+            )
+            self._config_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        tmp = self._config_path.with_name(self._config_path.name + ".tmp")
+        # Остаток прерванной записи: файл создаётся заново с правами 0600
+        tmp.unlink(missing_ok=True)
+        write_private(
+            self._config_path, dump_config(self.build_config(api_port)), tmp
+        )
+        return self._config_path
+
+    def _restart(self) -> None:
+        self._xray_path = resolve_xray(self._xray_path or _find_xray())
+        self._terminate()
+        # Под API — первый порт отдельной пары из аллокатора
+        self._api_port = self._ports.reserve()
+        path = self._write_config(self._api_port)
+        self._supervisor = XraySupervisor(
+            [self._xray_path, "run", "-c", str(path)], prepare=self._ensure_config
+        )
+        self._supervisor.start()
+        self._api = XrayApi(self._xray_path, f"127.0.0.1:{self._api_port}")
+
+    def _terminate(self) -> None:
+        self._api = None
+        if self._supervisor is not None:
+            self._supervisor.stop()
+            self._supervisor = None
+        # Порт API возвращается после завершения xray, который его слушал
+        if self._api_port is not None:
+            self._ports.release(self._api_port)
+            self._api_port = None
+
+    def is_running(self) -> bool:
+        return self._supervisor is not None and self._supervisor.is_running()
+
+    @property
+    def restart_count(self) -> int:
+        """Сколько раз общий xray перезапускался после падения."""
+        return self._supervisor.restart_count if self._supervisor else 0
+
+    @property
+    def downtime(self) -> float:
+        return self._supervisor.downtime if self._supervisor else 0.0
+
+    def stop(self) -> None:
+        """Останавливает xray и забывает все маршруты."""
+        with self._lock:
+            self._terminate()
+            for route in self._routes.values():
+                self._ports.release(route.port)
+            self._routes.clear()
+            if self._config_path is not None:
+                self._config_path.unlink(missing_ok=True)
+                self._config_path = None
+
+
+class SharedVlessProxy(ProxyBase):
+    """
+    VLESS-прокси профиля в общем XrayHub: тот же интерфейс, что у VlessProxy,
+    но без собственного процесса xray. ready_time и probe_latency — как у VlessProxy.
+    """
+
+    def __init__(
+        self,
+        hub: XrayHub,
+        vless_string: str | VlessString,
+        *,
+        key: str | None = None,
+        local_port: int = 10808,
+        measure_latency: bool = False,
+        tunnel: TunnelSettings | None = None,
+    ) -> None:
+        self._hub = hub
+        self._vless = vless_string
+        self._tunnel = tunnel
+        self._key = key or f"proxy-{id(self):x}"
+        self._local_port = local_port
+        self._started = False
+        self._measure_latency = measure_latency
+        self._port: int | None = None
+        self.ready_time: float | None = None
+        self.probe_latency: float | None = None
+
+    def start(self) -> ProxyConfig:
+        start = time.monotonic()
+        config = self._hub.add(
+            self._key, self._vless, local_port=self._local_port, tunnel=self._tunnel
+        )
+        self.ready_time = time.monotonic() - start
+        self._port = config.port
+        self._started = True
+        if self._measure_latency:
+            self.measure_latency()
+        return config
+
+    def measure_latency(self) -> float | None:
+        """Замеряет задержку через туннель; None — запрос не прошёл."""
+        if self._port is None:
+            return None
+        try:
+            self.probe_latency = probe_latency("127.0.0.1", self._port)
+        except OSError:
+            self.probe_latency = None
+        return self.probe_latency
+
+    def stats_source(self) -> tuple[XrayApi, str] | None:
+        return self._hub.stats_source(self._key) if self._started else None
+
+    def stop(self) -> None:
+        if not self._started:
+            return
+        self._started = False
+        self._hub.remove(self._key)
+
+    def is_running(self) -> bool:
+        return self._started and self._key in self._hub and self._hub.is_running()
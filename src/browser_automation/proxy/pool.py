@@ -0,0 +1,149 @@
+"""Пул заранее поднятых VLESS-туннелей."""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from browser_automation.proxy.vless import VlessProxy
+from browser_automation.value_objects import TunnelSettings
+
+# Туннель подходит профилю, если совпадают VLESS-строка и настройки туннеля
+_Key = tuple[str, TunnelSettings | None]
+
+
+@dataclass
+class _Idle:
+    key: _Key
+    proxy: VlessProxy
+    since: float
+
+
+class TunnelPool:
+    """
+    До size готовых (прошедших проверку готовности) VlessProxy по ключу
+    (vless_raw, TunnelSettings).
+    checkout() отдаёт свободный туннель сразу, без запуска xray; если такого нет —
+    поднимает новый. checkin() возвращает туннель в пул: при переполнении
+    останавливается давно не использованный (LRU), простаивающие дольше idle_ttl
+    останавливаются фоновым потоком.
+    """
+
+    def __init__(
+        self,
+        *,
+        size: int = 4,
+        idle_ttl: float = 300.0,
+        xray_path: str | Path | None = None,
+    ) -> None:
+        self._size = size
+        self._idle_ttl = idle_ttl
+        self._xray_path = xray_path
+        # Порядок — от давно возвращённых к недавним
+        self._idle: OrderedDict[int, _Idle] = OrderedDict()
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._reaper: threading.Thread | None = None
+
+    def __len__(self) -> int:
+        return len(self._idle)
+
+    def checkout(
+        self,
+        vless_raw: str,
+        *,
+        local_port: int = 10808,
+        tunnel: TunnelSettings | None = None,
+    ) -> VlessProxy:
+        """Готовый туннель для vless_raw: из пула или только что поднятый."""
+        key = _key(vless_raw, tunnel)
+        while True:
+            with self._lock:
+                token = next(
+                    (t for t, e in reversed(self._idle.items()) if e.key == key),
+                    None,
+                )
+                entry = self._idle.pop(token) if token is not None else None
+            if entry is None:
+                break
+            if entry.proxy.is_running():
+                return entry.proxy
+            entry.proxy.stop()
+        return self._start_new(key, local_port)
+
+    def checkin(self, proxy: VlessProxy) -> None:
+        """Возвращает туннель в пул (упавший или лишний — останавливается)."""
+        if self._closed.is_set() or self._size <= 0 or not proxy.is_running():
+            proxy.stop()
+            return
+        evicted: list[VlessProxy] = []
+        with self._lock:
+            self._idle[id(proxy)] = _Idle(
+                _key(proxy.vless.raw, proxy.tunnel), proxy, time.monotonic()
+            )
+            while len(self._idle) > self._size:
+                evicted.append(self._idle.popitem(last=False)[1].proxy)
+            self._start_reaper()
+        for p in evicted:
+            p.stop()
+
+    def prewarm(
+        self, vless_raw: str, count: int = 1, *, tunnel: TunnelSettings | None = None
+    ) -> None:
+        """Поднимает count туннелей для vless_raw заранее (блокирует до готовности)."""
+        for _ in range(count):
+            self.checkin(self._start_new(_key(vless_raw, tunnel)))
+
+    def _start_new(self, key: _Key, local_port: int = 10808) -> VlessProxy:
+        vless_raw, tunnel = key
+        proxy = VlessProxy(
+            vless_raw, local_port=local_port, xray_path=self._xray_path, tunnel=tunnel
+        )
+        proxy.start()
+        return proxy
+
+    def evict_expired(self) -> None:
+        """Останавливает туннели, простаивающие дольше idle_ttl."""
+        deadline = time.monotonic() - self._idle_ttl
+        expired: list[VlessProxy] = []
+        with self._lock:
+            while self._idle:
+                token, entry = next(iter(self._idle.items()))
+                if entry.since > deadline:
+                    break
+                del self._idle[token]
+                expired.append(entry.proxy)
+        for p in expired:
+            p.stop()
+
+    def _start_reaper(self) -> None:
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+        self._reaper = threading.Thread(
+            target=self._reap, name="tunnel-pool-reaper", daemon=True
+        )
+        self._reaper.start()
+
+    def _reap(self) -> None:
+        interval = max(1.0, self._idle_ttl / 4)
+        while not self._closed.wait(interval):
+            self.evict_expired()
+            with self._lock:
+                if not self._idle:
+                    self._reaper = None
+                    return
+
+    def close(self) -> None:
+        """Останавливает все туннели пула."""
+        self._closed.set()
+        with self._lock:
+            idle = [e.proxy for e in self._idle.values()]
+            self._idle.clear()
+        for p in idle:
+            p.stop()
+
+
+def _key(vless_raw: str, tunnel: TunnelSettings | None) -> _Key:
+    # Настройки по умолчанию и их отсутствие — один и тот же туннель
+    return vless_raw.strip(), tunnel if tunnel and not tunnel.is_default else None
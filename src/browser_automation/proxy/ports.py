@@ -0,0 +1,100 @@
+"""Выдача локальных портов под пары inbound SOCKS5/HTTP."""
+
+import socket
+import threading
+
+DEFAULT_BASE_PORT = 10808
+DEFAULT_PAIRS = 2048
+
+
+def _can_bind(port: int) -> bool:
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.bind(("127.0.0.1", port))
+            return True
+    except OSError:
+        return False
+
+
+def _lowest_zero(mask: int) -> int:
+    """Индекс младшего нулевого бита."""
+    return ((~mask) & (mask + 1)).bit_length() - 1
+
+
+class PortAllocator:
+    """
+    Пары соседних портов (port, port + 1) начиная с base: пара i — base + 2*i.
+    Занятые пары — биты в битовой маске, поиск свободной — младший нулевой бит,
+    без перебора уже выданных портов. Выдача под блокировкой: параллельные
+    запуски в одном процессе не получают одну пару.
+    Перед выдачей оба порта проверяются bind'ом; занятые чужими процессами пары
+    помечаются и пропускаются, пока свободные не кончатся.
+    """
+
+    def __init__(
+        self, base: int = DEFAULT_BASE_PORT, pairs: int = DEFAULT_PAIRS
+    ) -> None:
+        self._base = base
+        self._pairs = pairs
+        self._reserved = 0
+        # Пары, занятые вне аллокатора (не прошли bind или проиграли гонку xray)
+        self._foreign = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, start: int | None = None) -> int:
+        """Резервирует пару, возвращает порт SOCKS5 (HTTP — следующий)."""
+        first = 0
+        if start is not None and start > self._base:
+            first = min((start - self._base + 1) // 2, self._pairs)
+        with self._lock:
+            port = self._reserve_from(first)
+            if port is None and self._foreign:
+                # Чужие процессы могли освободить порты — проверяем заново
+                self._foreign = 0
+                port = self._reserve_from(first)
+            if port is None:
+                raise RuntimeError(
+                    f"Нет свободных портов в диапазоне "
+                    f"{self._base}-{self._base + 2 * self._pairs - 1}"
+                )
+            return port
+
+    def _reserve_from(self, first: int) -> int | None:
+        # Пары до first считаем занятыми для поиска
+        skip = (1 << first) - 1
+        while True:
+            index = _lowest_zero(self._reserved | self._foreign | skip)
+            if index >= self._pairs:
+                return None
+            port = self._base + 2 * index
+            if _can_bind(port) and _can_bind(port + 1):
+                self._reserved |= 1 << index
+                return port
+            self._foreign |= 1 << index
+
+    def release(self, port: int, *, busy: bool = False) -> None:
+        """
+        Возвращает пару в свободные. busy=True — порт оказался занят чужим
+        процессом: пара пропускается при следующих выдачах.
+        """
+        index = self._index(port)
+        if index is None:
+            return
+        with self._lock:
+            self._reserved &= ~(1 << index)
+            if busy:
+                self._foreign |= 1 << index
+
+    def is_reserved(self, port: int) -> bool:
+        index = self._index(port)
+        return index is not None and bool(self._reserved >> index & 1)
+
+    def _index(self, port: int) -> int | None:
+        offset = port - self._base
+        if offset < 0 or offset % 2 or offset // 2 >= self._pairs:
+            return None
+        return offset // 2
+
+
+# Общий аллокатор процесса: все прокси и хабы берут порты из него
+default_allocator = PortAllocator()
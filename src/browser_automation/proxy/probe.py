@@ -0,0 +1,148 @@
+"""Проверка готовности локального SOCKS5-прокси и задержки через туннель."""
+
+import socket
+import subprocess
+import threading
+import time
+from collections import deque
+
+# Клиентское приветствие SOCKS5: версия 5, один метод — без аутентификации
+_SOCKS5_GREETING = b"\x05\x01\x00"
+_SOCKS5_NO_AUTH = b"\x05\x00"
+
+# Проба через туннель: ответ 204 без тела, сервер быстрый и доступен почти везде
+DEFAULT_PROBE_TARGET = ("www.gstatic.com", 80)
+_PROBE_REQUEST = (
+    b"HEAD /generate_204 HTTP/1.1\r\nHost: www.gstatic.com\r\nConnection: close\r\n\r\n"
+)
+
+
+# Признаки «порт уже занят» в stderr xray (Linux/macOS и Windows)
+_ADDRESS_IN_USE = ("address already in use", "only one usage of each socket address")
+
+
+class ProxyStartError(RuntimeError):
+    """Прокси не стал принимать соединения: процесс завершился или истёк срок."""
+
+    def __init__(self, message: str, *, stderr: str = "") -> None:
+        super().__init__(message + (f":\n{stderr}" if stderr else ""))
+        self.stderr = stderr
+
+    @property
+    def address_in_use(self) -> bool:
+        """xray не смог занять порт — его успел занять другой процесс."""
+        text = self.stderr.lower()
+        return any(marker in text for marker in _ADDRESS_IN_USE)
+
+
+class StderrRing:
+    """
+    Последние max_bytes stderr процесса(ов) xray. attach() запускает поток,
+    который вычитывает пайп (xray не блокируется на записи); при перезапусках
+    новый процесс пишет в тот же буфер — текст ошибки до падения сохраняется.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024) -> None:
+        self._max_bytes = max_bytes
+        self._buf = bytearray()
+        self._lock = threading.Lock()
+        self._process: subprocess.Popen | None = None
+        self._thread: threading.Thread | None = None
+
+    def attach(self, process: subprocess.Popen) -> None:
+        self._process = process
+        self._thread = threading.Thread(
+            target=self._run, args=(process,), name="xray-stderr", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, process: subprocess.Popen) -> None:
+        assert process.stderr is not None
+        for chunk in iter(process.stderr.readline, b""):
+            with self._lock:
+                self._buf += chunk
+                if len(self._buf) > self._max_bytes:
+                    del self._buf[: len(self._buf) - self._max_bytes]
+
+    def text(self) -> str:
+        """Содержимое буфера; у завершившегося процесса — дочитанное до конца."""
+        process, thread = self._process, self._thread
+        if process is not None and thread is not None and process.poll() is not None:
+            thread.join(timeout=0.5)
+        with self._lock:
+            return self._buf.decode("utf-8", "replace").rstrip()
+
+
+def socks5_handshake(host: str, port: int, timeout: float = 1.0) -> bool:
+    """Отвечает ли на host:port сервер SOCKS5 без аутентификации."""
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as s:
+            s.sendall(_SOCKS5_GREETING)
+            return s.recv(2) == _SOCKS5_NO_AUTH
+    except OSError:
+        return False
+
+
+def wait_socks_ready(
+    host: str,
+    port: int,
+    *,
+    timeout: float = 10.0,
+    process: subprocess.Popen | None = None,
+    stderr: StderrRing | None = None,
+) -> float:
+    """
+    Ждёт, пока SOCKS5 на host:port примет рукопожатие. Возвращает время ожидания, с.
+    Если process завершился или истёк timeout — ProxyStartError с хвостом stderr.
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    delay = 0.01
+    while True:
+        if process is not None and process.poll() is not None:
+            raise ProxyStartError(
+                f"xray завершился с кодом {process.returncode}",
+                stderr=stderr.text() if stderr else "",
+            )
+        if socks5_handshake(host, port, timeout=max(0.05, deadline - time.monotonic())):
+            return time.monotonic() - start
+        if time.monotonic() >= deadline:
+            raise ProxyStartError(
+                f"Прокси {host}:{port} не ответил за {timeout:g} с",
+                stderr=stderr.text() if stderr else "",
+            )
+        time.sleep(delay)
+        delay = min(delay * 2, 0.2)
+
+
+def probe_latency(
+    host: str,
+    port: int,
+    *,
+    target: tuple[str, int] = DEFAULT_PROBE_TARGET,
+    timeout: float = 10.0,
+) -> float:
+    """
+    Задержка запроса через туннель, с: SOCKS5 CONNECT к target и HTTP HEAD
+    до первого байта ответа. Ошибка соединения — OSError.
+    """
+    target_host, target_port = target
+    name = target_host.encode("idna")
+    start = time.monotonic()
+    with socket.create_connection((host, port), timeout=timeout) as s:
+        s.sendall(_SOCKS5_GREETING)
+        if s.recv(2) != _SOCKS5_NO_AUTH:
+            raise OSError("SOCKS5: сервер отклонил метод без аутентификации")
+        s.sendall(
+            b"\x05\x01\x00\x03"
+            + bytes([len(name)])
+            + name
+            + target_port.to_bytes(2, "big")
+        )
+        reply = s.recv(262)
+        if len(reply) < 2 or reply[1] != 0:
+            raise OSError(f"SOCKS5 CONNECT: код ошибки {reply[1] if reply[1:] else '?'}")
+        s.sendall(_PROBE_REQUEST)
+        if not s.recv(1):
+            raise OSError("Пустой ответ через туннель")
+    return time.monotonic() - start
@@ -0,0 +1,255 @@
+"""Учёт трафика и соединений профилей по счётчикам xray."""
+
+import json
+import os
+import threading
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+from browser_automation.proxy.api import XrayApi, XrayApiError
+from browser_automation.proxy.base import ProxyBase
+
+DEFAULT_TRAFFIC_PATH = Path.home() / ".config" / "browser-automation" / "traffic.json"
+DEFAULT_INTERVAL = 5.0
+
+# Имя счётчика xray: outbound>>>{tag}>>>traffic>>>{uplink|downlink}
+_OUTBOUND_PREFIX = "outbound>>>"
+# Состояние TCP_ESTABLISHED в /proc/net/tcp
+_TCP_ESTABLISHED = "01"
+
+
+@dataclass(frozen=True)
+class Traffic:
+    """
+    Трафик профиля через туннель за всё время, байт (uplink — отправлено).
+    connections — активных соединений браузера с локальным прокси сейчас;
+    None — профиль не запущен или число недоступно (не Linux).
+    """
+
+    uplink: int = 0
+    downlink: int = 0
+    connections: int | None = None
+    updated_at: float = 0.0
+
+    @property
+    def total(self) -> int:
+        return self.uplink + self.downlink
+
+
+@dataclass
+class _Tracked:
+    proxy: ProxyBase
+    ports: tuple[int, ...]
+
+
+def count_connections(ports: Iterable[int]) -> dict[int, int] | None:
+    """
+    Установленные TCP-соединения на локальные порты ports (по /proc/net/tcp и tcp6).
+    None — /proc недоступен.
+    """
+    wanted = set(ports)
+    counts = dict.fromkeys(wanted, 0)
+    found = False
+    for name in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(name, encoding="ascii") as f:
+                next(f, None)
+                for line in f:
+                    fields = line.split()
+                    if len(fields) < 4 or fields[3] != _TCP_ESTABLISHED:
+                        continue
+                    port = int(fields[1].rsplit(":", 1)[1], 16)
+                    if port in wanted:
+                        counts[port] += 1
+            found = True
+        except (OSError, ValueError, IndexError):
+            continue
+    return counts if found else None
+
+
+class TrafficCollector:
+    """
+    Раз в interval секунд читает счётчики outbound xray у отслеживаемых прокси
+    (со сбросом — каждый запрос возвращает прирост) и прибавляет их к итогам
+    профилей. Прокси одного xray (XrayHub) опрашиваются одним запросом.
+    Итоги сохраняются в path и переживают перезапуск приложения; трафик,
+    набежавший между последним опросом и падением xray, теряется.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = DEFAULT_TRAFFIC_PATH,
+        *,
+        interval: float = DEFAULT_INTERVAL,
+    ) -> None:
+        self._path = Path(path)
+        self._interval = interval
+        self._totals: dict[str, Traffic] = self._load()
+        self._tracked: dict[str, _Tracked] = {}
+        self._lock = threading.Lock()
+        self._sample_lock = threading.Lock()
+        # save() зовут поток сбора и остановка лаунчера: один временный файл за раз
+        self._save_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._dirty = False
+
+    def track(self, key: str, proxy: ProxyBase, ports: Iterable[int] = ()) -> None:
+        """Учитывать трафик proxy в итогах key; ports — локальные порты прокси."""
+        with self._lock:
+            self._tracked[key] = _Tracked(proxy, tuple(ports))
+        self.start()
+
+    def untrack(self, key: str) -> None:
+        """Последний опрос и прекращение учёта (вызывать до остановки прокси)."""
+        self.sample()
+        with self._lock:
+            self._tracked.pop(key, None)
+            current = self._totals.get(key)
+            if current is not None:
+                self._totals[key] = replace(current, connections=None)
+        self.save()
+
+    def get(self, key: str) -> Traffic:
+        with self._lock:
+            return self._totals.get(key, Traffic())
+
+    def totals(self) -> dict[str, Traffic]:
+        """Итоги всех профилей (копия)."""
+        with self._lock:
+            return dict(self._totals)
+
+    def reset(self, key: str | None = None) -> None:
+        """Обнуляет итоги профиля key (None — всех)."""
+        with self._lock:
+            if key is None:
+                self._totals.clear()
+            else:
+                self._totals.pop(key, None)
+            self._dirty = True
+        self.save()
+
+    def sample(self) -> None:
+        """
+        Один опрос всех отслеживаемых: счётчики xray и число соединений.
+        Запрос сбрасывает все счётчики outbound процесса xray — поэтому опрашиваются
+        сразу все профили, а не один (иначе прирост соседей по XrayHub потеряется).
+        """
+        with self._lock:
+            tracked = dict(self._tracked)
+        if not tracked:
+            return
+        # Параллельный опрос со сбросом посчитал бы прирост дважды или потерял
+        with self._sample_lock:
+            deltas = self._query(tracked)
+            conns = count_connections(p for t in tracked.values() for p in t.ports)
+        now = time.time()
+        with self._lock:
+            for key, t in tracked.items():
+                up, down = deltas.get(key, (0, 0))
+                current = self._totals.get(key, Traffic())
+                connections = (
+                    sum(conns.get(p, 0) for p in t.ports)
+                    if conns is not None and t.ports
+                    else None
+                )
+                self._totals[key] = Traffic(
+                    current.uplink + up, current.downlink + down, connections, now
+                )
+                if up or down:
+                    self._dirty = True
+
+    def _query(self, tracked: dict[str, _Tracked]) -> dict[str, tuple[int, int]]:
+        groups: dict[str, tuple[XrayApi, dict[str, str]]] = {}
+        for key, t in tracked.items():
+            source = t.proxy.stats_source()
+            if source is None:
+                continue
+            api, tag = source
+            groups.setdefault(api.server, (api, {}))[1][tag] = key
+        deltas: dict[str, tuple[int, int]] = {}
+        for api, keys_by_tag in groups.values():
+            try:
+                stats = api.query_stats(_OUTBOUND_PREFIX, reset=True)
+            except XrayApiError:
+                continue
+            for name, value in stats.items():
+                parts = name.split(">>>")
+                if len(parts) != 4 or parts[1] not in keys_by_tag:
+                    continue
+                key = keys_by_tag[parts[1]]
+                up, down = deltas.get(key, (0, 0))
+                if parts[3] == "uplink":
+                    up += value
+                elif parts[3] == "downlink":
+                    down += value
+                deltas[key] = (up, down)
+        return deltas
+
+    def start(self) -> None:
+        """Фоновый опрос (запускается сам при первом track())."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="traffic-collector", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self._interval):
+            self.sample()
+            self.save()
+
+    def stop(self) -> None:
+        """Последний опрос, остановка фонового потока, сохранение итогов."""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=self._interval + 5)
+        self._thread = None
+        self.sample()
+        self.save()
+
+    def save(self) -> None:
+        """
+        Записывает итоги в файл (если изменились), атомарно. Параллельные вызовы
+        пишут по очереди: более поздний снимок не перезаписывается более ранним.
+        """
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                data = {
+                    k: {
+                        "uplink": t.uplink,
+                        "downlink": t.downlink,
+                        "updated_at": t.updated_at,
+                    }
+                    for k, t in self._totals.items()
+                }
+                self._dirty = False
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self._path.with_name(f"{self._path.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self._path)
+
+    def _load(self) -> dict[str, Traffic]:
+        try:
+            data = json.loads(self._path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return {
+            k: Traffic(
+                int(v.get("uplink", 0)),
+                int(v.get("downlink", 0)),
+                updated_at=float(v.get("updated_at", 0.0)),
+            )
+            for k, v in data.items()
+            if isinstance(v, dict)
+        }
@@ -0,0 +1,148 @@
+"""Надзор за процессом xray: перезапуск при падении с экспоненциальной задержкой."""
+
+import subprocess
+import threading
+import time
+from collections.abc import Callable, Sequence
+
+from browser_automation.proxy.probe import ProxyStartError, StderrRing
+
+# Проверка готовности нового процесса; исключение — процесс не поднялся
+ReadyCheck = Callable[[subprocess.Popen, StderrRing], object]
+
+
+class XraySupervisor:
+    """
+    Запускает xray с одними и теми же аргументами (тот же конфиг — те же порты)
+    и перезапускает его, если он завершился сам. Процесс ждёт отдельный поток
+    (process.wait(), без опроса). Задержка перед перезапуском удваивается
+    от initial_backoff до max_backoff и сбрасывается, если процесс проработал
+    дольше stable_after. stderr всех запусков — в общем кольцевом буфере.
+    Первый запуск в start() не повторяется: ошибка уходит вызывающему.
+    prepare() вызывается перед каждым запуском (например, вернуть на диск конфиг).
+    """
+
+    def __init__(
+        self,
+        args: Sequence[str],
+        *,
+        ready: ReadyCheck | None = None,
+        prepare: Callable[[], object] | None = None,
+        initial_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        stable_after: float = 60.0,
+        stderr_bytes: int = 64 * 1024,
+    ) -> None:
+        self._args = list(args)
+        self._ready = ready
+        self._prepare = prepare
+        self._initial_backoff = initial_backoff
+        self._max_backoff = max_backoff
+        self._stable_after = stable_after
+        self.stderr = StderrRing(stderr_bytes)
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._process: subprocess.Popen | None = None
+        self._started_at = 0.0
+        self._watcher: threading.Thread | None = None
+        self.restart_count = 0
+        self.last_exit_code: int | None = None
+        self._downtime = 0.0
+        self._down_since: float | None = None
+
+    @property
+    def downtime(self) -> float:
+        """Суммарное время без работающего xray между падениями и перезапусками, с."""
+        down_since = self._down_since
+        current = time.monotonic() - down_since if down_since is not None else 0.0
+        return self._downtime + current
+
+    @property
+    def process(self) -> subprocess.Popen | None:
+        return self._process
+
+    def is_running(self) -> bool:
+        process = self._process
+        return process is not None and process.poll() is None
+
+    def start(self) -> None:
+        """Запускает xray и дожидается готовности; дальше надзор в фоне."""
+        self._stopping.clear()
+        self._spawn()
+        self._watcher = threading.Thread(
+            target=self._watch, name="xray-supervisor", daemon=True
+        )
+        self._watcher.start()
+
+    def _spawn(self) -> None:
+        with self._lock:
+            if self._stopping.is_set():
+                raise ProxyStartError("xray остановлен")
+            if self._prepare is not None:
+                self._prepare()
+            process = subprocess.Popen(
+                self._args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+            )
+            self.stderr.attach(process)
+            self._process = process
+            self._started_at = time.monotonic()
+        if self._ready is None:
+            return
+        try:
+            self._ready(process, self.stderr)
+        except Exception:
+            _terminate(process)
+            raise
+
+    def _watch(self) -> None:
+        delay = self._initial_backoff
+        while True:
+            process = self._process
+            if process is None:
+                return
+            code = process.wait()
+            if self._stopping.is_set():
+                return
+            self.last_exit_code = code
+            self._down_since = time.monotonic()
+            if self._down_since - self._started_at >= self._stable_after:
+                delay = self._initial_backoff
+            while not self._stopping.wait(delay):
+                delay = min(delay * 2, self._max_backoff)
+                try:
+                    self._spawn()
+                    break
+                except (ProxyStartError, OSError):
+                    continue
+            else:
+                return
+            self.restart_count += 1
+            self._downtime += time.monotonic() - self._down_since
+            self._down_since = None
+
+    def stop(self) -> None:
+        """Останавливает xray и надзор (без перезапуска)."""
+        self._stopping.set()
+        with self._lock:
+            process = self._process
+            self._process = None
+        if process is not None:
+            _terminate(process)
+        watcher = self._watcher
+        if watcher is not None and watcher is not threading.current_thread():
+            watcher.join(timeout=5)
+        self._watcher = None
+        if self._down_since is not None:
+            self._downtime += time.monotonic() - self._down_since
+            self._down_since = None
+
+
+def _terminate(process: subprocess.Popen) -> None:
+    try:
+        process.terminate()
+        process.wait(timeout=5)
+    except Exception:
+        try:
+            process.kill()
+        except Exception:
+            pass
@@ -1,15 +1,28 @@
 """VLESS-прокси через xray-core."""
 
-import json
 import shutil
 import socket
 import subprocess
 import sys
-import tempfile
 from pathlib import Path
 
+from browser_automation.proxy.api import XrayApi, build_api_config, build_stats_config
 from browser_automation.proxy.base import ProxyBase
-from browser_automation.value_objects import ProxyConfig, VlessString
+from browser_automation.proxy.config_cache import ConfigCache, default_config_cache
+from browser_automation.proxy.ports import PortAllocator, default_allocator
+from browser_automation.proxy.probe import (
+    ProxyStartError,
+    StderrRing,
+    probe_latency,
+    wait_socks_ready,
+)
+from browser_automation.proxy.supervisor import XraySupervisor
+from browser_automation.value_objects import (
+    ProxyConfig,
+    TunnelSettings,
+    VlessString,
+    parse_vless,
+)
 
 
 def find_free_port(start: int = 10808) -> int:
@@ -24,6 +37,15 @@ def find_free_port(start: int = 10808) -> int:
     raise RuntimeError(f"Не найден свободный порт в диапазоне {start}-{start+1000}")
 
 
+# Исходящий в обход туннеля (для TunnelSettings.direct_domains)
+DIRECT_TAG = "direct"
+# Тег VLESS outbound отдельного xray (по нему считается трафик)
+PROXY_TAG = "proxy"
+
+# Сколько раз пробовать другую пару портов, если xray не смог занять выданную
+_BIND_ATTEMPTS = 3
+
+
 def _find_xray() -> str:
     """Возвращает путь к xray. Windows: xray.exe, Linux/Ubuntu: xray (из PATH)."""
     if sys.platform == "win32":
@@ -45,12 +67,169 @@ def _find_xray() -> str:
     )
 
 
+def resolve_xray(xray_path: str) -> str:
+    """Полный путь к исполняемому xray (из PATH или как есть, если файл существует)."""
+    resolved = shutil.which(xray_path)
+    if not resolved and Path(xray_path).exists():
+        resolved = str(Path(xray_path).resolve())
+    if not resolved:
+        raise FileNotFoundError(
+            f"xray не найден: {xray_path}. "
+            "Установите Xray-core (Windows: xray.exe, Ubuntu: apt install xray) и добавьте в PATH."
+        )
+    return resolved
+
+
+def build_vless_outbound(
+    v: VlessString, tag: str | None = None, tunnel: TunnelSettings | None = None
+) -> dict:
+    """
+    VLESS outbound xray из разобранной VLESS-строки. tunnel.mux_concurrency > 0 —
+    потоки браузера идут через уже открытые соединения с сервером (mux).
+    """
+    security = v.param("security", "reality")
+    net = v.param("type", "tcp")
+    flow = v.param("flow", "")
+    sni = v.param("sni", v.host)
+    fp = v.param("fp", "random")
+    pbk = v.param("pbk", "")
+    sid = v.param("sid", "")
+    path = v.param("path", "")
+    host = v.param("host", sni) or sni
+
+    outbound: dict = {
+        "protocol": "vless",
+        "settings": {
+            "vnext": [
+                {
+                    "address": v.host,
+                    "port": v.port,
+                    "users": [
+                        dict(
+                            id=v.uuid,
+                            encryption="none",
+                            **({"flow": flow} if flow else {}),
+                        )
+                    ],
+                }
+            ]
+        },
+        "streamSettings": {
+            "network": net,
+            "security": security,
+        },
+    }
+    if tag:
+        outbound["tag"] = tag
+    if tunnel and (tunnel.mux_concurrency > 0 or tunnel.xudp_concurrency > 0):
+        outbound["mux"] = {
+            "enabled": True,
+            # XTLS Vision (flow) несовместим с mux TCP: -1 — mux только для UDP (XUDP)
+            "concurrency": -1 if flow else tunnel.mux_concurrency or 8,
+            **(
+                {"xudpConcurrency": tunnel.xudp_concurrency}
+                if tunnel.xudp_concurrency > 0
+                else {}
+            ),
+        }
+
+    if security == "reality" and pbk:
+        outbound["streamSettings"]["realitySettings"] = {
+            "serverName": sni,
+            "fingerprint": fp,
+            "publicKey": pbk,
+            "shortId": sid or "",
+            "show": False,
+        }
+
+    if net == "tcp" and host:
+        outbound["streamSettings"]["tcpSettings"] = {
+            "header": {"type": "none"},
+        }
+    elif net == "ws":
+        outbound["streamSettings"]["wsSettings"] = {
+            "path": path or "/",
+            "headers": {"Host": host},
+        }
+    elif net == "grpc":
+        outbound["streamSettings"]["grpcSettings"] = {
+            "serviceName": path or "grpc",
+        }
+    return outbound
+
+
+def build_local_inbounds(port: int, tag: str | None = None) -> list[dict]:
+    """Пара локальных inbound: SOCKS5 на port и HTTP на port + 1."""
+    inbounds = [
+        {
+            "port": port,
+            "listen": "127.0.0.1",
+            "protocol": "socks",
+            "settings": {"udp": True},
+            "sniffing": {"enabled": True, "destOverride": ["http", "tls"]},
+        },
+        {
+            "port": port + 1,
+            "listen": "127.0.0.1",
+            "protocol": "http",
+            "settings": {},
+        },
+    ]
+    if tag:
+        inbounds[0]["tag"] = f"{tag}-socks"
+        inbounds[1]["tag"] = f"{tag}-http"
+    return inbounds
+
+
+def build_dns(tunnel: TunnelSettings | None) -> dict | None:
+    """Встроенный DNS xray (ответы кэшируются); None — резолв системой."""
+    if not tunnel or not tunnel.dns_servers:
+        return None
+    return {"servers": list(tunnel.dns_servers), "queryStrategy": "UseIP"}
+
+
+def build_direct_outbound(*, use_dns: bool = False) -> dict:
+    """Выход напрямую; use_dns — адреса через встроенный DNS xray (с кэшем)."""
+    outbound: dict = {"protocol": "freedom", "tag": DIRECT_TAG}
+    if use_dns:
+        outbound["settings"] = {"domainStrategy": "UseIP"}
+    return outbound
+
+
+def build_direct_rule(
+    tunnel: TunnelSettings | None, inbound_tags: list[str] | None = None
+) -> dict | None:
+    """Правило routing: direct_domains — в DIRECT_TAG, мимо туннеля."""
+    if not tunnel or not tunnel.direct_domains:
+        return None
+    rule: dict = {
+        "type": "field",
+        "domain": list(tunnel.direct_domains),
+        "outboundTag": DIRECT_TAG,
+    }
+    if inbound_tags:
+        rule["inboundTag"] = inbound_tags
+    return rule
+
+
 class VlessProxy(ProxyBase):
     """
     Прокси на базе VLESS. Принимает VLESS-строку, запускает xray-core
     с локальным SOCKS5/HTTP inbound и VLESS outbound.
     Требует установленный xray в PATH (Windows: xray.exe, Linux: xray).
-    При stop() xray завершается.
+    start() возвращается, когда SOCKS5 inbound принял рукопожатие (не дольше
+    ready_timeout); если xray упал — ProxyStartError с его stderr.
+    ready_time — сколько ждали готовности, probe_latency — задержка запроса
+    через туннель (только при measure_latency=True).
+    Порты SOCKS5/HTTP — пара из PortAllocator (по умолчанию общий на процесс),
+    при stop() xray завершается и пара возвращается в аллокатор.
+    Конфиг xray берётся из ConfigCache (файл по хэшу содержимого, общий между
+    запусками), временные файлы не создаются.
+    Упавший xray перезапускается XraySupervisor на тех же портах — браузер
+    продолжает работать через тот же прокси; restart_count и downtime — статистика.
+    tunnel — mux, DNS и домены в обход туннеля; None — голый outbound, как раньше.
+    stats — счётчики трафика xray и API для них на отдельном порту из аллокатора
+    (stats_source() для TrafficCollector).
     """
 
     def __init__(
@@ -59,154 +238,171 @@ class VlessProxy(ProxyBase):
         *,
         local_port: int = 10808,
         xray_path: str | Path | None = None,
+        ready_timeout: float = 10.0,
+        measure_latency: bool = False,
+        ports: PortAllocator | None = None,
+        configs: ConfigCache | None = None,
+        tunnel: TunnelSettings | None = None,
+        stats: bool = True,
     ) -> None:
         if isinstance(vless_string, str):
-            vless_string = VlessString(vless_string)
+            vless_string = parse_vless(vless_string)
         self._vless = vless_string
+        self._tunnel = tunnel if tunnel and not tunnel.is_default else None
+        self._stats = stats
+        self._api_port: int | None = None
         self._local_port = local_port
         self._xray_path = str(xray_path) if xray_path else _find_xray()
-        self._process: subprocess.Popen | None = None
-        self._config_path: Path | None = None
+        self._supervisor: XraySupervisor | None = None
+        self._configs = configs or default_config_cache
+        self._ports = ports or default_allocator
+        self._reserved = False
+        self._ready_timeout = ready_timeout
+        self._measure_latency = measure_latency
+        self.ready_time: float | None = None
+        self.probe_latency: float | None = None
+
+    @property
+    def vless(self) -> VlessString:
+        return self._vless
+
+    @property
+    def tunnel(self) -> TunnelSettings | None:
+        return self._tunnel
 
     def _build_xray_config(self) -> dict:
         """Генерирует конфиг xray из VLESS-строки."""
-        v = self._vless
-        security = v.param("security", "reality")
-        net = v.param("type", "tcp")
-        flow = v.param("flow", "")
-        sni = v.param("sni", v.host)
-        fp = v.param("fp", "random")
-        pbk = v.param("pbk", "")
-        sid = v.param("sid", "")
-        path = v.param("path", "")
-        host = v.param("host", sni) or sni
-
-        outbound: dict = {
-            "protocol": "vless",
-            "settings": {
-                "vnext": [
-                    {
-                        "address": v.host,
-                        "port": v.port,
-                        "users": [
-                            dict(
-                                id=v.uuid,
-                                encryption="none",
-                                **({"flow": flow} if flow else {}),
-                            )
-                        ],
-                    }
-                ]
-            },
-            "streamSettings": {
-                "network": net,
-                "security": security,
-            },
-        }
-
-        if security == "reality" and pbk:
-            outbound["streamSettings"]["realitySettings"] = {
-                "serverName": sni,
-                "fingerprint": fp,
-                "publicKey": pbk,
-                "shortId": sid or "",
-                "show": False,
-            }
-
-        if net == "tcp" and host:
-            outbound["streamSettings"]["tcpSettings"] = {
-                "header": {"type": "none"},
-            }
-        elif net == "ws":
-            outbound["streamSettings"]["wsSettings"] = {
-                "path": path or "/",
-                "headers": {"Host": host},
-            }
-        elif net == "grpc":
-            outbound["streamSettings"]["grpcSettings"] = {
-                "serviceName": path or "grpc",
-            }
-
-        return {
+        tag = PROXY_TAG if self._api_port is not None else None
+        config: dict = {
             "log": {"loglevel": "warning"},
-            "inbounds": [
-                {
-                    "port": self._local_port,
-                    "listen": "127.0.0.1",
-                    "protocol": "socks",
-                    "settings": {"udp": True},
-                    "sniffing": {"enabled": True, "destOverride": ["http", "tls"]},
-                },
-                {
-                    "port": self._local_port + 1,
-                    "listen": "127.0.0.1",
-                    "protocol": "http",
-                    "settings": {},
-                },
-            ],
-            "outbounds": [outbound],
+            "inbounds": build_local_inbounds(self._local_port),
+            # Первый outbound — по умолчанию для всего, что не попало в правила
+            "outbounds": [build_vless_outbound(self._vless, tag, self._tunnel)],
         }
+        rules: list[dict] = []
+        if self._api_port is not None:
+            api, api_inbound, api_rule = build_api_config(self._api_port)
+            config["api"] = api
+            config["stats"], config["policy"] = build_stats_config()
+            config["inbounds"].append(api_inbound)
+            rules.append(api_rule)
+        dns = build_dns(self._tunnel)
+        if dns:
+            config["dns"] = dns
+        direct = build_direct_rule(self._tunnel)
+        if direct:
+            config["outbounds"].append(build_direct_outbound(use_dns=bool(dns)))
+            rules.append(direct)
+        if rules:
+            config["routing"] = {"domainStrategy": "AsIs", "rules": rules}
+        return config
 
     def start(self) -> ProxyConfig:
-        if self._process is not None:
+        if self._supervisor is not None:
             return ProxyConfig("127.0.0.1", self._local_port)
 
-        # Ищем свободный порт: start, start+1, … пока не найдём
-        self._local_port = find_free_port(max(10808, self._local_port))
-
-        resolved = shutil.which(self._xray_path)
-        if not resolved and Path(self._xray_path).exists():
-            resolved = str(Path(self._xray_path).resolve())
-        if not resolved:
-            raise FileNotFoundError(
-                f"xray не найден: {self._xray_path}. "
-                "Установите Xray-core (Windows: xray.exe, Ubuntu: apt install xray) и добавьте в PATH."
-            )
-        self._xray_path = resolved
-        config = self._build_xray_config()
-        fd, path = tempfile.mkstemp(suffix=".json")
-        try:
-            import os
+        self._xray_path = resolve_xray(self._xray_path)
+        start_port = max(10808, self._local_port)
+        for attempt in range(_BIND_ATTEMPTS):
+            # Пара из аллокатора процесса: параллельные запуски не совпадут
+            self._local_port = self._ports.reserve(start_port)
+            self._reserved = True
+            if self._stats:
+                self._api_port = self._ports.reserve()
+            try:
+                self._spawn()
+                break
+            except ProxyStartError as e:
+                # Порт между проверкой и запуском xray занял другой процесс — берём другой
+                if e.address_in_use:
+                    self._release_ports(busy=True)
+                if not e.address_in_use or attempt == _BIND_ATTEMPTS - 1:
+                    raise
+        if self._measure_latency:
+            self.measure_latency()
 
-            with os.fdopen(fd, "w") as f:
-                json.dump(config, f, indent=2)
-            self._config_path = Path(path)
-        except Exception:
-            import os
+        return ProxyConfig("127.0.0.1", self._local_port)
 
-            try:
-                os.close(fd)
-            except Exception:
-                pass
-            Path(path).unlink(missing_ok=True)
+    def _config_file(self) -> Path:
+        """Конфиг из кэша: для той же VLESS-строки, настроек и портов — тот же файл."""
+        return self._configs.path_for(
+            (self._vless.raw, self._tunnel, self._local_port, self._api_port),
+            self._build_xray_config,
+        )
+
+    def _spawn(self) -> None:
+        path = self._config_file()
+        self._supervisor = XraySupervisor(
+            [self._xray_path, "run", "-c", str(path)],
+            ready=self._wait_ready,
+            # Между перезапусками файл могла удалить сборка мусора кэша
+            prepare=self._config_file,
+        )
+        try:
+            self._supervisor.start()
+        except ProxyStartError as e:
+            self._terminate(release_port=not e.address_in_use)
+            raise
+        except Exception:
+            self.stop()
             raise
 
-        self._process = subprocess.Popen(
-            [self._xray_path, "run", "-c", path],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
+    def _wait_ready(self, process: subprocess.Popen, stderr: StderrRing) -> None:
+        self.ready_time = wait_socks_ready(
+            "127.0.0.1",
+            self._local_port,
+            timeout=self._ready_timeout,
+            process=process,
+            stderr=stderr,
         )
 
-        return ProxyConfig("127.0.0.1", self._local_port)
+    @property
+    def restart_count(self) -> int:
+        """Сколько раз xray перезапускался после падения."""
+        return self._supervisor.restart_count if self._supervisor else 0
 
-    def stop(self) -> None:
-        if self._process is None:
-            return
+    @property
+    def downtime(self) -> float:
+        """Суммарное время, пока упавший xray не был поднят заново, с."""
+        return self._supervisor.downtime if self._supervisor else 0.0
+
+    def stats_source(self) -> tuple[XrayApi, str] | None:
+        if self._api_port is None or not self.is_running():
+            return None
+        return XrayApi(self._xray_path, f"127.0.0.1:{self._api_port}"), PROXY_TAG
+
+    def stderr_tail(self) -> str:
+        """Последние килобайты stderr xray (включая упавшие запуски)."""
+        return self._supervisor.stderr.text() if self._supervisor else ""
+
+    def measure_latency(self) -> float | None:
+        """Замеряет задержку через туннель; None — запрос не прошёл."""
         try:
-            self._process.terminate()
-            self._process.wait(timeout=5)
-        except Exception:
-            try:
-                self._process.kill()
-            except Exception:
-                pass
-        self._process = None
-        if self._config_path and self._config_path.exists():
-            try:
-                self._config_path.unlink()
-            except Exception:
-                pass
-        self._config_path = None
+            self.probe_latency = probe_latency("127.0.0.1", self._local_port)
+        except OSError:
+            self.probe_latency = None
+        return self.probe_latency
+
+    def stop(self) -> None:
+        self._terminate(release_port=True)
+
+    def _release_ports(self, *, busy: bool = False) -> None:
+        # Какой из портов оказался занят, по stderr не понять — помечаем оба
+        if self._reserved:
+            self._ports.release(self._local_port, busy=busy)
+            self._reserved = False
+        if self._api_port is not None:
+            self._ports.release(self._api_port, busy=busy)
+            self._api_port = None
+
+    def _terminate(self, *, release_port: bool) -> None:
+        # Порты возвращаются, только когда xray завершился: иначе параллельный
+        # reserve() получит ещё занятую пару и пометит её чужой
+        if self._supervisor is not None:
+            self._supervisor.stop()
+            self._supervisor = None
+        if release_port:
+            self._release_ports()
 
     def is_running(self) -> bool:
-        return self._process is not None and self._process.poll() is None
+        return self._supervisor is not None and self._supervisor.is_running()
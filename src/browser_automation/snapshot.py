@@ -0,0 +1,37 @@
+"""Снимок состояния профиля: куки, localStorage и IndexedDB (storage_state Playwright) в gzip."""
+
+import gzip
+import json
+import os
+from pathlib import Path
+
+SNAPSHOT_SUFFIX = ".state.json.gz"
+
+
+def snapshot_path(data_root: Path | str, profile_id: str) -> Path:
+    """profiles-data/<id>.state.json.gz — рядом с каталогами persistent-профилей."""
+    return Path(data_root) / f"{profile_id}{SNAPSHOT_SUFFIX}"
+
+
+def load_snapshot(path: Path | str) -> dict | None:
+    """storage_state из снимка; None — снимка нет или он повреждён."""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, EOFError, ValueError):
+        return None
+    return state if isinstance(state, dict) else None
+
+
+def save_snapshot(path: Path | str, state: dict) -> None:
+    """Записывает снимок атомарно: при сбое остаётся предыдущий."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
@@ -0,0 +1,33 @@
+from pathlib import Path
+
+from browser_automation.storage.base import ProfileStorage, StaleProfileError
+from browser_automation.storage.journal import JournaledJsonStorage
+from browser_automation.storage.json_file import JsonProfileStorage
+from browser_automation.storage.sqlite import SqliteProfileStorage
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+
+def open_storage(path: str | Path, *, journal: bool = False) -> ProfileStorage:
+    """
+    Хранилище по расширению файла: .db/.sqlite/.sqlite3 — SQLite, иначе JSON.
+    Для SQLite однократно переносятся профили из соседнего .json (если есть).
+    journal=True — JSON с журналом изменений; если журнал уже лежит рядом,
+    этот режим включается всегда, иначе его хвост был бы потерян.
+    """
+    path = Path(path)
+    if path.suffix.lower() in SQLITE_SUFFIXES:
+        return SqliteProfileStorage(path, migrate_from=path.with_suffix(".json"))
+    if journal or JournaledJsonStorage.has_journal(path):
+        return JournaledJsonStorage(path)
+    return JsonProfileStorage(path)
+
+
+__all__ = [
+    "JournaledJsonStorage",
+    "JsonProfileStorage",
+    "ProfileStorage",
+    "SqliteProfileStorage",
+    "StaleProfileError",
+    "open_storage",
+]
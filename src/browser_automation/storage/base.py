@@ -0,0 +1,100 @@
+"""Базовый класс хранилища профилей."""
+
+from abc import ABC, abstractmethod
+from collections.abc import Hashable, Iterable, Mapping, Sequence
+from pathlib import Path
+
+
+# Размер пачки базовой append_many()
+APPEND_BATCH_SIZE = 500
+
+
+class StaleProfileError(Exception):
+    """Профиль изменён другим процессом/окном после того, как был прочитан."""
+
+    def __init__(self, profile_id: str, expected: int, actual: int) -> None:
+        super().__init__(
+            f"Профиль {profile_id} изменён в другом месте "
+            f"(ревизия {actual}, ожидалась {expected}). Перечитайте профиль."
+        )
+        self.profile_id = profile_id
+        self.expected = expected
+        self.actual = actual
+
+
+def record_revision(d: dict | None) -> int:
+    """Ревизия записи; 0 — записи нет или она создана до появления ревизий."""
+    if not d:
+        return 0
+    return int(d.get("rev", 0))
+
+
+def check_revisions(
+    current: Mapping[str, dict],
+    expected: Mapping[str, int],
+) -> None:
+    """Бросает StaleProfileError, если ревизия какой-то записи не совпадает с ожидаемой."""
+    for profile_id, rev in expected.items():
+        actual = record_revision(current.get(profile_id))
+        if actual != rev:
+            raise StaleProfileError(profile_id, rev, actual)
+
+
+class ProfileStorage(ABC):
+    """
+    Абстрактное хранилище записей профилей (словари Profile.to_dict), ключ — id.
+    Кэширование и построение Profile — на стороне ProfileRepository.
+    У каждой записи есть ревизия "rev": apply() выставляет её в (сохранённая + 1).
+    """
+
+    @abstractmethod
+    def load(self) -> list[dict]:
+        """Все записи в порядке добавления."""
+        ...
+
+    @abstractmethod
+    def signature(self) -> Hashable:
+        """Токен состояния: меняется, когда хранилище изменено извне."""
+        ...
+
+    @abstractmethod
+    def apply(
+        self,
+        upserts: Sequence[dict] = (),
+        deletes: Sequence[str] = (),
+        expected: Mapping[str, int] | None = None,
+    ) -> Hashable | None:
+        """
+        Атомарно применяет пачку изменений: вставка/замена записей по id и удаление по id.
+        Ревизии upserts выставляются на месте (в переданных словарях).
+        expected — id → ожидаемая текущая ревизия; при расхождении ничего не пишется
+        и бросается StaleProfileError.
+        Возвращает сигнатуру после записи либо None, если до записи хранилище успели
+        изменить извне (тогда кэш поверх него нужно перечитать).
+        """
+        ...
+
+    def append_many(self, items: Iterable[dict]) -> Hashable | None:
+        """
+        Добавляет поток новых записей (id ещё нет в хранилище) одной поэтапной
+        записью: items читаются по одной и в памяти не удерживаются. Ошибка
+        посреди потока (например, битый файл импорта) — ничего не записывается.
+        Ревизии выставляются на месте; возвращает то же, что apply().
+        Базовая реализация — apply() пачками (без атомарности всего потока).
+        """
+        fresh = True
+        batch: list[dict] = []
+        for d in items:
+            batch.append(d)
+            if len(batch) >= APPEND_BATCH_SIZE:
+                fresh = self.apply(upserts=batch) is not None and fresh
+                batch = []
+        sig = self.apply(upserts=batch) if batch else self.signature()
+        return sig if fresh else None
+
+    def watch_paths(self) -> list[Path]:
+        """Файлы, изменение которых означает изменение хранилища (для наблюдателя GUI)."""
+        return []
+
+    def close(self) -> None:
+        """Освобождает ресурсы хранилища."""
@@ -0,0 +1,240 @@
+"""JSON-хранилище профилей с журналом изменений (append-only) и фоновым сжатием."""
+
+import json
+import os
+import threading
+from collections.abc import Iterable, Mapping, Sequence
+from pathlib import Path
+
+from browser_automation.storage.base import check_revisions, record_revision
+from browser_automation.storage.json_file import JsonProfileStorage
+
+# Сколько записей в журнале до фонового сжатия в новый снимок
+DEFAULT_COMPACT_THRESHOLD = 1000
+# Сколько записей append_many() копит перед write()
+_APPEND_CHUNK = 500
+
+_Stat = tuple[int, int] | None
+
+
+def _stat(path: Path) -> _Stat:
+    """(inode, size) файла. None — файла нет."""
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size)
+
+
+def _dump_op(op: dict) -> str:
+    return json.dumps(op, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def _replay(path: Path, items: dict[str, dict], offset: int = 0) -> tuple[int, int]:
+    """
+    Применяет к items записи журнала начиная с offset.
+    Недописанная или битая последняя строка (обрыв записи) игнорируется.
+    Возвращает (смещение после последней целой записи, число записей).
+    """
+    count = 0
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return offset, 0
+    with f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                op = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            if op.get("op") == "put":
+                item = op["item"]
+                items[item.get("id", "")] = item
+            elif op.get("op") == "del":
+                items.pop(op.get("id", ""), None)
+            offset += len(line)
+            count += 1
+    return offset, count
+
+
+class JournaledJsonStorage(JsonProfileStorage):
+    """
+    profiles.json как снимок + журнал profiles.json.journal рядом с ним.
+    Каждое изменение — короткая NDJSON-запись (put/del по id), дописанная в журнал с fsync:
+    стоимость записи не зависит от числа профилей, обрыв процесса не портит файлы.
+    Когда журнал набирает compact_threshold записей, фоновый поток сворачивает его
+    в новый снимок (временный файл + атомарный rename), затем очищает журнал.
+    Обрыв между этими шагами безопасен: повторное применение журнала к снимку,
+    который его уже содержит, даёт то же состояние.
+    При открытии читается снимок и воспроизводится только хвост — журнал с момента
+    последнего сжатия; изменения других процессов дочитываются с последнего смещения.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        compact_threshold: int = DEFAULT_COMPACT_THRESHOLD,
+    ) -> None:
+        super().__init__(path)
+        self._journal_path = self.journal_path(self._path)
+        self._compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._compactor: threading.Thread | None = None
+
+    @staticmethod
+    def journal_path(path: str | Path) -> Path:
+        path = Path(path)
+        return path.with_name(path.name + ".journal")
+
+    @classmethod
+    def has_journal(cls, path: str | Path) -> bool:
+        """Есть ли рядом с path журнал."""
+        return cls.journal_path(path).exists()
+
+    def signature(self) -> tuple:
+        return (super().signature(), _stat(self._journal_path))
+
+    def watch_paths(self) -> list[Path]:
+        return [self._path, self._journal_path]
+
+    def _current(self) -> dict[str, dict]:
+        with self._lock, self._file_lock.shared():
+            sig = self.signature()
+            if self._items is not None and sig == self._items_signature:
+                return self._items
+            if self._items is not None and self._only_journal_grew(sig):
+                self._journal_offset, count = _replay(
+                    self._journal_path, self._items, self._journal_offset
+                )
+                self._journal_records += count
+            else:
+                self._reload()
+            self._items_signature = sig
+            return self._items
+
+    def _only_journal_grew(self, sig: tuple) -> bool:
+        """Снимок тот же, журнал тот же файл и только дописан — хватит прочитать хвост."""
+        if self._items_signature is None:
+            return False
+        snap, journal = sig
+        old_snap, old_journal = self._items_signature
+        if snap != old_snap or journal is None:
+            return False
+        # Журнала не было (после сжатия) — читаем новый с начала
+        return old_journal is None or (
+            journal[0] == old_journal[0] and journal[1] >= old_journal[1]
+        )
+
+    def _reload(self) -> None:
+        items = {d.get("id", ""): d for d in self._read()}
+        self._journal_offset, self._journal_records = _replay(
+            self._journal_path, items
+        )
+        self._items = items
+
+    def apply(
+        self,
+        upserts: Sequence[dict] = (),
+        deletes: Sequence[str] = (),
+        expected: Mapping[str, int] | None = None,
+    ) -> tuple | None:
+        with self._lock, self._file_lock.exclusive():
+            fresh = self._is_fresh()
+            items = self._current()
+            if expected:
+                check_revisions(items, expected)
+            self._truncate_tail()
+            ops = []
+            for d in upserts:
+                d["rev"] = record_revision(items.get(d["id"])) + 1
+                ops.append({"op": "put", "item": d})
+            ops += [{"op": "del", "id": profile_id} for profile_id in deletes]
+            if not ops:
+                return self._items_signature if fresh else None
+            data = "".join(_dump_op(op) for op in ops).encode("utf-8")
+            with open(self._journal_path, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            for d in upserts:
+                items[d["id"]] = d
+            for profile_id in deletes:
+                items.pop(profile_id, None)
+            self._journal_offset += len(data)
+            self._journal_records += len(ops)
+            self._items_signature = self.signature()
+            if self._journal_records >= self._compact_threshold:
+                self._compact_in_background()
+            return self._items_signature if fresh else None
+
+    def _truncate_tail(self) -> None:
+        """Обрыв при дописывании: отрезаем битый хвост, чтобы новые записи не склеились с ним."""
+        size = _stat(self._journal_path)
+        if size is not None and size[1] > self._journal_offset:
+            with open(self._journal_path, "r+b") as f:
+                f.truncate(self._journal_offset)
+
+    def append_many(self, items: Iterable[dict]) -> tuple | None:
+        """Дописывает поток put в журнал; ошибка посреди потока — хвост отрезается."""
+        with self._lock, self._file_lock.exclusive():
+            fresh = self._is_fresh()
+            current = self._current()
+            self._truncate_tail()
+            count = 0
+            try:
+                with open(self._journal_path, "ab") as f:
+                    chunk: list[str] = []
+                    for d in items:
+                        d["rev"] = record_revision(current.get(d["id"])) + 1
+                        chunk.append(_dump_op({"op": "put", "item": d}))
+                        count += 1
+                        if len(chunk) >= _APPEND_CHUNK:
+                            f.write("".join(chunk).encode("utf-8"))
+                            chunk.clear()
+                    f.write("".join(chunk).encode("utf-8"))
+                    f.flush()
+                    os.fsync(f.fileno())
+            except BaseException:
+                self._truncate_tail()
+                raise
+            # Добавленное не держим в памяти — при обращении журнал дочитается заново
+            self._items = None
+            self._journal_records += count
+            self._items_signature = self.signature()
+            if self._journal_records >= self._compact_threshold:
+                self._compact_in_background()
+            return self._items_signature if fresh else None
+
+    def _compact_in_background(self) -> None:
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(
+            target=self.compact, name="profiles-journal-compactor", daemon=True
+        )
+        self._compactor.start()
+
+    def compact(self) -> None:
+        """Сворачивает журнал в новый снимок profiles.json."""
+        with self._lock, self._file_lock.exclusive():
+            items = self._current()
+            if not self._journal_path.exists():
+                return
+            self._write(list(items.values()))
+            self._journal_path.unlink()
+            self._journal_offset = 0
+            self._journal_records = 0
+            self._items_signature = self.signature()
+
+    def close(self) -> None:
+        """Дожидается фонового сжатия и сворачивает остаток журнала."""
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+        self.compact()
+        super().close()
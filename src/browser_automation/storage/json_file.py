@@ -0,0 +1,149 @@
+"""Хранилище профилей в одном JSON-файле."""
+
+import itertools
+import json
+import os
+from collections.abc import Iterable, Mapping, Sequence
+from pathlib import Path
+
+from browser_automation.storage.base import (
+    ProfileStorage,
+    check_revisions,
+    record_revision,
+)
+from browser_automation.storage.lock import FileLock
+
+
+class JsonProfileStorage(ProfileStorage):
+    """
+    Все профили — JSON-массив в одном файле.
+    Любое изменение перезаписывает файл целиком: через временный файл,
+    fsync и атомарный rename — прерванная запись не портит profiles.json.
+    Импорт потоком (append_many) — одна такая перезапись на весь импорт;
+    добавленные записи после неё не кэшируются, файл перечитывается по требованию.
+    Чтение идёт под разделяемой, запись (read-modify-write) — под эксклюзивной
+    межпроцессной блокировкой profiles.json.lock: GUI и скрипты на одном файле
+    не теряют изменения друг друга.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._file_lock = FileLock(self._path.with_name(self._path.name + ".lock"))
+        with self._file_lock.exclusive():
+            self._ensure_file()
+        self._items: dict[str, dict] | None = None
+        self._items_signature: tuple[int, int, int] | None = None
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def _ensure_file(self) -> None:
+        if not self._path.exists():
+            self._path.write_text("[]", encoding="utf-8")
+
+    def _read(self) -> list[dict]:
+        try:
+            data = self._path.read_text(encoding="utf-8")
+            return json.loads(data)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return []
+
+    def _write(self, items: Iterable[dict]) -> None:
+        """
+        Пишет записи по одной (тот же вид, что json.dumps(..., indent=2)) во временный
+        файл и подменяет им profiles.json. Ошибка посреди items — файл не тронут.
+        """
+        tmp = self._path.with_name(self._path.name + ".tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write("[")
+                sep = "\n  "
+                for d in items:
+                    f.write(sep)
+                    f.write(
+                        json.dumps(d, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+                    )
+                    sep = ",\n  "
+                f.write("]" if sep == "\n  " else "\n]")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self._path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    def _current(self) -> dict[str, dict]:
+        """Записи по id; файл перечитывается, только если изменился."""
+        with self._file_lock.shared():
+            sig = self.signature()
+            if self._items is None or sig != self._items_signature:
+                self._items = {d.get("id", ""): d for d in self._read()}
+                self._items_signature = sig
+            return self._items
+
+    def _is_fresh(self) -> bool:
+        """Хранилище не менялось извне с последнего чтения/записи этим объектом."""
+        return (
+            self._items_signature is not None
+            and self.signature() == self._items_signature
+        )
+
+    def signature(self) -> tuple[int, int, int] | None:
+        """Сигнатура файла: (mtime_ns, size, inode). None — файла нет."""
+        try:
+            st = self._path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def watch_paths(self) -> list[Path]:
+        return [self._path]
+
+    def load(self) -> list[dict]:
+        return list(self._current().values())
+
+    def apply(
+        self,
+        upserts: Sequence[dict] = (),
+        deletes: Sequence[str] = (),
+        expected: Mapping[str, int] | None = None,
+    ) -> tuple[int, int, int] | None:
+        with self._file_lock.exclusive():
+            fresh = self._is_fresh()
+            current = self._current()
+            if expected:
+                check_revisions(current, expected)
+            # Новое состояние — на копии: кэш меняется, только если файл записан
+            items = dict(current)
+            revisions = [record_revision(current.get(d["id"])) + 1 for d in upserts]
+            for d, rev in zip(upserts, revisions):
+                items[d["id"]] = {**d, "rev": rev}
+            for profile_id in deletes:
+                items.pop(profile_id, None)
+            self._write(items.values())
+            self._items = items
+            self._items_signature = self.signature()
+            for d, rev in zip(upserts, revisions):
+                d["rev"] = rev
+            return self._items_signature if fresh else None
+
+    def append_many(self, items: Iterable[dict]) -> tuple[int, int, int] | None:
+        with self._file_lock.exclusive():
+            fresh = self._is_fresh()
+            current = self._current()
+
+            def added() -> Iterable[dict]:
+                for d in items:
+                    d["rev"] = record_revision(current.get(d["id"])) + 1
+                    yield d
+
+            self._write(itertools.chain(current.values(), added()))
+            # Добавленное не держим в памяти — при обращении файл перечитается
+            self._items = None
+            self._items_signature = self.signature()
+            return self._items_signature if fresh else None
+
+    def close(self) -> None:
+        self._file_lock.close()
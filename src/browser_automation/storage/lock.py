@@ -0,0 +1,87 @@
+"""Межпроцессная блокировка файла хранилища (fcntl на Linux/macOS, msvcrt на Windows)."""
+
+import os
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock:
+    """
+    Advisory-блокировка через отдельный файл *.lock (сам файл данных заменяется rename).
+    shared() — для чтения: читатели разных процессов не ждут друг друга;
+    exclusive() — для read-modify-write. Повторный захват в том же объекте
+    не блокирует (вложенный shared внутри exclusive — no-op).
+    На Windows msvcrt не умеет разделяемых блокировок — shared() там эксклюзивный.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self._path = Path(path)
+        self._fd: int | None = None
+        self._exclusive = False
+        self._depth = 0
+        self._thread_lock = threading.RLock()
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        with self._hold(exclusive=False):
+            yield
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        with self._hold(exclusive=True):
+            yield
+
+    @contextmanager
+    def _hold(self, *, exclusive: bool) -> Iterator[None]:
+        with self._thread_lock:
+            if self._depth == 0:
+                self._acquire(exclusive)
+            elif exclusive and not self._exclusive:
+                raise RuntimeError("Нельзя повысить shared-блокировку до exclusive")
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._release()
+
+    def _acquire(self, exclusive: bool) -> None:
+        if self._fd is None:
+            self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+        if sys.platform == "win32":
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            while True:
+                try:
+                    msvcrt.locking(self._fd, msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.01)
+        else:
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        self._exclusive = exclusive
+
+    def _release(self) -> None:
+        if self._fd is None:
+            return
+        if sys.platform == "win32":
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._exclusive = False
+
+    def close(self) -> None:
+        with self._thread_lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
@@ -0,0 +1,175 @@
+"""Хранилище профилей в SQLite (WAL, индексы по id/name, изменения по одной строке)."""
+
+import json
+import sqlite3
+import threading
+from collections.abc import Iterable, Mapping, Sequence
+from pathlib import Path
+
+from browser_automation.storage.base import ProfileStorage, StaleProfileError
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    id   TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    rev  INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_profiles_name ON profiles(name);
+"""
+
+_UPSERT = """
+INSERT INTO profiles (id, name, rev, data) VALUES (?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET name = excluded.name, rev = excluded.rev, data = excluded.data
+"""
+
+
+def _dump(d: dict) -> str:
+    return json.dumps(d, ensure_ascii=False, separators=(",", ":"))
+
+
+class SqliteProfileStorage(ProfileStorage):
+    """
+    Профили в таблице SQLite: одна строка на профиль, запись в формате Profile.to_dict.
+    Изменение профиля — один UPSERT/DELETE, а не перезапись всего хранилища.
+    Ревизия хранится в отдельной колонке rev; конкурентные процессы разводит сама SQLite
+    (BEGIN IMMEDIATE), устаревшая запись отклоняется по ревизии.
+    migrate_from — JSON-файл старого формата: переносится один раз, если таблица пуста,
+    после чего переименовывается в *.migrated.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        migrate_from: str | Path | None = None,
+    ) -> None:
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self._path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(profiles)")}
+        if "rev" not in columns:
+            self._conn.execute(
+                "ALTER TABLE profiles ADD COLUMN rev INTEGER NOT NULL DEFAULT 0"
+            )
+        # data_version на момент последнего чтения/записи этим соединением
+        self._seen_version: int | None = None
+        if migrate_from:
+            self._migrate_json(Path(migrate_from))
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def _migrate_json(self, src: Path) -> None:
+        """Однократный перенос профилей из JSON-файла."""
+        if not src.exists():
+            return
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM profiles LIMIT 1").fetchone():
+                return
+        try:
+            items = json.loads(src.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            return
+        self.apply(upserts=[d for d in items if d.get("id")])
+        src.rename(src.with_name(src.name + ".migrated"))
+
+    def watch_paths(self) -> list[Path]:
+        # В режиме WAL коммиты других процессов меняют файл -wal
+        return [self._path, self._path.with_name(self._path.name + "-wal")]
+
+    def _data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def signature(self) -> int:
+        # data_version меняется только при коммитах других соединений
+        with self._lock:
+            return self._data_version()
+
+    def load(self) -> list[dict]:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._seen_version = self._data_version()
+                rows = self._conn.execute(
+                    "SELECT rev, data FROM profiles ORDER BY rowid"
+                ).fetchall()
+            finally:
+                self._conn.execute("COMMIT")
+        items = []
+        for rev, data in rows:
+            d = json.loads(data)
+            d["rev"] = rev
+            items.append(d)
+        return items
+
+    def _revision(self, profile_id: str) -> int:
+        row = self._conn.execute(
+            "SELECT rev FROM profiles WHERE id = ?", (profile_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def apply(
+        self,
+        upserts: Sequence[dict] = (),
+        deletes: Sequence[str] = (),
+        expected: Mapping[str, int] | None = None,
+    ) -> int | None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._data_version()
+                fresh = version == self._seen_version
+                for profile_id, rev in (expected or {}).items():
+                    actual = self._revision(profile_id)
+                    if actual != rev:
+                        raise StaleProfileError(profile_id, rev, actual)
+                for d in upserts:
+                    d["rev"] = self._revision(d["id"]) + 1
+                self._conn.executemany(
+                    _UPSERT,
+                    [(d["id"], d.get("name", ""), d["rev"], _dump(d)) for d in upserts],
+                )
+                self._conn.executemany(
+                    "DELETE FROM profiles WHERE id = ?",
+                    [(profile_id,) for profile_id in deletes],
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            self._seen_version = version
+            return version if fresh else None
+
+    def append_many(self, items: Iterable[dict]) -> int | None:
+        def rows() -> Iterable[tuple[str, str, str]]:
+            for d in items:
+                d["rev"] = 1
+                yield d["id"], d.get("name", ""), _dump(d)
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._data_version()
+                fresh = version == self._seen_version
+                self._conn.executemany(
+                    "INSERT INTO profiles (id, name, rev, data) VALUES (?, ?, 1, ?)",
+                    rows(),
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            self._seen_version = version
+            return version if fresh else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,128 @@
+"""Сравнение режимов хранения профиля: persistent (каталог Firefox) и snapshot (storage_state)."""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from browser_automation.camoufox_launcher import CamoufoxLauncher
+from browser_automation.snapshot import snapshot_path
+from browser_automation.value_objects import (
+    STORAGE_PERSISTENT,
+    STORAGE_SNAPSHOT,
+    CamoufoxSettings,
+    Profile,
+)
+
+DEFAULT_URL = "https://example.com"
+DEFAULT_ROUNDS = 3
+
+
+@dataclass(frozen=True)
+class BenchResult:
+    """Время запусков (первый — с пустым хранилищем), с; размер на диске, байт."""
+
+    mode: str
+    launches: tuple[float, ...]
+    disk_usage: int
+
+    @property
+    def cold(self) -> float:
+        return self.launches[0]
+
+    @property
+    def warm(self) -> float | None:
+        """Медиана повторных запусков (с уже сохранённым состоянием)."""
+        return statistics.median(self.launches[1:]) if len(self.launches) > 1 else None
+
+
+def disk_usage(path: Path) -> int:
+    """Суммарный размер файла или каталога, байт."""
+    if path.is_file():
+        return path.stat().st_size
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def bench_mode(
+    mode: str,
+    root: Path,
+    *,
+    url: str = DEFAULT_URL,
+    rounds: int = DEFAULT_ROUNDS,
+    headless: bool = True,
+) -> BenchResult:
+    """rounds запусков профиля в режиме mode: старт, переход на url, остановка."""
+    profile = Profile(
+        id=f"bench-{mode}",
+        name=f"bench {mode}",
+        camoufox_settings=CamoufoxSettings(headless=headless, storage_mode=mode),
+    )
+    if mode == STORAGE_PERSISTENT:
+        target = root / profile.id
+        target.mkdir(parents=True, exist_ok=True)
+        options: dict = {"data_dir": target}
+    else:
+        target = snapshot_path(root, profile.id)
+        options = {"snapshot": target}
+    launches = []
+    for _ in range(max(1, rounds)):
+        launcher = CamoufoxLauncher(profile=profile, **options)
+        t0 = time.perf_counter()
+        launcher.start()
+        launches.append(time.perf_counter() - t0)
+        try:
+            page = launcher.page
+            if page is None:
+                raise RuntimeError("Браузер запущен без вкладки")
+            page.goto(url)
+        finally:
+            launcher.stop()
+    return BenchResult(mode, tuple(launches), disk_usage(target))
+
+
+def main(argv: list[str] | None = None) -> int:
+    """CLI: browser-automation-bench-storage [--url URL] [--rounds N] [--headful]."""
+    parser = argparse.ArgumentParser(
+        description="Время запуска и место на диске: persistent против snapshot."
+    )
+    parser.add_argument("--url", default=DEFAULT_URL, help="страница между запусками")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument("--headful", action="store_true", help="с окном браузера")
+    parser.add_argument(
+        "--dir",
+        type=Path,
+        default=None,
+        help="где держать профили (по умолчанию — временный каталог)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.dir is not None:
+        return _run(args, args.dir)
+    with tempfile.TemporaryDirectory(prefix="storage-bench-") as tmp:
+        return _run(args, Path(tmp))
+
+
+def _run(args: argparse.Namespace, root: Path) -> int:
+    print(f"{'режим':<12}{'первый, с':>11}{'повторный, с':>14}{'диск, КиБ':>12}")
+    for mode in (STORAGE_PERSISTENT, STORAGE_SNAPSHOT):
+        try:
+            r = bench_mode(
+                mode,
+                root,
+                url=args.url,
+                rounds=args.rounds,
+                headless=not args.headful,
+            )
+        except Exception as e:
+            print(f"{mode:<12}ошибка: {e}", file=sys.stderr)
+            return 1
+        warm = f"{r.warm:.2f}" if r.warm is not None else "—"
+        print(f"{mode:<12}{r.cold:>11.2f}{warm:>14}{r.disk_usage / 1024:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""Импорт подписок VLESS: разбор, дедупликация, замер задержки, профили по рейтингу."""
+
+import asyncio
+import base64
+import binascii
+import ssl
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field, replace
+from urllib.parse import parse_qsl, urlparse
+
+from browser_automation.profile_repository import ProfileRepository
+from browser_automation.value_objects import Profile, VlessString, parse_vless
+
+DEFAULT_CONCURRENCY = 64
+DEFAULT_TIMEOUT = 5.0
+
+# Ключ дедупликации: (uuid, host, port, отсортированные параметры)
+EndpointKey = tuple[str, str, int, tuple[tuple[str, str], ...]]
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """Сервер из подписки и замер задержки до него (с). error — не удалось подключиться."""
+
+    vless: VlessString
+    tcp_latency: float | None = None
+    tls_latency: float | None = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def latency(self) -> float:
+        """Для сортировки: TLS, если замерялся, иначе TCP; недоступные — в конце."""
+        value = self.tls_latency if self.tls_latency is not None else self.tcp_latency
+        return value if value is not None and self.ok else float("inf")
+
+
+@dataclass
+class SubscriptionResult:
+    """Итог импорта подписки."""
+
+    ranked: list[Endpoint] = field(default_factory=list)
+    created: list[Profile] = field(default_factory=list)
+    updated: list[Profile] = field(default_factory=list)
+    # (строка, ошибка разбора)
+    invalid: list[tuple[str, str]] = field(default_factory=list)
+    duplicates: int = 0
+
+
+def decode_subscription(blob: str | bytes) -> list[str]:
+    """
+    Строки vless:// из подписки: base64 (обычный и url-safe, без паддинга)
+    или уже раскодированный текст — по ссылке в строке.
+    """
+    if isinstance(blob, bytes):
+        blob = blob.decode("utf-8", "replace")
+    text = blob.strip()
+    if "://" not in text:
+        compact = "".join(text.split())
+        padded = compact + "=" * (-len(compact) % 4)
+        try:
+            text = base64.urlsafe_b64decode(
+                padded.replace("+", "-").replace("/", "_")
+            ).decode("utf-8", "replace")
+        except (binascii.Error, ValueError):
+            pass
+    return [
+        line.strip()
+        for line in text.splitlines()
+        if line.strip().lower().startswith("vless://")
+    ]
+
+
+def endpoint_key(v: VlessString) -> EndpointKey:
+    params = tuple(sorted(parse_qsl(urlparse(v.raw).query, keep_blank_values=True)))
+    return (v.uuid.lower(), v.host.lower(), v.port, params)
+
+
+def parse_links(
+    links: Iterable[str],
+) -> tuple[list[VlessString], list[tuple[str, str]], int]:
+    """
+    Разбор и дедупликация ссылок. Возвращает (уникальные VlessString в исходном
+    порядке, невалидные строки с ошибкой, число дублей).
+    """
+    seen: set[EndpointKey] = set()
+    parsed: list[VlessString] = []
+    invalid: list[tuple[str, str]] = []
+    duplicates = 0
+    for link in links:
+        try:
+            v = VlessString(link)
+        except ValueError as e:
+            invalid.append((link, str(e)))
+            continue
+        key = endpoint_key(v)
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        parsed.append(v)
+    return parsed, invalid, duplicates
+
+
+def _tls_context() -> ssl.SSLContext:
+    # Замеряем время рукопожатия, а не доверие: REALITY отдаёт чужой сертификат
+    ctx = ssl.create_default_context()
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+
+async def _connect_time(
+    host: str,
+    port: int,
+    timeout: float,
+    ctx: ssl.SSLContext | None = None,
+    server_hostname: str | None = None,
+) -> float:
+    start = time.perf_counter()
+    _reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(
+            host, port, ssl=ctx, server_hostname=server_hostname if ctx else None
+        ),
+        timeout,
+    )
+    elapsed = time.perf_counter() - start
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except (OSError, ssl.SSLError):
+        pass
+    return elapsed
+
+
+async def measure(
+    v: VlessString,
+    *,
+    timeout: float = DEFAULT_TIMEOUT,
+    ctx: ssl.SSLContext | None = None,
+) -> Endpoint:
+    """TCP connect и (для security=tls/reality) TLS-рукопожатие до сервера."""
+    try:
+        tcp = await _connect_time(v.host, v.port, timeout)
+        tls = None
+        if v.param("security", "reality") in ("tls", "reality"):
+            tls = await _connect_time(
+                v.host,
+                v.port,
+                timeout,
+                ctx or _tls_context(),
+                v.param("sni", v.host) or v.host,
+            )
+    except (OSError, ssl.SSLError, asyncio.TimeoutError) as e:
+        return Endpoint(v, error=str(e) or type(e).__name__)
+    return Endpoint(v, tcp_latency=tcp, tls_latency=tls)
+
+
+async def measure_all(
+    vlesses: Iterable[VlessString],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> list[Endpoint]:
+    """Замеры параллельно, не больше concurrency соединений одновременно."""
+    sem = asyncio.Semaphore(concurrency)
+    ctx = _tls_context()
+
+    async def one(v: VlessString) -> Endpoint:
+        async with sem:
+            return await measure(v, timeout=timeout, ctx=ctx)
+
+    return list(await asyncio.gather(*(one(v) for v in vlesses)))
+
+
+def rank(endpoints: Iterable[Endpoint]) -> list[Endpoint]:
+    """От самых быстрых к медленным, недоступные — в конце."""
+    return sorted(endpoints, key=lambda e: e.latency)
+
+
+def import_subscription(
+    repo: ProfileRepository,
+    blob: str | bytes,
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+    include_unreachable: bool = False,
+    cancelled: Callable[[], bool] | None = None,
+) -> SubscriptionResult:
+    """
+    Раскодирует подписку, замеряет серверы и сохраняет их профилями
+    в порядке рейтинга (быстрые — первыми). Сервер, уже записанный в каком-то
+    профиле (тот же uuid/host/port/параметры), обновляет этот профиль, а не дублируется.
+    Недоступные серверы пропускаются, если не include_unreachable.
+    cancelled() проверяется после замеров: отмена — профили не сохраняются.
+    """
+    vlesses, invalid, duplicates = parse_links(decode_subscription(blob))
+    ranked = rank(
+        asyncio.run(measure_all(vlesses, concurrency=concurrency, timeout=timeout))
+    )
+    result = SubscriptionResult(ranked=ranked, invalid=invalid, duplicates=duplicates)
+    if cancelled and cancelled():
+        return result
+
+    # Ключ сервера → id профиля; полный Profile разбирается только у совпавших
+    existing: dict[EndpointKey, str] = {}
+    for pid, raw in repo.vless_links().items():
+        try:
+            existing.setdefault(endpoint_key(parse_vless(raw)), pid)
+        except ValueError:
+            continue
+
+    to_save: list[Profile] = []
+    for e in ranked:
+        if not e.ok and not include_unreachable:
+            continue
+        v = e.vless
+        pid = existing.get(endpoint_key(v))
+        current = repo.get(pid) if pid is not None else None
+        if current is not None:
+            to_save.append(replace(current, vless_raw=v.raw))
+        else:
+            to_save.append(
+                Profile(id="", name=v.name or f"{v.host}:{v.port}", vless_raw=v.raw)
+            )
+    existing_ids = set(existing.values())
+    for p in repo.upsert_many(to_save):
+        if p.id in existing_ids:
+            result.updated.append(p)
+        else:
+            result.created.append(p)
+    return result
@@ -0,0 +1,141 @@
+"""Сравнение загрузки страниц через VLESS-туннель: без mux/DNS, с mux, с DNS xray, с обоими."""
+
+import argparse
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+
+from browser_automation.camoufox_launcher import CamoufoxLauncher
+from browser_automation.value_objects import (
+    CamoufoxSettings,
+    Profile,
+    TunnelSettings,
+    parse_vless,
+)
+
+DEFAULT_URLS = ("https://example.com", "https://www.wikipedia.org")
+DEFAULT_ROUNDS = 3
+DEFAULT_MUX = 8
+DEFAULT_DNS = ("1.1.1.1", "8.8.8.8")
+
+
+@dataclass(frozen=True)
+class BenchResult:
+    """Время загрузок страниц через туннель (первая — на холодном туннеле), с."""
+
+    variant: str
+    loads: tuple[float, ...]
+    ready_time: float | None
+
+    @property
+    def cold(self) -> float:
+        return self.loads[0]
+
+    @property
+    def warm(self) -> float | None:
+        """Медиана остальных загрузок (соединения и DNS уже прогреты)."""
+        return statistics.median(self.loads[1:]) if len(self.loads) > 1 else None
+
+
+def variants(
+    mux: int = DEFAULT_MUX, dns: tuple[str, ...] = DEFAULT_DNS
+) -> dict[str, TunnelSettings]:
+    """Сравниваемые настройки туннеля: базовая и с mux/DNS по отдельности и вместе."""
+    return {
+        "без mux/DNS": TunnelSettings(),
+        "mux": TunnelSettings(mux_concurrency=mux),
+        "DNS": TunnelSettings(dns_servers=dns),
+        "mux + DNS": TunnelSettings(mux_concurrency=mux, dns_servers=dns),
+    }
+
+
+def bench_variant(
+    variant: str,
+    tunnel: TunnelSettings,
+    vless: str,
+    *,
+    urls: tuple[str, ...] = DEFAULT_URLS,
+    rounds: int = DEFAULT_ROUNDS,
+    headless: bool = True,
+) -> BenchResult:
+    """Один запуск браузера через туннель tunnel; rounds проходов по urls до события load."""
+    profile = Profile(
+        id="bench-tunnel",
+        name=f"bench {variant}",
+        vless_raw=vless,
+        camoufox_settings=CamoufoxSettings(headless=headless),
+        tunnel_settings=tunnel,
+    )
+    launcher = CamoufoxLauncher(profile=profile)
+    launcher.start()
+    try:
+        # Без туннеля сравнивать нечего: лаунчер мог запустить браузер напрямую
+        if launcher.proxy is None:
+            raise RuntimeError("VLESS-туннель не поднялся")
+        page = launcher.page
+        if page is None:
+            raise RuntimeError("Браузер запущен без вкладки")
+        loads = []
+        for _ in range(max(1, rounds)):
+            for url in urls:
+                t0 = time.perf_counter()
+                page.goto(url, wait_until="load")
+                loads.append(time.perf_counter() - t0)
+        ready_time = getattr(launcher.proxy, "ready_time", None)
+    finally:
+        launcher.stop()
+    return BenchResult(variant, tuple(loads), ready_time)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """CLI: browser-automation-bench-tunnel VLESS [--url URL] [--rounds N] [--mux N] [--dns IP]."""
+    parser = argparse.ArgumentParser(
+        description="Время загрузки страниц через VLESS: без mux/DNS, с mux, с DNS xray."
+    )
+    parser.add_argument("vless", help="строка vless:// сервера")
+    parser.add_argument(
+        "--url",
+        action="append",
+        dest="urls",
+        metavar="URL",
+        default=None,
+        help="страница для загрузки (можно несколько раз)",
+    )
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument(
+        "--mux", type=int, default=DEFAULT_MUX, help="потоков mux на соединение"
+    )
+    parser.add_argument(
+        "--dns", nargs="+", metavar="IP", default=list(DEFAULT_DNS), help="DNS xray"
+    )
+    parser.add_argument("--headful", action="store_true", help="с окном браузера")
+    args = parser.parse_args(argv)
+    try:
+        parse_vless(args.vless)
+    except ValueError as e:
+        parser.error(str(e))
+
+    urls = tuple(args.urls or DEFAULT_URLS)
+    print(f"{'вариант':<14}{'туннель, с':>12}{'первая, с':>11}{'повторные, с':>14}")
+    for name, tunnel in variants(args.mux, tuple(args.dns)).items():
+        try:
+            r = bench_variant(
+                name,
+                tunnel,
+                args.vless,
+                urls=urls,
+                rounds=args.rounds,
+                headless=not args.headful,
+            )
+        except Exception as e:
+            print(f"{name:<14}ошибка: {e}", file=sys.stderr)
+            return 1
+        ready = f"{r.ready_time:.2f}" if r.ready_time is not None else "—"
+        warm = f"{r.warm:.2f}" if r.warm is not None else "—"
+        print(f"{name:<14}{ready:>12}{r.cold:>11.2f}{warm:>14}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
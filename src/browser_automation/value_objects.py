@@ -1,8 +1,9 @@
 """Value Objects для профилей, прокси, VLESS и др."""
 
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import Any, NamedTuple
 from urllib.parse import parse_qs, unquote, urlparse
 
 
@@ -96,6 +97,15 @@ class VlessString:
         }
 
 
+@lru_cache(maxsize=4096)
+def parse_vless(raw: str) -> VlessString:
+    """
+    VlessString с памятью: повторные запуски одного профиля не разбирают строку заново.
+    VlessString неизменяем, поэтому один объект можно отдавать всем.
+    """
+    return VlessString(raw)
+
+
 @dataclass
 class ProxyConfig:
     """Настройки прокси для Camoufox (host, port)."""
@@ -113,6 +123,16 @@ class ProxyConfig:
 # Локаль браузера (Accept-Language, locale)
 DEFAULT_LOCALE = "ru-BY,ru-RU"
 
+# Где живёт состояние браузера профиля (CamoufoxSettings.storage_mode):
+# persistent — свой процесс и каталог профиля Firefox (profiles-data/<id>);
+# ephemeral — контекст в общем процессе Camoufox, после закрытия ничего не остаётся;
+# snapshot — свой процесс без каталога, куки и хранилища сайтов — в снимке
+# profiles-data/<id>.state.json.gz (сохраняется при закрытии)
+STORAGE_PERSISTENT = "persistent"
+STORAGE_EPHEMERAL = "ephemeral"
+STORAGE_SNAPSHOT = "snapshot"
+STORAGE_MODES = (STORAGE_PERSISTENT, STORAGE_EPHEMERAL, STORAGE_SNAPSHOT)
+
 
 @dataclass
 class CamoufoxSettings:
@@ -124,6 +144,45 @@ class CamoufoxSettings:
     window: tuple[int, int] | None = None
     enable_cache: bool = True
     locale: str = DEFAULT_LOCALE
+    storage_mode: str = STORAGE_PERSISTENT
+
+
+@dataclass(frozen=True)
+class TunnelSettings:
+    """
+    Настройки VLESS-туннеля (xray). По умолчанию — как без них: без mux,
+    без своего DNS, весь трафик через туннель.
+    mux_concurrency — потоков на одно соединение с сервером (0 — mux выключен);
+    xudp_concurrency — то же для UDP (0 — по умолчанию xray);
+    dns_servers — встроенный DNS xray с кэшем (пусто — системный);
+    direct_domains — домены в обход туннеля (формат доменов routing xray).
+    """
+
+    mux_concurrency: int = 0
+    xudp_concurrency: int = 0
+    dns_servers: tuple[str, ...] = ()
+    direct_domains: tuple[str, ...] = ()
+
+    @property
+    def is_default(self) -> bool:
+        return self == TunnelSettings()
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "mux_concurrency": self.mux_concurrency,
+            "xudp_concurrency": self.xudp_concurrency,
+            "dns_servers": list(self.dns_servers),
+            "direct_domains": list(self.direct_domains),
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> "TunnelSettings":
+        return cls(
+            mux_concurrency=int(d.get("mux_concurrency", 0)),
+            xudp_concurrency=int(d.get("xudp_concurrency", 0)),
+            dns_servers=tuple(d.get("dns_servers") or ()),
+            direct_domains=tuple(d.get("direct_domains") or ()),
+        )
 
 
 # Версия схемы профиля (для миграций при изменении формата)
@@ -135,6 +194,8 @@ class Profile:
     """
     Профиль: название, прокси, настройки.
     Куки и localStorage хранятся в user_data_dir (persistent_context).
+    tunnel_settings — настройки VLESS-туннеля; None — по умолчанию.
+    revision — ревизия в хранилище (растёт при каждом сохранении), 0 — ещё не сохранён.
     """
 
     id: str
@@ -143,10 +204,13 @@ class Profile:
     vless_raw: str | None = None
     camoufox_settings: CamoufoxSettings | None = None
     version: int = PROFILE_VERSION
+    revision: int = 0
+    tunnel_settings: TunnelSettings | None = None
 
     def to_dict(self) -> dict[str, Any]:
         d: dict[str, Any] = {
             "version": self.version,
+            "rev": self.revision,
             "id": self.id,
             "name": self.name,
         }
@@ -167,6 +231,10 @@ class Profile:
                 "enable_cache": s.enable_cache,
                 "locale": s.locale,
             }
+            if s.storage_mode != STORAGE_PERSISTENT:
+                d["camoufox"]["storage_mode"] = s.storage_mode
+        if self.tunnel_settings and not self.tunnel_settings.is_default:
+            d["tunnel"] = self.tunnel_settings.to_dict()
         return d
 
     @classmethod
@@ -187,7 +255,9 @@ class Profile:
                 window=tuple(c["window"]) if c.get("window") else None,
                 enable_cache=c.get("enable_cache", True),
                 locale=c.get("locale", DEFAULT_LOCALE),
+                storage_mode=c.get("storage_mode") or STORAGE_PERSISTENT,
             )
+        tunnel = TunnelSettings.from_dict(d["tunnel"]) if d.get("tunnel") else None
         version = int(d.get("version", PROFILE_VERSION))
 
         return cls(
@@ -197,4 +267,39 @@ class Profile:
             vless_raw=d.get("vless_raw"),
             camoufox_settings=camo,
             version=version,
+            revision=int(d.get("rev", 0)),
+            tunnel_settings=tunnel,
+        )
+
+
+# Тип прокси в ProfileSummary
+PROXY_KIND_VLESS = "vless"
+PROXY_KIND_MANUAL = "proxy"
+
+
+class ProfileSummary(NamedTuple):
+    """
+    Краткая строка профиля для списков и таблиц: кортеж без разбора
+    ProxyConfig и CamoufoxSettings. proxy_kind — "vless", "proxy" или "" (без прокси).
+    """
+
+    id: str
+    name: str
+    proxy_kind: str
+    version: int
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> "ProfileSummary":
+        if d.get("vless_raw"):
+            kind = PROXY_KIND_VLESS
+        elif d.get("proxy"):
+            kind = PROXY_KIND_MANUAL
+        else:
+            kind = ""
+        return cls(
+            id=d.get("id", ""),
+            name=d.get("name", "Unnamed"),
+            proxy_kind=kind,
+            # Нет поля — запись сохранена до появления версий схемы
+            version=int(d.get("version", 0)),
         )
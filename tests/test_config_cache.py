@@ -0,0 +1,64 @@
+"""Сборка мусора кэша конфигов xray: только файлы кэша, свежие временные файлы не трогаются."""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from browser_automation.proxy.config_cache import TMP_GRACE, ConfigCache
+
+HASH = "0123456789abcdef" * 2
+
+
+def _file(path: Path, age: float = 0.0) -> Path:
+    path.write_text("{}")
+    t = time.time() - age
+    os.utime(path, (t, t))
+    return path
+
+
+def test_gc_removes_only_stale_cache_files(tmp_path: Path) -> None:
+    cache = ConfigCache(tmp_path, max_age=60.0)
+    stale = _file(tmp_path / f"{HASH}.json", age=120.0)
+    fresh = _file(tmp_path / f"{'f' * 32}.json")
+    hub = _file(tmp_path / "hub-123-7f00.json", age=120.0)
+    hub_tmp = _file(tmp_path / "hub-123-7f00.json.tmp", age=2 * TMP_GRACE)
+    other = _file(tmp_path / "settings.json", age=120.0)
+
+    assert cache.gc() == 1
+    assert not stale.exists()
+    assert fresh.exists() and hub.exists() and hub_tmp.exists() and other.exists()
+
+
+def test_gc_skips_young_temporary_files(tmp_path: Path) -> None:
+    cache = ConfigCache(tmp_path)
+    writing = _file(tmp_path / f"{HASH}.json.4242.140001.tmp", age=5.0)
+    abandoned = _file(tmp_path / f"{'a' * 32}.json.4242.140002.tmp", age=2 * TMP_GRACE)
+
+    assert cache.gc() == 1
+    assert writing.exists()
+    assert not abandoned.exists()
+
+
+def test_gc_keeps_newest_and_kept_over_limit(tmp_path: Path) -> None:
+    cache = ConfigCache(tmp_path, max_files=2)
+    paths = [
+        _file(tmp_path / f"{i:032x}.json", age=100.0 - i) for i in range(4)
+    ]
+    _file(tmp_path / "hub-1-1.json", age=1000.0)
+
+    assert cache.gc(keep=paths[0]) == 2
+    assert [p.exists() for p in paths] == [True, False, False, True]
+    assert (tmp_path / "hub-1-1.json").exists()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="права POSIX")
+def test_store_is_private(tmp_path: Path) -> None:
+    # В конфиге — uuid VLESS: другие пользователи не должны его читать
+    cache = ConfigCache(tmp_path / "configs")
+    path = cache.store({"outbounds": [{"settings": {"id": "secret-uuid"}}]})
+    assert path.stat().st_mode & 0o077 == 0
+    assert cache.directory.stat().st_mode & 0o077 == 0
+    assert list(cache.directory.glob("*.tmp")) == []
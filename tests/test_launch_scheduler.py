@@ -0,0 +1,83 @@
+"""LaunchScheduler: повторный запуск того же профиля и удаление профиля во время старта."""
+
+from concurrent.futures import Future
+
+from browser_automation.launch_scheduler import LaunchScheduler, LaunchState
+
+
+class _Starts:
+    """Старты, которые завершает тест: future по ключу в порядке запуска."""
+
+    def __init__(self) -> None:
+        self.futures: dict[str, list[Future]] = {}
+
+    def __call__(self, key: str):
+        def start() -> Future:
+            future: Future = Future()
+            self.futures.setdefault(key, []).append(future)
+            return future
+
+        return start
+
+
+def _scheduler(states: list | None = None) -> LaunchScheduler:
+    def on_state(key: str, state: LaunchState | None) -> None:
+        if states is not None:
+            states.append((key, state))
+
+    return LaunchScheduler(max_starting=1, on_state=on_state)
+
+
+def test_active_profile_is_not_submitted_again() -> None:
+    starts = _Starts()
+    scheduler = _scheduler()
+    assert scheduler.submit("a", starts("a"))
+    assert scheduler.submit("b", starts("b"))
+    assert scheduler.state("a") == LaunchState.STARTING
+    assert scheduler.state("b") == LaunchState.QUEUED
+    assert not scheduler.submit("a", starts("a"))
+    assert not scheduler.submit("b", starts("b"))
+
+    starts.futures["a"][0].set_result(None)
+    assert scheduler.state("a") == LaunchState.RUNNING
+    assert not scheduler.submit("a", starts("a"))
+    assert len(starts.futures["a"]) == 1
+
+    scheduler.finished("a")
+    assert scheduler.state("a") is None
+    assert scheduler.submit("a", starts("a"))
+
+
+def test_forgotten_while_starting_does_not_become_running() -> None:
+    states: list = []
+    starts = _Starts()
+    scheduler = _scheduler(states)
+    scheduler.submit("a", starts("a"))
+    scheduler.submit("b", starts("b"))
+
+    scheduler.forget("a")
+    assert scheduler.state("a") is None
+    # Место стартующего занято, пока старт не завершится
+    assert "b" not in starts.futures
+    assert not scheduler.submit("a", starts("a"))
+
+    starts.futures["a"][0].set_result(None)
+    assert scheduler.state("a") is None
+    assert states[-2:] == [("a", None), ("b", LaunchState.STARTING)]
+    assert ("a", LaunchState.RUNNING) not in states
+    assert scheduler.state("b") == LaunchState.STARTING
+
+
+def test_forget_removes_queued_and_running() -> None:
+    starts = _Starts()
+    scheduler = _scheduler()
+    scheduler.submit("a", starts("a"))
+    scheduler.submit("b", starts("b"))
+    scheduler.forget("b")
+    assert scheduler.pending() == 0
+
+    starts.futures["a"][0].set_result(None)
+    assert "b" not in starts.futures
+    scheduler.forget("a")
+    assert scheduler.state("a") is None
+    assert scheduler.submit("a", starts("a"))
@@ -0,0 +1,36 @@
+"""Профиль с VLESS не запускается без туннеля: любая ошибка прокси — ProxyStartError."""
+
+import pytest
+
+from browser_automation import camoufox_launcher
+from browser_automation.camoufox_launcher import CamoufoxLauncher
+from browser_automation.proxy import ProxyStartError
+from browser_automation.value_objects import Profile
+
+VLESS = "vless://00000000-0000-0000-0000-000000000001@a.example:443?security=tls#a"
+
+
+@pytest.mark.parametrize(
+    "error", [FileNotFoundError("xray не найден"), RuntimeError("Нет свободных портов")]
+)
+def test_proxy_failure_stops_launch(
+    monkeypatch: pytest.MonkeyPatch, error: Exception
+) -> None:
+    class Broken:
+        def __init__(self, *args, **kwargs) -> None:
+            pass
+
+        def start(self):
+            raise error
+
+    monkeypatch.setattr(camoufox_launcher, "VlessProxy", Broken)
+    launcher = CamoufoxLauncher(profile=Profile(id="p", name="p", vless_raw=VLESS))
+    with pytest.raises(ProxyStartError) as info:
+        launcher._start_proxy()
+    assert info.value.__cause__ is error
+    assert launcher.proxy is None and launcher.proxy_config is None
+
+
+def test_profile_without_vless_starts_without_proxy() -> None:
+    launcher = CamoufoxLauncher(profile=Profile(id="p", name="p"))
+    assert launcher._start_proxy() is None
@@ -0,0 +1,127 @@
+"""Нагрузочный тест хранилищ профилей из нескольких процессов: ничего не теряется, устаревшая запись отклоняется."""
+
+import multiprocessing
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from browser_automation.profile_repository import ProfileRepository
+from browser_automation.storage import StaleProfileError
+from browser_automation.value_objects import Profile
+
+WORKERS = 4
+CREATES = 40
+INCREMENTS = 15
+
+BACKENDS = {
+    "json": ("profiles.json", False),
+    "journal": ("profiles.json", True),
+    "sqlite": ("profiles.db", False),
+}
+
+
+@pytest.fixture(params=list(BACKENDS))
+def store(request, tmp_path: Path) -> tuple[Path, bool]:
+    name, journal = BACKENDS[request.param]
+    return tmp_path / name, journal
+
+
+def _pool(processes: int):
+    # spawn: у каждого процесса свои файловые дескрипторы и соединение SQLite
+    return multiprocessing.get_context("spawn").Pool(processes)
+
+
+def _create_worker(path: Path, journal: bool, worker: int, count: int) -> None:
+    repo = ProfileRepository(path, journal=journal)
+    try:
+        for i in range(count):
+            repo.create(Profile(id="", name=f"w{worker}-{i}"))
+    finally:
+        repo.close()
+
+
+def _increment_worker(path: Path, journal: bool, profile_id: str, count: int) -> None:
+    """Увеличивает число в названии профиля count раз; отказ по ревизии — повтор."""
+    repo = ProfileRepository(path, journal=journal)
+    try:
+        done = 0
+        while done < count:
+            p = repo.get(profile_id)
+            try:
+                repo.update(replace(p, name=str(int(p.name) + 1)))
+            except StaleProfileError:
+                continue
+            done += 1
+    finally:
+        repo.close()
+
+
+def _bump_worker(path: Path, journal: bool, profile_id: str) -> None:
+    repo = ProfileRepository(path, journal=journal)
+    try:
+        p = repo.get(profile_id)
+        repo.update(replace(p, name=p.name + "!"))
+    finally:
+        repo.close()
+
+
+def test_concurrent_creates_lose_nothing(store: tuple[Path, bool]) -> None:
+    path, journal = store
+    with _pool(WORKERS) as pool:
+        pool.starmap(
+            _create_worker, [(path, journal, w, CREATES) for w in range(WORKERS)]
+        )
+
+    repo = ProfileRepository(path, journal=journal)
+    try:
+        names = sorted(s.name for s in repo.list_summaries())
+    finally:
+        repo.close()
+    expected = sorted(f"w{w}-{i}" for w in range(WORKERS) for i in range(CREATES))
+    assert names == expected
+
+
+def test_concurrent_updates_are_serialized_by_revision(
+    store: tuple[Path, bool],
+) -> None:
+    path, journal = store
+    repo = ProfileRepository(path, journal=journal)
+    try:
+        profile_id = repo.create(Profile(id="", name="0")).id
+    finally:
+        repo.close()
+
+    with _pool(WORKERS) as pool:
+        pool.starmap(
+            _increment_worker,
+            [(path, journal, profile_id, INCREMENTS) for _ in range(WORKERS)],
+        )
+
+    repo = ProfileRepository(path, journal=journal)
+    try:
+        p = repo.get(profile_id)
+    finally:
+        repo.close()
+    # Каждое увеличение прочитало результат предыдущего — ни одно не потеряно
+    assert p.name == str(WORKERS * INCREMENTS)
+    assert p.revision == WORKERS * INCREMENTS + 1
+
+
+def test_stale_write_from_other_process_raises(store: tuple[Path, bool]) -> None:
+    path, journal = store
+    repo = ProfileRepository(path, journal=journal)
+    try:
+        stale = repo.create(Profile(id="", name="a"))
+        with _pool(1) as pool:
+            pool.apply(_bump_worker, (path, journal, stale.id))
+
+        with pytest.raises(StaleProfileError) as exc:
+            repo.update(replace(stale, name="b"))
+        assert exc.value.profile_id == stale.id
+        assert exc.value.expected == stale.revision
+        assert exc.value.actual == stale.revision + 1
+        # Отклонённая запись ничего не изменила
+        assert repo.get(stale.id).name == "a!"
+    finally:
+        repo.close()
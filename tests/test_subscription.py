@@ -0,0 +1,203 @@
+"""Замер серверов подписки на локальных TCP/TLS-серверах: таймауты, чужой сертификат, не-TLS ответ."""
+
+import asyncio
+import shutil
+import socket
+import socketserver
+import ssl
+import subprocess
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from browser_automation import profile_repository
+from browser_automation.profile_repository import ProfileRepository
+from browser_automation.subscription import import_subscription, measure
+from browser_automation.value_objects import Profile, VlessString
+
+UUID = "00000000-0000-0000-0000-00000000000{}"
+TIMEOUT = 0.5
+
+
+def _link(port: int, security: str, n: int = 1, **params: str) -> str:
+    query = "&".join([f"security={security}", *(f"{k}={v}" for k, v in params.items())])
+    return f"vless://{UUID.format(n)}@127.0.0.1:{port}?{query}#s{n}"
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _serve(handle) -> Iterator[int]:
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self) -> None:
+            try:
+                handle(self.request)
+            except (OSError, ssl.SSLError):
+                pass
+
+    server = _Server(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server.server_address[1]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(scope="module")
+def certificate(tmp_path_factory) -> tuple[Path, Path]:
+    """Самоподписанный сертификат на другое имя — клиент ему не доверяет."""
+    if shutil.which("openssl") is None:
+        pytest.skip("нет openssl для сертификата")
+    d = tmp_path_factory.mktemp("cert")
+    cert, key = d / "cert.pem", d / "key.pem"
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-days", "1", "-subj", "/CN=untrusted.invalid",
+            "-keyout", str(key), "-out", str(cert),
+        ],  # fmt: skip
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+@pytest.fixture
+def tls_server(certificate) -> Iterator[int]:
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.load_cert_chain(*certificate)
+
+    def handle(sock: socket.socket) -> None:
+        with ctx.wrap_socket(sock, server_side=True) as tls:
+            tls.recv(1)
+
+    yield from _serve(handle)
+
+
+@pytest.fixture
+def tcp_server() -> Iterator[int]:
+    yield from _serve(lambda sock: sock.recv(1))
+
+
+@pytest.fixture
+def silent_server() -> Iterator[int]:
+    """Принимает соединение и молчит: TLS-рукопожатие не завершится."""
+    stop = threading.Event()
+    yield from _serve(lambda sock: stop.wait(5))
+    stop.set()
+
+
+@pytest.fixture
+def redirect_server() -> Iterator[int]:
+    """На порту HTTP: на ClientHello отвечает редиректом на https и закрывает."""
+
+    def handle(sock: socket.socket) -> None:
+        sock.recv(4096)
+        sock.sendall(
+            b"HTTP/1.1 301 Moved Permanently\r\n"
+            b"Location: https://127.0.0.1/\r\nContent-Length: 0\r\n\r\n"
+        )
+
+    yield from _serve(handle)
+
+
+@pytest.fixture
+def closed_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _measure(link: str):
+    return asyncio.run(measure(VlessString(link), timeout=TIMEOUT))
+
+
+def test_untrusted_certificate_is_measured(tls_server: int) -> None:
+    # Доверие не проверяется: REALITY отдаёт сертификат чужого сайта
+    e = _measure(_link(tls_server, "tls", sni="example.com"))
+    assert e.ok, e.error
+    assert e.tcp_latency is not None and e.tls_latency is not None
+
+
+def test_plain_tcp_skips_tls(tcp_server: int) -> None:
+    e = _measure(_link(tcp_server, "none"))
+    assert e.ok and e.tcp_latency is not None and e.tls_latency is None
+
+
+def test_tls_handshake_timeout(silent_server: int) -> None:
+    e = _measure(_link(silent_server, "tls"))
+    assert not e.ok
+    assert e.latency == float("inf")
+
+
+def test_http_redirect_instead_of_tls_fails(redirect_server: int) -> None:
+    e = _measure(_link(redirect_server, "reality"))
+    assert not e.ok
+
+
+def test_refused_connection(closed_port: int) -> None:
+    e = _measure(_link(closed_port, "none"))
+    assert not e.ok and e.tcp_latency is None
+
+
+def test_import_ranks_updates_known_and_skips_unreachable(
+    tmp_path: Path,
+    tls_server: int,
+    tcp_server: int,
+    silent_server: int,
+    closed_port: int,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    path = tmp_path / "profiles.json"
+    repo = ProfileRepository(path)
+    known = repo.create(
+        Profile(id="", name="known", vless_raw=_link(tls_server, "tls", 1) + "-old")
+    )
+    for i in range(20):
+        repo.create(Profile(id="", name=f"other {i}"))
+    repo.close()
+
+    parsed = []
+    original = profile_repository.Profile.from_dict
+    monkeypatch.setattr(
+        profile_repository.Profile,
+        "from_dict",
+        staticmethod(lambda d: parsed.append(d["id"]) or original(d)),
+    )
+    repo = ProfileRepository(path)
+    blob = "\n".join(
+        [
+            _link(silent_server, "tls", 3),
+            _link(tls_server, "tls", 1),
+            _link(tls_server, "tls", 1),
+            _link(closed_port, "none", 4),
+            _link(tcp_server, "none", 2),
+            "vless://broken",
+        ]
+    )
+    result = import_subscription(repo, blob, timeout=TIMEOUT)
+
+    assert result.duplicates == 1 and len(result.invalid) == 1
+    assert [e.ok for e in result.ranked] == [True, True, False, False]
+    assert [p.id for p in result.updated] == [known.id]
+    assert result.updated[0].vless_raw == _link(tls_server, "tls", 1)
+    assert [p.vless_raw for p in result.created] == [_link(tcp_server, "none", 2)]
+    # Полный Profile разобран только у профиля с тем же сервером
+    assert parsed == [known.id]
+    repo.close()
+
+
+def test_cancelled_import_saves_nothing(tmp_path: Path, tcp_server: int) -> None:
+    repo = ProfileRepository(tmp_path / "profiles.json")
+    result = import_subscription(
+        repo, _link(tcp_server, "none"), timeout=TIMEOUT, cancelled=lambda: True
+    )
+    assert [e.ok for e in result.ranked] == [True]
+    assert result.created == [] and repo.list_summaries() == []
+    repo.close()
@@ -0,0 +1,34 @@
+"""TrafficCollector.save() из нескольких потоков: общий временный файл не ломает запись."""
+
+import json
+import threading
+from pathlib import Path
+
+from browser_automation.proxy.stats import TrafficCollector
+
+THREADS = 8
+SAVES = 200
+
+
+def test_concurrent_saves_do_not_fail(tmp_path: Path) -> None:
+    path = tmp_path / "traffic.json"
+    collector = TrafficCollector(path)
+    errors: list[BaseException] = []
+
+    def worker() -> None:
+        try:
+            for _ in range(SAVES):
+                # reset() помечает итоги изменёнными и сразу вызывает save()
+                collector.reset("profile")
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert json.loads(path.read_text(encoding="utf-8")) == {}
+    assert list(tmp_path.glob("*.tmp")) == []
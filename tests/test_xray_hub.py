@@ -0,0 +1,290 @@
+"""XrayHub против поддельного xray: порядок вызовов API и перезапуск, если API не ответил."""
+
+import socket
+import sys
+from pathlib import Path
+
+import pytest
+
+from browser_automation.proxy.config_cache import ConfigCache
+from browser_automation.proxy.hub import XrayHub
+from browser_automation.proxy.ports import PortAllocator
+from browser_automation.proxy.probe import ProxyStartError, wait_socks_ready
+
+VLESS_A = "vless://00000000-0000-0000-0000-000000000001@a.example:443?security=tls#a"
+VLESS_B = "vless://00000000-0000-0000-0000-000000000002@b.example:443?security=tls#b"
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="поддельный xray — скрипт с shebang"
+)
+
+# Поддельный xray. `run -c FILE` слушает SOCKS5-inbound'ы конфига и порт API;
+# `api CMD --server=HOST:PORT [args] [FILE]` пишет команду в журнал и передаёт её
+# запущенному процессу (adi/rmi открывают и закрывают порты). Команда из файла
+# fail завершается ошибкой, не доходя до сервера; при файле mute SOCKS5-порты
+# принимают соединения, но не отвечают на рукопожатие.
+FAKE_XRAY = r'''
+import json, os, socket, sys, threading
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LOG = os.path.join(HERE, "calls.log")
+
+
+def log(line):
+    with open(LOG, "a") as f:
+        f.write(line + "\n")
+
+
+def client(argv):
+    command = argv[0]
+    server = next(a for a in argv if a.startswith("--server=")).split("=", 1)[1]
+    rest = [a for a in argv[1:] if not a.startswith("--server=")]
+    config = None
+    if rest and rest[-1].endswith(".json"):
+        with open(rest.pop()) as f:
+            config = json.load(f)
+    log(" ".join(["api", command, *rest]))
+    fail = os.path.join(HERE, "fail")
+    if os.path.exists(fail) and command in open(fail).read().split():
+        sys.exit(f"failed to call {command}")
+    host, port = server.rsplit(":", 1)
+    with socket.create_connection((host, int(port)), timeout=5) as s:
+        s.sendall(json.dumps({"cmd": command, "args": rest, "config": config}).encode() + b"\n")
+        if s.makefile().readline().strip() != "ok":
+            sys.exit(f"{command}: rejected")
+
+
+listeners = {}
+
+
+def serve_socks(sock):
+    while True:
+        try:
+            conn, _ = sock.accept()
+        except OSError:
+            return
+        with conn:
+            if os.path.exists(os.path.join(HERE, "mute")):
+                continue
+            conn.recv(3)
+            conn.sendall(b"\x05\x00")
+
+
+def listen(inbound):
+    if inbound["protocol"] != "socks":
+        return
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", inbound["port"]))
+    sock.listen()
+    listeners[inbound["tag"]] = sock
+    threading.Thread(target=serve_socks, args=(sock,), daemon=True).start()
+
+
+def handle(request):
+    if request["cmd"] == "adi":
+        for inbound in request["config"]["inbounds"]:
+            listen(inbound)
+    elif request["cmd"] == "rmi":
+        for tag in request["args"]:
+            sock = listeners.pop(tag, None)
+            if sock is not None:
+                sock.shutdown(socket.SHUT_RDWR)
+                sock.close()
+
+
+def run(path):
+    with open(path) as f:
+        config = json.load(f)
+    log("run")
+    api = next(i for i in config["inbounds"] if i["tag"] == "api")
+    server = socket.socket()
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", api["port"]))
+    server.listen()
+    for inbound in config["inbounds"]:
+        if inbound["tag"] != "api":
+            listen(inbound)
+    while True:
+        conn, _ = server.accept()
+        with conn:
+            handle(json.loads(conn.makefile().readline()))
+            conn.sendall(b"ok\n")
+
+
+if sys.argv[1] == "api":
+    client(sys.argv[2:])
+else:
+    run(sys.argv[sys.argv.index("-c") + 1])
+'''
+
+
+@pytest.fixture
+def fake_xray(tmp_path: Path) -> Path:
+    path = tmp_path / "xray"
+    path.write_text(f"#!{sys.executable}\n{FAKE_XRAY}")
+    path.chmod(0o755)
+    return path
+
+
+@pytest.fixture
+def hub(fake_xray: Path, tmp_path: Path):
+    hub = XrayHub(
+        xray_path=fake_xray,
+        ready_timeout=5.0,
+        ports=PortAllocator(base=_free_base()),
+        configs=ConfigCache(tmp_path / "configs"),
+    )
+    yield hub
+    hub.stop()
+
+
+def _free_base(pairs: int = 16) -> int:
+    """Начало диапазона портов, выданного ядром: в тесте нет чужих занятых пар."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return port - port % 2 if port + 2 * pairs < 65536 else 20000
+
+
+def _calls(fake_xray: Path) -> list[str]:
+    log = fake_xray.with_name("calls.log")
+    return log.read_text().splitlines() if log.exists() else []
+
+
+def _fail(fake_xray: Path, command: str) -> None:
+    fake_xray.with_name("fail").write_text(command)
+
+
+def _accepts(port: int) -> bool:
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+def test_first_route_starts_xray(hub: XrayHub, fake_xray: Path) -> None:
+    proxy = hub.add("a", VLESS_A)
+    assert _calls(fake_xray) == ["run"]
+    assert hub.is_running()
+    assert _accepts(proxy.port)
+    # В конфиге хаба — uuid VLESS
+    assert hub._config_path.stat().st_mode & 0o077 == 0
+
+
+def test_add_creates_outbound_and_rules_before_inbound(
+    hub: XrayHub, fake_xray: Path
+) -> None:
+    hub.add("a", VLESS_A)
+    process = hub._supervisor.process
+    proxy = hub.add("b", VLESS_B)
+    assert _calls(fake_xray) == ["run", "api ado", "api adrules -append", "api adi"]
+    assert hub._supervisor.process is process
+    assert _accepts(proxy.port)
+
+
+def test_remove_drops_inbound_then_rules_then_outbound(
+    hub: XrayHub, fake_xray: Path
+) -> None:
+    hub.add("a", VLESS_A)
+    proxy = hub.add("b", VLESS_B)
+    tag = hub._routes["b"].tag
+    hub.remove("b")
+    assert _calls(fake_xray)[4:] == [
+        f"api rmi {tag}-socks {tag}-http",
+        f"api rmrules {tag}",
+        f"api rmo {tag}",
+    ]
+    assert "b" not in hub and hub.is_running()
+    assert not _accepts(proxy.port)
+
+
+def test_failed_add_restarts_hub_with_all_routes(
+    hub: XrayHub, fake_xray: Path
+) -> None:
+    first = hub.add("a", VLESS_A)
+    _fail(fake_xray, "adrules")
+    second = hub.add("b", VLESS_B)
+    assert _calls(fake_xray) == ["run", "api ado", "api adrules -append", "run"]
+    assert hub.is_running()
+    assert _accepts(first.port) and _accepts(second.port)
+
+
+def test_failed_remove_restarts_hub_without_route(
+    hub: XrayHub, fake_xray: Path
+) -> None:
+    first = hub.add("a", VLESS_A)
+    second = hub.add("b", VLESS_B)
+    tag = hub._routes["b"].tag
+    _fail(fake_xray, "rmrules")
+    hub.remove("b")
+    # remove() не ждёт готовности перезапущенного xray
+    wait_socks_ready("127.0.0.1", first.port, timeout=5.0)
+    assert _calls(fake_xray)[4:] == [
+        f"api rmi {tag}-socks {tag}-http",
+        f"api rmrules {tag}",
+        "run",
+    ]
+    assert hub.is_running()
+    assert not _accepts(second.port)
+
+
+class _RecordingAllocator(PortAllocator):
+    """Запоминает, слушал ли кто-то порт в момент его возврата."""
+
+    def __init__(self, base: int) -> None:
+        super().__init__(base=base)
+        self.released_while_bound: list[int] = []
+
+    def release(self, port: int, *, busy: bool = False) -> None:
+        if _accepts(port):
+            self.released_while_bound.append(port)
+        super().release(port, busy=busy)
+
+
+@pytest.mark.parametrize("failing", [None, "rmrules"])
+def test_remove_releases_port_after_inbound_is_gone(
+    fake_xray: Path, tmp_path: Path, failing: str | None
+) -> None:
+    ports = _RecordingAllocator(_free_base())
+    hub = XrayHub(
+        xray_path=fake_xray, ports=ports, configs=ConfigCache(tmp_path / "configs")
+    )
+    try:
+        hub.add("a", VLESS_A)
+        second = hub.add("b", VLESS_B)
+        if failing:
+            _fail(fake_xray, failing)
+        hub.remove("b")
+        assert not ports.is_reserved(second.port)
+        assert ports.released_while_bound == []
+    finally:
+        hub.stop()
+    assert ports.released_while_bound == []
+
+
+def test_add_timeout_releases_port_after_inbound_is_removed(
+    fake_xray: Path, tmp_path: Path
+) -> None:
+    ports = _RecordingAllocator(_free_base())
+    hub = XrayHub(
+        xray_path=fake_xray,
+        ready_timeout=1.0,
+        ports=ports,
+        configs=ConfigCache(tmp_path / "configs"),
+    )
+    try:
+        hub.add("a", VLESS_A)
+        fake_xray.with_name("mute").touch()
+        with pytest.raises(ProxyStartError):
+            hub.add("b", VLESS_B)
+        assert _calls(fake_xray)[4:] == [
+            "api rmi r1-socks r1-http",
+            "api rmrules r1",
+            "api rmo r1",
+        ]
+        assert "b" not in hub
+        assert ports.released_while_bound == []
+    finally:
+        hub.stop()